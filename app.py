@@ -45,5 +45,4 @@ with col2:
             st.error("Please enter your OpenAI API Key in the sidebar.")
         else:
             with st.spinner("Reading papers and writing review... (this may take a minute)"):
-                review = generate_review(st.session_state.papers, api_key, topic)
-                st.markdown(review)
+                st.write_stream(generate_review(st.session_state.papers, api_key, topic, stream=True))
@@ -8,16 +8,32 @@ from pathlib import Path
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_MODEL = "gpt-4o"  # 主要模型
 OPENAI_MODEL_MINI = "gpt-4o-mini"  # 用于简单任务的轻量模型
+LLM_MAX_RETRIES = 3  # 瞬时错误（超时/429/5xx）的指数退避重试次数
+LLM_JSON_REPAIR_ATTEMPTS = 1  # 响应不是合法JSON时请求LLM修复的次数
+OPENAI_MAX_REQUESTS_PER_MINUTE = 500  # 并发批量请求时的RPM上限（客户端限速）
+OPENAI_MAX_TOKENS_PER_MINUTE = 200000  # 并发批量请求时的TPM上限（按估算token数限速）
 
 # 文献检索配置
 ARXIV_MAX_RESULTS = 50  # ArXiv最大检索数量
 ARXIV_SORT_BY = "relevance"  # 排序方式: relevance, lastUpdatedDate, submittedDate
+SOURCE_SEARCH_TIMEOUT = 60  # 多源检索时单个数据源的最长等待时间（秒），超时的数据源返回空结果
 
 # 相关度评分阈值
 MIN_RELEVANCE_SCORE = 0.3  # 最低相关度分数
+# 相关度打分使用的句向量模型（可选，默认关闭）：需安装sentence-transformers并设置模型名，
+# 如 "all-MiniLM-L6-v2"（首次检索时从HuggingFace下载）；置空时使用关键词匹配打分，
+# 开启后MIN_RELEVANCE_SCORE作用于关键词与语义的混合分，需按实际分数分布重新调整
+RELEVANCE_EMBEDDING_MODEL = os.getenv("RELEVANCE_EMBEDDING_MODEL", "")
+EMBEDDING_CACHE_SIZE = 10000  # 句向量的内存LRU缓存条数（按文本缓存，0为禁用）
+EMBEDDING_BATCH_SIZE = 64  # 句向量批量编码时每批的文本数（有GPU时可调大）
+SEMANTIC_RERANK_TOP_K = 200  # 只对关键词匹配度最高的前K篇计算句向量相似度，其余按关键词打分
+PAPERS_CACHE_SIMILARITY = 0.9  # 关键词与已缓存检索的句向量相似度超过该值时复用其结果（需句向量模型）
+PAPERS_CACHE_MAX_QUERIES = 100  # 每组检索条件下参与语义匹配的历史查询数上限（按命中次数淘汰）
 
 # 文献分析配置
-BATCH_SIZE = 5  # 批量处理论文数量
+BATCH_SIZE = 5  # 同时分析的论文数量（并发请求上限）
+USE_BATCH_API = False  # 是否通过OpenAI Batch API离线分析论文（半价，但最长24小时完成）
+BATCH_POLL_INTERVAL_SECONDS = 30  # Batch API任务状态轮询间隔（秒）
 MAX_PAPERS_TO_ANALYZE = 20  # 最多深度分析的论文数量
 
 # 研究想法生成配置
@@ -27,6 +43,9 @@ MAX_IDEAS_TO_GENERATE = 5  # 生成研究想法的最大数量
 CACHE_DIR = Path("cache")
 CACHE_ENABLED = True
 CACHE_EXPIRY_DAYS = 7  # 缓存过期天数
+ARXIV_CACHE_TTL_HOURS = 24  # ArXiv原始检索结果缓存有效期（小时）
+S2_CACHE_TTL_HOURS = 24  # Semantic Scholar检索结果缓存有效期（小时）
+LLM_RESPONSE_CACHE_SIZE = 128  # LLM JSON响应的内存LRU缓存条数（0为禁用）
 
 # 输出配置
 OUTPUT_DIR = Path("outputs")
@@ -42,23 +61,25 @@ OUTPUT_DIR.mkdir(exist_ok=True)
 
 # 提示词模板配置
 PROMPTS = {
-    "paper_analysis": """你是一位专业的学术研究分析专家。请仔细阅读以下论文信息，并提取结构化的分析结果。
-
-论文标题：{title}
-作者：{authors}
-摘要：{abstract}
+    # 论文分析的固定部分（角色、要求、输出格式）放在系统消息中，每次请求的前缀完全相同，
+    # 便于服务端前缀缓存；每篇论文不同的字段放在用户消息"paper_analysis"中
+    "paper_analysis_system": """你是一位专业的学术研究分析专家。请仔细阅读用户提供的论文信息，并提取结构化的分析结果。
 
 请按以下JSON格式输出分析结果：
-{{
+{
     "core_problem": "这篇论文要解决的核心问题是什么？",
     "key_method": "核心方法或技术是什么？",
     "technical_approach": "具体的技术路线和实现方式",
     "experiment_conclusions": ["主要实验结论1", "主要实验结论2"],
     "limitations": ["局限性1", "局限性2"],
     "contributions": ["贡献点1", "贡献点2"]
-}}
+}
+
+请严格按照JSON格式输出，确保输出是有效的JSON。""",
 
-请确保输出是有效的JSON格式。""",
+    "paper_analysis": """论文标题：{title}
+作者：{authors}
+摘要：{abstract}""",
     
     "landscape_analysis": """你是一位学术研究综述专家。我已经分析了多篇相关论文，现在需要你帮我梳理研究脉络。
 
@@ -71,6 +92,28 @@ PROMPTS = {
 3. 识别已解决、半解决和未解决的问题
 4. 对未解决问题按重要性和可行性排序
 
+请按以下JSON格式输出：
+{{
+    "clusters": [
+        {{"cluster_name": "聚类名称", "papers": ["paper_id1"], "key_themes": ["主题1"], "technical_evolution": "演进描述"}}
+    ],
+    "solved_problems": ["已解决问题1"],
+    "partially_solved": ["半解决问题1"],
+    "unsolved_problems": ["未解决问题1（ranked）"],
+    "technical_evolution": {{"方向1": "演进描述"}}
+}}""",
+    
+    "landscape_merge": """你是一位学术研究综述专家。以下是对同一主题下多批论文分别梳理出的研究脉络（JSON），请将它们合并为一份完整的研究脉络。
+
+分批研究脉络：
+{partial_landscapes}
+
+请完成以下任务：
+1. 合并含义相同或相近的聚类（合并其论文列表和关键主题）
+2. 整合技术演进路线
+3. 合并并去重已解决、半解决和未解决的问题（某批已解决的问题不应再出现在未解决中）
+4. 对未解决问题按重要性和可行性重新排序
+
 请按以下JSON格式输出：
 {{
     "clusters": [
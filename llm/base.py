@@ -3,10 +3,21 @@ LLM统一接入层 - 抽象基类
 支持多家LLM提供商的统一接口
 """
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional, Union
+import asyncio
+import functools
+import hashlib
+import logging
+import weakref
+from typing import List, Dict, Any, Optional, Union, Tuple, Type
 from dataclasses import dataclass
 from enum import Enum
 
+logger = logging.getLogger(__name__)
+
+# 非OpenAI模型的token数只是cl100k近似值，上下文窗口表也可能滞后于服务端，
+# 估算超过窗口时仅警告，超过该倍数才在本地拒绝
+_CONTEXT_WINDOW_MARGIN = 1.2
+
 
 class LLMProvider(Enum):
     """LLM提供商枚举"""
@@ -18,14 +29,14 @@ class LLMProvider(Enum):
     KIMI = "kimi"
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class LLMMessage:
-    """LLM消息格式"""
+    """LLM消息格式（不可变，使用__slots__减小单条消息的内存占用）"""
     role: str  # system, user, assistant
     content: str
 
 
-@dataclass
+@dataclass(slots=True)
 class LLMResponse:
     """LLM响应格式"""
     content: str
@@ -49,14 +60,68 @@ class LLMConfig:
     timeout: int = 60
     max_retries: int = 3
     
+    # 每分钟请求数上限（同一provider+base_url的实例共享），None表示不限速
+    rpm: Optional[float] = None
+    
+    # 是否在LLMResponse中保留SDK原始响应对象（默认不保留，便于及时释放连接和内存）
+    retain_raw_response: bool = False
+    
+    # 是否将系统提示词标记为可缓存（仅对支持显式前缀缓存的提供商生效，如Claude的cache_control）
+    prompt_caching: bool = True
+    
     # 成本控制
     max_cost_per_request: Optional[float] = None
     daily_budget: Optional[float] = None
 
 
+@functools.lru_cache(maxsize=128)
+def _resolve_unit_price(llm_cls: Type["BaseLLM"], model_lower: str) -> float:
+    """
+    按模型名解析单价（每token美元），结果按 (提供商类, 模型名) 缓存
+    
+    依次检查llm_cls._PRICING中的关键字，命中第一个包含于模型名的条目；
+    都未命中时返回llm_cls._DEFAULT_PRICE。
+    """
+    for model_key, price in llm_cls._PRICING:
+        if model_key in model_lower:
+            return price
+    return llm_cls._DEFAULT_PRICE
+
+
+@functools.lru_cache(maxsize=128)
+def _resolve_context_window(llm_cls: Type["BaseLLM"], model_lower: str) -> Optional[int]:
+    """按模型名解析上下文窗口大小，未知模型返回None（不做本地校验）"""
+    for model_key, window in llm_cls._CONTEXT_WINDOWS:
+        if model_key in model_lower:
+            return window
+    return None
+
+
+@functools.lru_cache(maxsize=128)
+def _get_token_encoder(model_lower: str):
+    """获取模型对应的tiktoken编码器，非OpenAI模型使用cl100k（可选依赖，不可用时返回None）"""
+    try:
+        import tiktoken
+    except Exception:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model_lower)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
 class BaseLLM(ABC):
     """LLM基类 - 定义统一接口"""
     
+    # 定价表：((模型名关键字, 每token价格), ...)，按顺序匹配，子类覆盖
+    _PRICING: Tuple[Tuple[str, float], ...] = ()
+    _DEFAULT_PRICE: float = 0.0
+    
+    # 上下文窗口表：((模型名关键字, 最大token数), ...)，按顺序匹配，子类覆盖
+    _CONTEXT_WINDOWS: Tuple[Tuple[str, int], ...] = ()
+    
     def __init__(self, config: LLMConfig):
         """
         初始化LLM客户端
@@ -67,13 +132,43 @@ class BaseLLM(ABC):
         self.config = config
         self.provider = config.provider
         self._client = None
+        # 异步客户端的连接池绑定创建它的事件循环，因此按事件循环分别缓存
+        self._aclients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = (
+            weakref.WeakKeyDictionary()
+        )
         self._init_client()
+        
+        # 限速器在_init_client之后创建，以便使用子类补全的默认base_url
+        self._rate_limiter = None
+        if config.rpm:
+            from llm.rate_limit import get_rate_limiter
+            self._rate_limiter = get_rate_limiter(
+                config.provider.value, config.base_url, config.rpm
+            )
     
     @abstractmethod
     def _init_client(self):
         """初始化具体的LLM客户端"""
         pass
     
+    def _create_async_client(self):
+        """创建异步客户端（支持原生异步接口的子类覆盖）"""
+        raise NotImplementedError(f"{type(self).__name__} does not provide an async client")
+    
+    @property
+    def _aclient(self):
+        """
+        当前事件循环的异步客户端（须在协程中调用）
+        
+        实例会被LLMFactory跨调用缓存，而同步包装多次调用asyncio.run，
+        按事件循环惰性创建可避免复用已关闭事件循环上的连接池
+        """
+        loop = asyncio.get_running_loop()
+        client = self._aclients.get(loop)
+        if client is None:
+            client = self._aclients[loop] = self._create_async_client()
+        return client
+    
     @abstractmethod
     def chat(
         self,
@@ -120,6 +215,63 @@ class BaseLLM(ABC):
         """
         pass
     
+    async def async_chat(
+        self,
+        messages: List[LLMMessage],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        json_mode: bool = False,
+        **kwargs
+    ) -> LLMResponse:
+        """
+        异步聊天接口
+        
+        默认在线程池中执行同步的chat；有原生异步SDK的子类应重写此方法
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None,
+            functools.partial(
+                self.chat,
+                messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                json_mode=json_mode,
+                **kwargs
+            )
+        )
+    
+    async def async_stream_chat(
+        self,
+        messages: List[LLMMessage],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        **kwargs
+    ):
+        """
+        异步流式聊天接口
+        
+        默认一次性返回完整结果；有原生异步SDK的子类应重写此方法
+        """
+        response = await self.async_chat(
+            messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        )
+        if response.content:
+            yield response.content
+    
+    def _throttle(self):
+        """发送请求前获取限速令牌（未配置rpm时直接返回）"""
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire()
+    
+    async def _athrottle(self):
+        """异步版本的_throttle"""
+        if self._rate_limiter is not None:
+            await self._rate_limiter.acquire_async()
+    
     def _prepare_messages(self, messages: List[LLMMessage]) -> List[Dict[str, str]]:
         """
         准备消息格式（转换为API需要的格式）
@@ -134,7 +286,7 @@ class BaseLLM(ABC):
     
     def _calculate_cost(self, tokens_used: int) -> float:
         """
-        计算成本（子类可重写以支持不同的定价）
+        计算成本（按子类的_PRICING定价表）
         
         Args:
             tokens_used: 使用的token数
@@ -142,8 +294,57 @@ class BaseLLM(ABC):
         Returns:
             成本（美元）
         """
-        # 默认简单实现，子类应该重写
-        return 0.0
+        if not tokens_used:
+            return 0.0
+        return tokens_used * _resolve_unit_price(type(self), self.config.model.lower())
+    
+    def estimate_prompt_tokens(self, messages: List[LLMMessage]) -> Optional[int]:
+        """
+        本地估算消息的token数（需要安装tiktoken）
+        
+        Args:
+            messages: 消息列表（LLMMessage或字典格式）
+        
+        Returns:
+            估算的token数；tiktoken不可用时返回None
+        """
+        encoder = _get_token_encoder(self.config.model.lower())
+        if encoder is None:
+            return None
+        
+        total = 0
+        for msg in messages:
+            content = msg["content"] if isinstance(msg, dict) else msg.content
+            total += len(encoder.encode(content or ""))
+        # 每条消息约有4个token的格式开销
+        return total + 4 * len(messages)
+    
+    def _check_context_window(self, messages: List[LLMMessage], max_tokens: Optional[int]):
+        """
+        发送前校验请求是否超出模型上下文窗口
+        
+        OpenAI模型的本地计数准确，超出时直接抛出ValueError，避免白白消耗网络往返和重试等待；
+        其他模型只在超出_CONTEXT_WINDOW_MARGIN倍窗口时拒绝，否则仅记录警告，交由服务端判断
+        """
+        window = _resolve_context_window(type(self), self.config.model.lower())
+        if window is None:
+            return
+        
+        prompt_tokens = self.estimate_prompt_tokens(messages)
+        if prompt_tokens is None:
+            return
+        
+        requested = prompt_tokens + (max_tokens or 0)
+        if requested <= window:
+            return
+        
+        message = (
+            f"Request exceeds context window of {self.config.model}: "
+            f"~{prompt_tokens} prompt tokens + {max_tokens or 0} max_tokens > {window}"
+        )
+        if self.provider == LLMProvider.OPENAI or requested > window * _CONTEXT_WINDOW_MARGIN:
+            raise ValueError(message)
+        logger.warning(message)
     
     def _validate_budget(self, estimated_cost: float) -> bool:
         """
@@ -172,7 +373,8 @@ class BaseLLM(ABC):
 class LLMFactory:
     """LLM工厂类 - 创建和管理LLM实例"""
     
-    _instances: Dict[str, BaseLLM] = {}
+    # 弱引用缓存：实例不再被外部引用时自动回收（连同其HTTP连接池）
+    _instances: "weakref.WeakValueDictionary[tuple, BaseLLM]" = weakref.WeakValueDictionary()
     
     @classmethod
     def create(cls, config: LLMConfig) -> BaseLLM:
@@ -222,12 +424,22 @@ class LLMFactory:
         Returns:
             LLM实例
         """
-        key = f"{config.provider.value}:{config.model}"
+        key = cls._instance_key(config)
         
-        if key not in cls._instances:
-            cls._instances[key] = cls.create(config)
+        instance = cls._instances.get(key)
+        if instance is None:
+            instance = cls.create(config)
+            cls._instances[key] = instance
         
-        return cls._instances[key]
+        return instance
+    
+    @staticmethod
+    def _instance_key(config: LLMConfig) -> tuple:
+        """实例缓存键（api_key只保留摘要，避免明文常驻内存）"""
+        key_digest = hashlib.blake2b(
+            (config.api_key or "").encode(), digest_size=8
+        ).digest()
+        return (config.provider, config.model, config.base_url, key_digest)
     
     @classmethod
     def clear_instances(cls):
@@ -3,12 +3,24 @@ Claude LLM适配器 (Anthropic)
 """
 from typing import List, Optional
 from llm.base import BaseLLM, LLMMessage, LLMResponse, LLMProvider
+import asyncio
 import time
 
 
 class ClaudeLLM(BaseLLM):
     """Claude LLM实现"""
     
+    _PRICING = (
+        ("claude-3-5-sonnet", 0.003 / 1000),
+        ("claude-3-opus", 0.015 / 1000),
+        ("claude-3-haiku", 0.00025 / 1000),
+    )
+    _DEFAULT_PRICE = 0.003 / 1000
+    
+    _CONTEXT_WINDOWS = (
+        ("claude-3", 200000),
+    )
+    
     def _init_client(self):
         """初始化Claude客户端"""
         try:
@@ -20,18 +32,28 @@ class ClaudeLLM(BaseLLM):
         except ImportError:
             raise ImportError("请安装anthropic库: pip install anthropic")
     
-    def chat(
+    def _create_async_client(self):
+        """创建当前事件循环的异步客户端"""
+        from anthropic import AsyncAnthropic
+        return AsyncAnthropic(
+            api_key=self.config.api_key,
+            timeout=self.config.timeout
+        )
+    
+    def _build_params(
         self,
         messages: List[LLMMessage],
-        temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None,
-        json_mode: bool = False,
+        temperature: Optional[float],
+        max_tokens: Optional[int],
         **kwargs
-    ) -> LLMResponse:
-        """Claude聊天接口"""
+    ) -> dict:
+        """构建请求参数（同步/异步共用）"""
         temp = temperature if temperature is not None else self.config.temperature
         tokens = max_tokens if max_tokens is not None else self.config.max_tokens or 4096
         
+        # 超出上下文窗口的请求在本地直接拒绝
+        self._check_context_window(messages, tokens)
+        
         # Claude API格式略有不同
         system_message = None
         user_messages = []
@@ -50,31 +72,56 @@ class ClaudeLLM(BaseLLM):
         }
         
         if system_message:
-            params["system"] = system_message
+            if self.config.prompt_caching:
+                # 系统提示词在同一模块的多次调用间保持不变，标记为可缓存前缀
+                params["system"] = [{
+                    "type": "text",
+                    "text": system_message,
+                    "cache_control": {"type": "ephemeral"}
+                }]
+            else:
+                params["system"] = system_message
         
         params.update(kwargs)
         
+        return params
+    
+    def _to_llm_response(self, response) -> LLMResponse:
+        """将API响应转换为LLMResponse"""
+        content = response.content[0].text
+        tokens_used = response.usage.input_tokens + response.usage.output_tokens
+        finish_reason = response.stop_reason
+        
+        cost = self._calculate_cost(tokens_used)
+        
+        return LLMResponse(
+            content=content,
+            model=self.config.model,
+            provider=LLMProvider.CLAUDE,
+            tokens_used=tokens_used,
+            cost=cost,
+            finish_reason=finish_reason,
+            raw_response=response if self.config.retain_raw_response else None
+        )
+    
+    def chat(
+        self,
+        messages: List[LLMMessage],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        json_mode: bool = False,
+        **kwargs
+    ) -> LLMResponse:
+        """Claude聊天接口"""
+        params = self._build_params(messages, temperature, max_tokens, **kwargs)
+        
         # 重试机制
         last_error = None
         for attempt in range(self.config.max_retries):
             try:
+                self._throttle()
                 response = self._client.messages.create(**params)
-                
-                content = response.content[0].text
-                tokens_used = response.usage.input_tokens + response.usage.output_tokens
-                finish_reason = response.stop_reason
-                
-                cost = self._calculate_cost(tokens_used)
-                
-                return LLMResponse(
-                    content=content,
-                    model=self.config.model,
-                    provider=LLMProvider.CLAUDE,
-                    tokens_used=tokens_used,
-                    cost=cost,
-                    finish_reason=finish_reason,
-                    raw_response=response
-                )
+                return self._to_llm_response(response)
                 
             except Exception as e:
                 last_error = e
@@ -86,6 +133,33 @@ class ClaudeLLM(BaseLLM):
         
         raise Exception(f"Claude API call failed after {self.config.max_retries} retries: {last_error}")
     
+    async def async_chat(
+        self,
+        messages: List[LLMMessage],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        json_mode: bool = False,
+        **kwargs
+    ) -> LLMResponse:
+        """Claude异步聊天接口"""
+        params = self._build_params(messages, temperature, max_tokens, **kwargs)
+        
+        last_error = None
+        for attempt in range(self.config.max_retries):
+            try:
+                await self._athrottle()
+                response = await self._aclient.messages.create(**params)
+                return self._to_llm_response(response)
+                
+            except Exception as e:
+                last_error = e
+                if attempt < self.config.max_retries - 1:
+                    await asyncio.sleep(2 ** attempt)
+                    continue
+                break
+        
+        raise Exception(f"Claude API call failed after {self.config.max_retries} retries: {last_error}")
+    
     def stream_chat(
         self,
         messages: List[LLMMessage],
@@ -94,45 +168,24 @@ class ClaudeLLM(BaseLLM):
         **kwargs
     ):
         """Claude流式聊天接口"""
-        temp = temperature if temperature is not None else self.config.temperature
-        tokens = max_tokens if max_tokens is not None else self.config.max_tokens or 4096
-        
-        system_message = None
-        user_messages = []
-        
-        for msg in messages:
-            if msg.role == "system":
-                system_message = msg.content
-            else:
-                user_messages.append({"role": msg.role, "content": msg.content})
-        
-        params = {
-            "model": self.config.model,
-            "messages": user_messages,
-            "max_tokens": tokens,
-            "temperature": temp,
-            "stream": True,
-        }
-        
-        if system_message:
-            params["system"] = system_message
-        
-        params.update(kwargs)
+        params = self._build_params(messages, temperature, max_tokens, **kwargs)
         
+        self._throttle()
         with self._client.messages.stream(**params) as stream:
             for text in stream.text_stream:
                 yield text
     
-    def _calculate_cost(self, tokens_used: int) -> float:
-        """计算Claude成本"""
-        pricing = {
-            "claude-3-5-sonnet": 0.003 / 1000,
-            "claude-3-opus": 0.015 / 1000,
-            "claude-3-haiku": 0.00025 / 1000,
-        }
-        
-        for model_key, price in pricing.items():
-            if model_key in self.config.model.lower():
-                return tokens_used * price
+    async def async_stream_chat(
+        self,
+        messages: List[LLMMessage],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        **kwargs
+    ):
+        """Claude异步流式聊天接口"""
+        params = self._build_params(messages, temperature, max_tokens, **kwargs)
         
-        return tokens_used * 0.003 / 1000
+        await self._athrottle()
+        async with self._aclient.messages.stream(**params) as stream:
+            async for text in stream.text_stream:
+                yield text
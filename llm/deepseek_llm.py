@@ -9,6 +9,18 @@ from llm.base import LLMConfig, LLMProvider
 class DeepSeekLLM(OpenAILLM):
     """DeepSeek LLM实现（基于OpenAI兼容API）"""
     
+    # DeepSeek定价（示例，需要根据实际调整），通常比OpenAI便宜很多
+    _PRICING = (
+        ("deepseek-chat", 0.00014 / 1000),  # 约 $0.14 per 1M tokens
+        ("deepseek-coder", 0.00014 / 1000),
+    )
+    _DEFAULT_PRICE = 0.00014 / 1000
+    
+    _CONTEXT_WINDOWS = (
+        ("deepseek-chat", 128000),
+        ("deepseek-coder", 128000),
+    )
+    
     def _init_client(self):
         """初始化DeepSeek客户端"""
         # DeepSeek使用OpenAI兼容API
@@ -16,21 +28,3 @@ class DeepSeekLLM(OpenAILLM):
             self.config.base_url = "https://api.deepseek.com/v1"
         
         super()._init_client()
-    
-    def _calculate_cost(self, tokens_used: int) -> float:
-        """
-        计算DeepSeek成本
-        DeepSeek的定价通常比OpenAI便宜很多
-        """
-        # DeepSeek定价（示例，需要根据实际调整）
-        pricing = {
-            "deepseek-chat": 0.00014 / 1000,  # 约 $0.14 per 1M tokens
-            "deepseek-coder": 0.00014 / 1000,
-        }
-        
-        for model_key, price in pricing.items():
-            if model_key in self.config.model.lower():
-                return tokens_used * price
-        
-        # 默认定价
-        return tokens_used * 0.00014 / 1000
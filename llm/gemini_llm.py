@@ -1,14 +1,57 @@
 """
 Gemini LLM适配器 (Google)
 """
-from typing import List, Optional
+from typing import List, Optional, Tuple, Dict, Any
 from llm.base import BaseLLM, LLMMessage, LLMResponse, LLMProvider
+import threading
 import time
 
 
+# Gemini使用 "model" 表示助手角色
+_GEMINI_ROLES = {"user": "user", "assistant": "model"}
+
+
+def _split_messages(
+    messages: List[LLMMessage]
+) -> Tuple[Optional[str], List[Dict[str, Any]], Optional[str]]:
+    """
+    一次遍历拆分消息
+    
+    Returns:
+        (system_instruction, 历史消息（Gemini格式，不含最后一条）, 最后一条消息内容)
+    """
+    system_instruction = None
+    chat_history = []
+    
+    for msg in messages:
+        if msg.role == "system":
+            system_instruction = msg.content
+        else:
+            role = _GEMINI_ROLES.get(msg.role)
+            if role:
+                chat_history.append({"role": role, "parts": [msg.content]})
+    
+    if not chat_history:
+        return system_instruction, [], None
+    
+    return system_instruction, chat_history[:-1], chat_history[-1]["parts"][0]
+
+
+def _session_key(system_instruction: Optional[str], history: List[Dict[str, Any]]) -> tuple:
+    """会话缓存键：system指令 + 历史消息序列"""
+    return (system_instruction, tuple((h["role"], h["parts"][0]) for h in history))
+
+
 class GeminiLLM(BaseLLM):
     """Gemini LLM实现"""
     
+    # Gemini定价（按字符计费，这里简化处理）
+    _PRICING = (
+        ("gemini-1.5-pro", 0.00125 / 1000),
+        ("gemini-1.5-flash", 0.000075 / 1000),
+    )
+    _DEFAULT_PRICE = 0.0
+    
     def _init_client(self):
         """初始化Gemini客户端"""
         try:
@@ -18,6 +61,36 @@ class GeminiLLM(BaseLLM):
             self._genai = genai
         except ImportError:
             raise ImportError("请安装google-generativeai库: pip install google-generativeai")
+        
+        # 最近一次多轮对话的ChatSession，历史未变化时复用以避免重新提交历史
+        self._chat_session = None
+        self._chat_session_key = None
+        self._session_lock = threading.Lock()
+    
+    def _get_model(self, system_instruction: Optional[str]):
+        """获取（带system指令的）GenerativeModel"""
+        if not system_instruction:
+            return self._client
+        return self._genai.GenerativeModel(
+            self.config.model,
+            system_instruction=system_instruction
+        )
+    
+    def _take_session(self, key: tuple):
+        """取出与历史匹配的缓存会话（取出后其他并发调用不会再拿到）"""
+        with self._session_lock:
+            if self._chat_session is not None and self._chat_session_key == key:
+                session = self._chat_session
+                self._chat_session = None
+                self._chat_session_key = None
+                return session
+        return None
+    
+    def _store_session(self, key: tuple, session):
+        """缓存会话供下一轮对话复用"""
+        with self._session_lock:
+            self._chat_session = session
+            self._chat_session_key = key
     
     def chat(
         self,
@@ -31,17 +104,8 @@ class GeminiLLM(BaseLLM):
         temp = temperature if temperature is not None else self.config.temperature
         tokens = max_tokens if max_tokens is not None else self.config.max_tokens
         
-        # Gemini格式：需要分离system和user消息
-        system_instruction = None
-        chat_history = []
-        
-        for i, msg in enumerate(messages):
-            if msg.role == "system":
-                system_instruction = msg.content
-            elif msg.role == "user":
-                chat_history.append({"role": "user", "parts": [msg.content]})
-            elif msg.role == "assistant":
-                chat_history.append({"role": "model", "parts": [msg.content]})
+        # Gemini格式：需要分离system、历史消息和最后一条消息
+        system_instruction, history, last_message = _split_messages(messages)
         
         # 配置生成参数
         generation_config = {
@@ -58,26 +122,33 @@ class GeminiLLM(BaseLLM):
         last_error = None
         for attempt in range(self.config.max_retries):
             try:
-                # 创建chat session
-                if system_instruction:
-                    model = self._genai.GenerativeModel(
-                        self.config.model,
-                        system_instruction=system_instruction
-                    )
-                else:
-                    model = self._client
+                self._throttle()
+                
+                model = self._get_model(system_instruction)
                 
                 # 如果有历史消息，使用chat模式
-                if len(chat_history) > 1:
-                    chat = model.start_chat(history=chat_history[:-1])
+                if history:
+                    key = _session_key(system_instruction, history)
+                    chat = self._take_session(key) or model.start_chat(history=history)
                     response = chat.send_message(
-                        chat_history[-1]["parts"][0],
+                        last_message,
                         generation_config=generation_config
                     )
+                    # 保存会话，下一轮对话（历史 = 本轮历史 + 本轮问答）可直接复用
+                    self._store_session(
+                        _session_key(
+                            system_instruction,
+                            history + [
+                                {"role": "user", "parts": [last_message]},
+                                {"role": "model", "parts": [response.text]},
+                            ]
+                        ),
+                        chat
+                    )
                 else:
                     # 单次生成
                     response = model.generate_content(
-                        chat_history[0]["parts"][0] if chat_history else "",
+                        last_message or "",
                         generation_config=generation_config
                     )
                 
@@ -94,7 +165,7 @@ class GeminiLLM(BaseLLM):
                     tokens_used=tokens_used,
                     cost=cost,
                     finish_reason=finish_reason,
-                    raw_response=response
+                    raw_response=response if self.config.retain_raw_response else None
                 )
                 
             except Exception as e:
@@ -118,31 +189,17 @@ class GeminiLLM(BaseLLM):
         temp = temperature if temperature is not None else self.config.temperature
         tokens = max_tokens if max_tokens is not None else self.config.max_tokens
         
-        system_instruction = None
-        chat_history = []
-        
-        for msg in messages:
-            if msg.role == "system":
-                system_instruction = msg.content
-            elif msg.role == "user":
-                chat_history.append({"role": "user", "parts": [msg.content]})
-            elif msg.role == "assistant":
-                chat_history.append({"role": "model", "parts": [msg.content]})
+        system_instruction, _, last_message = _split_messages(messages)
         
         generation_config = {"temperature": temp}
         if tokens:
             generation_config["max_output_tokens"] = tokens
         
-        if system_instruction:
-            model = self._genai.GenerativeModel(
-                self.config.model,
-                system_instruction=system_instruction
-            )
-        else:
-            model = self._client
+        model = self._get_model(system_instruction)
         
+        self._throttle()
         response = model.generate_content(
-            chat_history[-1]["parts"][0] if chat_history else "",
+            last_message or "",
             generation_config=generation_config,
             stream=True
         )
@@ -150,17 +207,3 @@ class GeminiLLM(BaseLLM):
         for chunk in response:
             if chunk.text:
                 yield chunk.text
-    
-    def _calculate_cost(self, tokens_used: int) -> float:
-        """计算Gemini成本"""
-        # Gemini定价（按字符计费，这里简化处理）
-        pricing = {
-            "gemini-1.5-pro": 0.00125 / 1000,
-            "gemini-1.5-flash": 0.000075 / 1000,
-        }
-        
-        for model_key, price in pricing.items():
-            if model_key in self.config.model.lower():
-                return tokens_used * price if tokens_used else 0.0
-        
-        return 0.0
@@ -1,7 +1,13 @@
 """
 LLM管理器 - 简化业务代码中的LLM使用
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+import asyncio
+import json
+import queue
+import threading
+import time
 from llm.base import (
     BaseLLM, LLMFactory, LLMConfig, LLMProvider,
     LLMMessage, LLMResponse
@@ -11,12 +17,136 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+class _ChatCoalescer:
+    """
+    请求合并器 - 在短时间窗口内收集并发的chat调用，合并相同请求后派发到线程池
+    
+    同一窗口内参数完全相同的请求只执行一次，结果共享给所有调用方；
+    真正的网络调用由固定大小的线程池执行，突发流量下可以限制并发连接数。
+    """
+    
+    def __init__(
+        self,
+        handler: Callable[..., LLMResponse],
+        window_ms: float = 5,
+        max_batch: int = 32,
+        max_workers: Optional[int] = None
+    ):
+        """
+        Args:
+            handler: 实际执行单次请求的函数
+            window_ms: 合并窗口（毫秒）
+            max_batch: 单批最大请求数
+            max_workers: 线程池大小（默认等于max_batch）
+        """
+        self._handler = handler
+        self._window = window_ms / 1000
+        self._max_batch = max_batch
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or max_batch,
+            thread_name_prefix="llm-coalesce"
+        )
+        self._thread = threading.Thread(
+            target=self._run, name="llm-coalescer", daemon=True
+        )
+        self._thread.start()
+    
+    def submit(self, **kwargs) -> Optional[Future]:
+        """提交一次请求，返回Future；合并器已关闭时返回None（调用方应直接执行请求）"""
+        future: Future = Future()
+        with self._lock:
+            # 与close()互斥：保证不会有请求排在结束标记之后
+            if self._closed:
+                return None
+            self._queue.put((future, kwargs))
+        return future
+    
+    def close(self):
+        """停止派发线程并等待已派发的请求完成"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+        
+        # 兜底：结束标记之后不应再有请求，若有则让调用方立即失败而不是永久等待
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[0].set_exception(RuntimeError("LLM request coalescer closed"))
+    
+    def _run(self):
+        """派发循环：阻塞等待首个请求，然后在窗口期内尽量凑满一批"""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            
+            batch = [item]
+            deadline = time.monotonic() + self._window
+            while len(batch) < self._max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            # 参数相同的请求合并为一次调用
+            groups: Dict[Any, List[Future]] = {}
+            requests: Dict[Any, Dict[str, Any]] = {}
+            for future, kwargs in batch:
+                key = self._request_key(kwargs)
+                groups.setdefault(key, []).append(future)
+                requests.setdefault(key, kwargs)
+            
+            for key, futures in groups.items():
+                self._executor.submit(self._execute, futures, requests[key])
+    
+    @staticmethod
+    def _request_key(kwargs: Dict[str, Any]) -> Any:
+        """请求的合并键；参数无法序列化时返回唯一对象（不参与合并）"""
+        try:
+            return json.dumps(kwargs, sort_keys=True, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return object()
+    
+    def _execute(self, futures: List[Future], kwargs: Dict[str, Any]):
+        """在线程池中执行一次请求并回填所有合并到它的Future"""
+        futures = [f for f in futures if f.set_running_or_notify_cancel()]
+        if not futures:
+            return
+        try:
+            result = self._handler(**kwargs)
+        except BaseException as e:
+            for future in futures:
+                future.set_exception(e)
+        else:
+            for future in futures:
+                future.set_result(result)
+
+
 class LLMManager:
     """LLM管理器 - 统一管理多个LLM实例"""
     
     def __init__(self):
         self._llms: Dict[str, BaseLLM] = {}
         self._default_llm: Optional[str] = None
+        self._coalescer: Optional[_ChatCoalescer] = None
     
     def register_llm(
         self,
@@ -103,6 +233,39 @@ class LLMManager:
         Returns:
             LLM响应
         """
+        coalescer = self._coalescer
+        if coalescer is not None:
+            # 已开启请求合并：入队后等待派发线程执行（合并器恰好被关闭时直接执行）
+            future = coalescer.submit(
+                messages=messages,
+                llm_name=llm_name,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                json_mode=json_mode,
+                **kwargs
+            )
+            if future is not None:
+                return future.result()
+        
+        return self._chat(
+            messages,
+            llm_name=llm_name,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            json_mode=json_mode,
+            **kwargs
+        )
+    
+    def _chat(
+        self,
+        messages: List[Dict[str, str]],
+        llm_name: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        json_mode: bool = False,
+        **kwargs
+    ) -> LLMResponse:
+        """执行单次聊天请求（不经过请求合并）"""
         llm = self.get_llm(llm_name)
         
         # 转换消息格式
@@ -119,35 +282,100 @@ class LLMManager:
                 json_mode=json_mode,
                 **kwargs
             )
-            
-            # 记录指标
-            try:
-                from backend.monitoring import metrics
+        except Exception:
+            self._record_metrics(llm)
+            raise
+        
+        self._record_metrics(llm, response)
+        return response
+    
+    @staticmethod
+    def _record_metrics(llm: BaseLLM, response: Optional[LLMResponse] = None):
+        """
+        记录一次LLM调用的指标（response为None表示调用失败；指标模块不可用时忽略）
+        
+        LLMResponse只有总token数，统一计入input_tokens
+        """
+        try:
+            from backend.monitoring import metrics
+            if response is None:
                 metrics.record_llm_call(
                     provider=llm.config.provider.value,
                     model=llm.config.model,
-                    input_tokens=response.input_tokens,
-                    output_tokens=response.output_tokens,
-                    cost=response.cost,
-                    success=True
+                    success=False
                 )
-            except Exception:
-                pass  # 不影响主流程
-            
-            return response
-            
-        except Exception as e:
-            # 记录失败
-            try:
-                from backend.monitoring import metrics
+            else:
                 metrics.record_llm_call(
                     provider=llm.config.provider.value,
                     model=llm.config.model,
-                    success=False
+                    input_tokens=response.tokens_used or 0,
+                    cost=response.cost or 0.0,
+                    success=True
                 )
-            except Exception:
-                pass
+        except Exception:
+            pass  # 不影响主流程
+    
+    async def async_chat(
+        self,
+        messages: List[Dict[str, str]],
+        llm_name: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        json_mode: bool = False,
+        **kwargs
+    ) -> LLMResponse:
+        """
+        异步聊天接口（参数同chat）
+        
+        Returns:
+            LLM响应
+        """
+        llm = self.get_llm(llm_name)
+        
+        llm_messages = [
+            LLMMessage(role=msg["role"], content=msg["content"])
+            for msg in messages
+        ]
+        
+        try:
+            response = await llm.async_chat(
+                messages=llm_messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                json_mode=json_mode,
+                **kwargs
+            )
+        except Exception:
+            self._record_metrics(llm)
             raise
+        
+        self._record_metrics(llm, response)
+        return response
+    
+    async def abatch_chat(
+        self,
+        batch_messages: List[List[Dict[str, str]]],
+        llm_name: Optional[str] = None,
+        return_exceptions: bool = False,
+        **kwargs
+    ) -> List[LLMResponse]:
+        """
+        并发执行多组对话（单个事件循环内复用连接）
+        
+        Args:
+            batch_messages: 多组消息列表
+            llm_name: 使用的LLM名称
+            return_exceptions: 为True时失败项以异常对象返回，而不是直接抛出
+            **kwargs: 传给async_chat的其他参数
+        
+        Returns:
+            与输入顺序一致的LLM响应列表
+        """
+        return await asyncio.gather(
+            *(self.async_chat(messages, llm_name=llm_name, **kwargs)
+              for messages in batch_messages),
+            return_exceptions=return_exceptions
+        )
     
     def stream_chat(
         self,
@@ -184,10 +412,83 @@ class LLMManager:
             **kwargs
         )
     
+    async def async_stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        llm_name: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        **kwargs
+    ):
+        """
+        异步流式聊天接口
+        
+        Yields:
+            内容片段
+        """
+        llm = self.get_llm(llm_name)
+        
+        llm_messages = [
+            LLMMessage(role=msg["role"], content=msg["content"])
+            for msg in messages
+        ]
+        
+        async for piece in llm.async_stream_chat(
+            messages=llm_messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        ):
+            yield piece
+    
+    def enable_coalescing(
+        self,
+        window_ms: float = 5,
+        max_batch: int = 32,
+        max_workers: Optional[int] = None
+    ):
+        """
+        开启请求合并：在window_ms窗口内收集并发的chat调用，参数相同的请求只执行一次，
+        其余派发到线程池
+        
+        适用于多个工作线程同时发起大量（可能重复的）请求的场景；单线程串行调用无需开启。
+        
+        Args:
+            window_ms: 合并窗口（毫秒）
+            max_batch: 单批最大请求数
+            max_workers: 执行请求的线程数（默认等于max_batch）
+        """
+        self.disable_coalescing()
+        self._coalescer = _ChatCoalescer(
+            self._chat,
+            window_ms=window_ms,
+            max_batch=max_batch,
+            max_workers=max_workers
+        )
+        logger.info(f"LLM request coalescing enabled (window={window_ms}ms, max_batch={max_batch})")
+    
+    def disable_coalescing(self):
+        """关闭请求合并（等待已派发的请求完成）"""
+        coalescer, self._coalescer = self._coalescer, None
+        if coalescer is not None:
+            coalescer.close()
+    
+    def unregister_llm(self, name: str):
+        """注销LLM实例（不存在时忽略）；注销的是默认LLM时改用剩余的第一个"""
+        if self._llms.pop(name, None) is None:
+            return
+        if self._default_llm == name:
+            self._default_llm = next(iter(self._llms), None)
+        logger.info(f"Unregistered LLM: {name}")
+    
     def list_llms(self) -> List[str]:
         """列出所有已注册的LLM"""
         return list(self._llms.keys())
     
+    def has_llm(self, name: str) -> bool:
+        """是否已注册指定名称的LLM"""
+        return name in self._llms
+    
     def get_default_llm_name(self) -> Optional[str]:
         """获取默认LLM名称"""
         return self._default_llm
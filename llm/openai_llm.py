@@ -2,29 +2,58 @@
 OpenAI LLM适配器
 """
 from typing import List, Optional
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from llm.base import BaseLLM, LLMMessage, LLMResponse, LLMConfig, LLMProvider
+import asyncio
+import io
 import time
+from urllib.parse import urlsplit
+
+
+# 国内服务域名（访问时不走代理）
+_DOMESTIC_DOMAINS = frozenset({
+    "deepseek.com",
+    "aliyuncs.com",
+    "moonshot.cn",
+    "volces.com",
+})
+
+
+def _is_domestic_host(base_url: Optional[str]) -> bool:
+    """判断base_url的主机名是否属于国内服务（按域名后缀匹配，而非子串）"""
+    if not base_url:
+        return False
+    host = (urlsplit(base_url).hostname or "").lower()
+    return any(
+        host == domain or host.endswith("." + domain)
+        for domain in _DOMESTIC_DOMAINS
+    )
 
 
 class OpenAILLM(BaseLLM):
     """OpenAI LLM实现"""
     
+    # 简化的定价模型（实际应该区分输入/输出token），价格基于gpt-4o和gpt-4o-mini的定价
+    _PRICING = (
+        ("gpt-4o", 0.005 / 1000),  # $5 per 1M tokens (平均)
+        ("gpt-4o-mini", 0.00015 / 1000),  # $0.15 per 1M tokens (平均)
+        ("gpt-4-turbo", 0.01 / 1000),
+        ("gpt-3.5-turbo", 0.0005 / 1000),
+    )
+    _DEFAULT_PRICE = 0.005 / 1000  # 默认使用gpt-4o定价
+    
+    _CONTEXT_WINDOWS = (
+        ("gpt-4o", 128000),
+        ("gpt-4-turbo", 128000),
+        ("gpt-3.5-turbo", 16385),
+    )
+    
     def _init_client(self):
         """初始化OpenAI客户端"""
         import httpx
         
         # 检查是否为国内服务（不需要代理）
-        is_domestic = False
-        if self.config.base_url:
-            domestic_domains = [
-                "deepseek.com", 
-                "aliyuncs.com", 
-                "moonshot.cn", 
-                "volces.com"
-            ]
-            if any(domain in self.config.base_url for domain in domestic_domains):
-                is_domestic = True
+        is_domestic = _is_domestic_host(self.config.base_url)
         
         # 如果是国内服务，显式禁用代理
         http_client = None
@@ -38,18 +67,36 @@ class OpenAILLM(BaseLLM):
             http_client=http_client
         )
     
-    def chat(
+    def _create_async_client(self):
+        """创建当前事件循环的异步客户端（同一事件循环内并发复用连接）"""
+        import httpx
+        
+        async_http_client = None
+        if _is_domestic_host(self.config.base_url):
+            async_http_client = httpx.AsyncClient(trust_env=False)
+        
+        return AsyncOpenAI(
+            api_key=self.config.api_key,
+            base_url=self.config.base_url,
+            timeout=self.config.timeout,
+            http_client=async_http_client
+        )
+    
+    def _build_chat_params(
         self,
         messages: List[LLMMessage],
-        temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None,
-        json_mode: bool = False,
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        json_mode: bool,
         **kwargs
-    ) -> LLMResponse:
-        """OpenAI聊天接口"""
+    ) -> dict:
+        """构建chat请求参数（同步/异步共用）"""
         temp = temperature if temperature is not None else self.config.temperature
         tokens = max_tokens if max_tokens is not None else self.config.max_tokens
         
+        # 超出上下文窗口的请求在本地直接拒绝
+        self._check_context_window(messages, tokens)
+        
         # 准备消息
         formatted_messages = self._prepare_messages(messages)
         
@@ -69,29 +116,48 @@ class OpenAILLM(BaseLLM):
         # 添加额外参数
         params.update(kwargs)
         
+        return params
+    
+    def _to_llm_response(self, response) -> LLMResponse:
+        """将API响应转换为LLMResponse"""
+        # 提取响应内容
+        content = response.choices[0].message.content
+        tokens_used = response.usage.total_tokens if response.usage else None
+        finish_reason = response.choices[0].finish_reason
+        
+        # 计算成本
+        cost = self._calculate_cost(tokens_used) if tokens_used else None
+        
+        return LLMResponse(
+            content=content,
+            model=self.config.model,
+            provider=LLMProvider.OPENAI,
+            tokens_used=tokens_used,
+            cost=cost,
+            finish_reason=finish_reason,
+            raw_response=response if self.config.retain_raw_response else None
+        )
+    
+    def chat(
+        self,
+        messages: List[LLMMessage],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        json_mode: bool = False,
+        **kwargs
+    ) -> LLMResponse:
+        """OpenAI聊天接口"""
+        params = self._build_chat_params(
+            messages, temperature, max_tokens, json_mode, **kwargs
+        )
+        
         # 重试机制
         last_error = None
         for attempt in range(self.config.max_retries):
             try:
+                self._throttle()
                 response = self._client.chat.completions.create(**params)
-                
-                # 提取响应内容
-                content = response.choices[0].message.content
-                tokens_used = response.usage.total_tokens if response.usage else None
-                finish_reason = response.choices[0].finish_reason
-                
-                # 计算成本
-                cost = self._calculate_cost(tokens_used) if tokens_used else None
-                
-                return LLMResponse(
-                    content=content,
-                    model=self.config.model,
-                    provider=LLMProvider.OPENAI,
-                    tokens_used=tokens_used,
-                    cost=cost,
-                    finish_reason=finish_reason,
-                    raw_response=response
-                )
+                return self._to_llm_response(response)
                 
             except Exception as e:
                 last_error = e
@@ -104,54 +170,103 @@ class OpenAILLM(BaseLLM):
         
         raise Exception(f"OpenAI API call failed after {self.config.max_retries} retries: {last_error}")
     
-    def stream_chat(
+    async def async_chat(
         self,
         messages: List[LLMMessage],
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
+        json_mode: bool = False,
         **kwargs
-    ):
-        """OpenAI流式聊天接口"""
-        temp = temperature if temperature is not None else self.config.temperature
-        tokens = max_tokens if max_tokens is not None else self.config.max_tokens
-        
-        formatted_messages = self._prepare_messages(messages)
+    ) -> LLMResponse:
+        """OpenAI异步聊天接口"""
+        params = self._build_chat_params(
+            messages, temperature, max_tokens, json_mode, **kwargs
+        )
         
-        params = {
-            "model": self.config.model,
-            "messages": formatted_messages,
-            "temperature": temp,
-            "stream": True,
-        }
+        last_error = None
+        for attempt in range(self.config.max_retries):
+            try:
+                await self._athrottle()
+                response = await self._aclient.chat.completions.create(**params)
+                return self._to_llm_response(response)
+                
+            except Exception as e:
+                last_error = e
+                if attempt < self.config.max_retries - 1:
+                    await asyncio.sleep(2 ** attempt)
+                    continue
+                break
         
-        if tokens:
-            params["max_tokens"] = tokens
+        raise Exception(f"OpenAI API call failed after {self.config.max_retries} retries: {last_error}")
+    
+    def stream_chat(
+        self,
+        messages: List[LLMMessage],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        coalesce_bytes: int = 0,
+        **kwargs
+    ):
+        """
+        OpenAI流式聊天接口
         
-        params.update(kwargs)
+        Args:
+            coalesce_bytes: 合并输出的阈值（字符数）。为0时逐token输出；
+                大于0时累积到该长度或流结束时才输出一次，减少下游处理次数
+        """
+        params = self._build_chat_params(
+            messages, temperature, max_tokens, False, stream=True, **kwargs
+        )
         
+        self._throttle()
         response = self._client.chat.completions.create(**params)
         
+        buf = io.StringIO()
         for chunk in response:
-            if chunk.choices[0].delta.content:
-                yield chunk.choices[0].delta.content
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.delta.content:
+                buf.write(choice.delta.content)
+            if buf.tell() and (
+                buf.tell() >= coalesce_bytes or choice.finish_reason
+            ):
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate(0)
+        
+        if buf.tell():
+            yield buf.getvalue()
     
-    def _calculate_cost(self, tokens_used: int) -> float:
-        """
-        计算OpenAI成本
-        价格基于gpt-4o和gpt-4o-mini的定价
-        """
-        # 简化的定价模型（实际应该区分输入/输出token）
-        pricing = {
-            "gpt-4o": 0.005 / 1000,  # $5 per 1M tokens (平均)
-            "gpt-4o-mini": 0.00015 / 1000,  # $0.15 per 1M tokens (平均)
-            "gpt-4-turbo": 0.01 / 1000,
-            "gpt-3.5-turbo": 0.0005 / 1000,
-        }
+    async def async_stream_chat(
+        self,
+        messages: List[LLMMessage],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        coalesce_bytes: int = 0,
+        **kwargs
+    ):
+        """OpenAI异步流式聊天接口（coalesce_bytes含义同stream_chat）"""
+        params = self._build_chat_params(
+            messages, temperature, max_tokens, False, stream=True, **kwargs
+        )
+        
+        await self._athrottle()
+        response = await self._aclient.chat.completions.create(**params)
         
-        # 查找最匹配的定价
-        for model_key, price in pricing.items():
-            if model_key in self.config.model.lower():
-                return tokens_used * price
+        buf = io.StringIO()
+        async for chunk in response:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.delta.content:
+                buf.write(choice.delta.content)
+            if buf.tell() and (
+                buf.tell() >= coalesce_bytes or choice.finish_reason
+            ):
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate(0)
         
-        # 默认使用gpt-4o定价
-        return tokens_used * pricing["gpt-4o"]
+        if buf.tell():
+            yield buf.getvalue()
@@ -0,0 +1,97 @@
+"""
+LLM请求限速 - 令牌桶
+同一上游端点 (provider, base_url) 的所有LLM实例共享一个令牌桶，
+避免多个注册实例共同触发429后陷入指数退避
+"""
+from typing import Dict, Optional, Tuple
+import asyncio
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """线程安全的令牌桶"""
+
+    def __init__(self, rate_per_sec: float, burst: Optional[float] = None):
+        """
+        初始化令牌桶
+
+        Args:
+            rate_per_sec: 每秒补充的令牌数
+            burst: 桶容量（允许的突发请求数），默认为1秒的补充量且不少于1
+        """
+        if rate_per_sec <= 0:
+            raise ValueError("rate_per_sec must be positive")
+
+        self.rate = rate_per_sec
+        self.capacity = burst if burst is not None else max(1.0, rate_per_sec)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """
+        预留令牌，返回需要等待的秒数
+
+        令牌不足时允许余额为负（即预约未来的令牌），
+        这样并发调用方按到达顺序排队，而无需反复轮询
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1.0):
+        """获取令牌（阻塞直到可用）"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1.0):
+        """获取令牌（异步等待，不阻塞事件循环）"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+_buckets: Dict[Tuple[str, Optional[str]], TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, base_url: Optional[str], rpm: float) -> TokenBucket:
+    """
+    获取 (provider, base_url) 共享的令牌桶，不存在时按rpm创建
+
+    Args:
+        provider: 提供商名称
+        base_url: API地址
+        rpm: 每分钟请求数上限
+
+    Returns:
+        令牌桶实例
+    """
+    key = (provider, base_url)
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rpm / 60.0)
+            _buckets[key] = bucket
+        elif abs(bucket.rate * 60.0 - rpm) > 1e-9:
+            logger.warning(
+                f"Rate limiter for {provider} ({base_url}) already exists with "
+                f"{bucket.rate * 60.0:g} rpm; ignoring rpm={rpm:g}"
+            )
+        return bucket
+
+
+def clear_rate_limiters():
+    """清除所有令牌桶"""
+    with _buckets_lock:
+        _buckets.clear()
@@ -8,84 +8,138 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
-def init_llms_from_env():
-    """从环境变量初始化所有配置的LLM（仅支持DeepSeek、Qwen、Kimi、GLM）"""
+def _read_env():
+    """读取环境变量快照（环境变量在进程生命周期内不变，只在加载或强制重载时读取）"""
+    global _DEEPSEEK_API_KEY, _QWEN_API_KEY, _KIMI_API_KEY, _OPENAI_API_KEY
+    global _DEEPSEEK_MODEL, _QWEN_MODEL, _KIMI_MODEL
+    
+    _DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+    _QWEN_API_KEY = os.getenv("QWEN_API_KEY")
+    _KIMI_API_KEY = os.getenv("KIMI_API_KEY")
+    _OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    
+    _DEEPSEEK_MODEL = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
+    _QWEN_MODEL = os.getenv("QWEN_MODEL", "qwen-plus")
+    _KIMI_MODEL = os.getenv("KIMI_MODEL", "moonshot-v1-32k")
+
+
+_read_env()
+
+
+def _build_task_llm_mapping():
+    """根据可用的key确定默认模型和任务→LLM映射（仅国内模型）"""
+    # 确定默认可用模型（优先级：DeepSeek > Qwen > Kimi）
+    default_model = None
+    if _DEEPSEEK_API_KEY:
+        default_model = "deepseek"
+    elif _QWEN_API_KEY:
+        default_model = "qwen"
+    elif _KIMI_API_KEY:
+        default_model = "kimi"
+    
+    if not default_model:
+        return None, {}
+    
+    # 所有任务都映射到可用的国内模型
+    # 代码任务稍微特殊一点，优先DeepSeek
+    code_model = "deepseek" if _DEEPSEEK_API_KEY else default_model
+    # 长上下文任务优先Kimi
+    long_ctx_model = "kimi" if _KIMI_API_KEY else default_model
+    
+    return default_model, {
+        "analysis": default_model,
+        "generation": default_model,
+        "fast": default_model,
+        "code": code_model,
+        "long_context": long_ctx_model,
+    }
+
+
+_DEFAULT_MODEL, _TASK_LLM_MAPPING = _build_task_llm_mapping()
+
+# 由环境变量注册的LLM名称（强制重载时先注销）
+_ENV_LLM_NAMES = ("deepseek", "qwen", "kimi")
+
+_initialized = False
+
+
+def init_llms_from_env(force_reload: bool = False):
+    """
+    从环境变量初始化所有配置的LLM（仅支持DeepSeek、Qwen、Kimi、GLM）
+    
+    重复调用不会重复注册；get_llm_for_task首次调用时会自动触发。
+    
+    Args:
+        force_reload: 重新读取.env和环境变量并重新注册（用于测试等需要切换配置的场景）
+    """
+    global _initialized, _DEFAULT_MODEL, _TASK_LLM_MAPPING
+    if _initialized and not force_reload:
+        return
+    
+    if force_reload:
+        load_dotenv(override=True)
+        _read_env()
+        _DEFAULT_MODEL, _TASK_LLM_MAPPING = _build_task_llm_mapping()
+        # 注销上次注册的实例，避免已删除的key对应的旧实例残留
+        for name in _ENV_LLM_NAMES:
+            llm_manager.unregister_llm(name)
     
     # 优先注册国内模型
     
     # DeepSeek
-    if os.getenv("DEEPSEEK_API_KEY"):
+    if _DEEPSEEK_API_KEY:
         llm_manager.register_llm(
             name="deepseek",
             provider=LLMProvider.DEEPSEEK,
-            api_key=os.getenv("DEEPSEEK_API_KEY"),
-            model=os.getenv("DEEPSEEK_MODEL", "deepseek-chat"),
+            api_key=_DEEPSEEK_API_KEY,
+            model=_DEEPSEEK_MODEL,
             temperature=0.5,
             is_default=True # DeepSeek作为默认
         )
     
     # Qwen (Alibaba)
-    if os.getenv("QWEN_API_KEY"):
+    if _QWEN_API_KEY:
         llm_manager.register_llm(
             name="qwen",
             provider=LLMProvider.QWEN,
-            api_key=os.getenv("QWEN_API_KEY"),
-            model=os.getenv("QWEN_MODEL", "qwen-plus"),
+            api_key=_QWEN_API_KEY,
+            model=_QWEN_MODEL,
             temperature=0.5
         )
     
     # Kimi (Moonshot)
-    if os.getenv("KIMI_API_KEY"):
+    if _KIMI_API_KEY:
         llm_manager.register_llm(
             name="kimi",
             provider=LLMProvider.KIMI,
-            api_key=os.getenv("KIMI_API_KEY"),
-            model=os.getenv("KIMI_MODEL", "moonshot-v1-32k"),
+            api_key=_KIMI_API_KEY,
+            model=_KIMI_MODEL,
             temperature=0.5
         )
-        
+    
     # 注意：不再注册 OpenAI, Claude, Gemini 以避免连接问题
+    
+    # 全部注册成功后才标记，注册失败时下次调用会重试
+    _initialized = True
 
 
 def get_llm_for_task(task: str) -> str:
     """
     根据任务类型选择合适的LLM（仅国内模型）
     """
-    # 确定默认可用模型（优先级：DeepSeek > Qwen > Kimi）
-    default_model = None
-    if os.getenv("DEEPSEEK_API_KEY"):
-        default_model = "deepseek"
-    elif os.getenv("QWEN_API_KEY"):
-        default_model = "qwen"
-    elif os.getenv("KIMI_API_KEY"):
-        default_model = "kimi"
-        
-    if not default_model:
+    init_llms_from_env()
+    
+    if not _DEFAULT_MODEL:
         # 如果没有任何国内key，回退到openai（虽然可能不通，但作为最后手段）
-        if os.getenv("OPENAI_API_KEY"):
+        if _OPENAI_API_KEY:
              # 这里不注册，只是返回名字，如果上面没注册就会报错，所以这里只是个占位
              return "openai-smart"
         raise ValueError("No supported domestic LLM (DeepSeek/Qwen/Kimi) API key found.")
-
-    # 所有任务都映射到可用的国内模型
-    # 代码任务稍微特殊一点，优先DeepSeek
-    code_model = "deepseek" if os.getenv("DEEPSEEK_API_KEY") else default_model
-    # 长上下文任务优先Kimi
-    long_ctx_model = "kimi" if os.getenv("KIMI_API_KEY") else default_model
-    
-    task_llm_mapping = {
-        "analysis": default_model,
-        "generation": default_model,
-        "fast": default_model,
-        "code": code_model,
-        "long_context": long_ctx_model,
-    }
     
-    llm_name = task_llm_mapping.get(task, default_model)
+    llm_name = _TASK_LLM_MAPPING.get(task, _DEFAULT_MODEL)
     
     # 验证该LLM是否已注册
-    available_llms = llm_manager.list_llms()
-    if llm_name not in available_llms:
+    if not llm_manager.has_llm(llm_name):
         # 如果指定模型未注册（例如没有key），回退到默认
         return llm_manager.get_default_llm_name()
     
@@ -2,10 +2,17 @@
 AI-Researcher 核心数据模型
 定义系统中所有模块使用的数据结构
 """
-from dataclasses import dataclass, field, asdict
-from typing import List, Optional, Dict, Any
+from dataclasses import dataclass, field
+from typing import List, Optional, Dict, Any, Iterable, Set
 from datetime import datetime
 from enum import Enum
+import sys
+from utils import normalize_title, word_set
+
+
+def _intern(value: Any) -> Any:
+    """驻留字符串（论文ID等在多个对象间大量重复，共享同一对象以节省内存）"""
+    return sys.intern(value) if type(value) is str else value
 
 
 class JournalLevel(Enum):
@@ -34,7 +41,7 @@ class ResearchField(Enum):
     ANY = "any"           # 不限
 
 
-@dataclass
+@dataclass(slots=True)
 class ResearchIntent:
     """研究意图 - 用户输入的结构化表示"""
     keywords: str  # 主题关键词（必填）
@@ -46,14 +53,17 @@ class ResearchIntent:
     
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
-        result = asdict(self)
-        result['journal_level'] = self.journal_level.value
-        result['paper_type'] = self.paper_type.value
-        result['field'] = self.field.value
-        return result
+        return {
+            'keywords': self.keywords,
+            'year_start': self.year_start,
+            'year_end': self.year_end,
+            'journal_level': self.journal_level.value,
+            'paper_type': self.paper_type.value,
+            'field': self.field.value
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class PaperMetadata:
     """文献元数据"""
     title: str
@@ -66,16 +76,63 @@ class PaperMetadata:
     relevance_score: float = 0.0  # 相关度评分
     arxiv_id: Optional[str] = None
     partition: Optional[str] = None  # 分区
+    # 检索流水线中多次使用的派生文本，首次访问时计算（不参与序列化和比较）
+    _title_norm: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    _title_words: Optional[Set[str]] = field(default=None, init=False, repr=False, compare=False)
+    _abstract_words: Optional[Set[str]] = field(default=None, init=False, repr=False, compare=False)
+    _year: Optional[int] = field(default=-1, init=False, repr=False, compare=False)  # -1表示尚未解析
+    
+    def __post_init__(self):
+        self.arxiv_id = _intern(self.arxiv_id)
+    
+    @property
+    def title_norm(self) -> str:
+        """标准化标题（去重匹配用）"""
+        if self._title_norm is None:
+            self._title_norm = normalize_title(self.title)
+        return self._title_norm
+    
+    @property
+    def title_words(self) -> Set[str]:
+        """标题词集合（关键词打分用）"""
+        if self._title_words is None:
+            self._title_words = word_set(self.title)
+        return self._title_words
+    
+    @property
+    def abstract_words(self) -> Set[str]:
+        """摘要词集合（关键词打分用）"""
+        if self._abstract_words is None:
+            self._abstract_words = word_set(self.abstract)
+        return self._abstract_words
+    
+    @property
+    def year(self) -> Optional[int]:
+        """发表年份（由published解析，无法解析时为None）"""
+        if self._year == -1:
+            try:
+                self._year = int(self.published.split('-')[0])
+            except (AttributeError, ValueError):
+                self._year = None
+        return self._year
     
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
-        result = asdict(self)
-        if self.paper_type:
-            result['paper_type'] = self.paper_type.value
-        return result
+        return {
+            'title': self.title,
+            'authors': list(self.authors),
+            'abstract': self.abstract,
+            'url': self.url,
+            'published': self.published,
+            'paper_type': self.paper_type.value if self.paper_type else None,
+            'journal': self.journal,
+            'relevance_score': self.relevance_score,
+            'arxiv_id': self.arxiv_id,
+            'partition': self.partition
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class PaperAnalysis:
     """文献阅读分析结果 - 结构化输出"""
     paper_id: str  # 论文唯一标识
@@ -86,21 +143,45 @@ class PaperAnalysis:
     limitations: List[str]  # 局限性/不足
     contributions: List[str]  # 贡献点
     
+    def __post_init__(self):
+        self.paper_id = _intern(self.paper_id)
+    
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
-        return asdict(self)
+        return {
+            'paper_id': self.paper_id,
+            'core_problem': self.core_problem,
+            'key_method': self.key_method,
+            'technical_approach': self.technical_approach,
+            'experiment_conclusions': list(self.experiment_conclusions),
+            'limitations': list(self.limitations),
+            'contributions': list(self.contributions)
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class ResearchCluster:
     """研究聚类 - 相似方向的文献组"""
     cluster_name: str  # 聚类名称
     papers: List[str]  # 论文ID列表
     key_themes: List[str]  # 关键主题
     technical_evolution: str  # 技术演进描述
+    
+    def __post_init__(self):
+        self.cluster_name = _intern(self.cluster_name)
+        self.papers = [_intern(paper_id) for paper_id in self.papers]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            'cluster_name': self.cluster_name,
+            'papers': list(self.papers),
+            'key_themes': list(self.key_themes),
+            'technical_evolution': self.technical_evolution
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class ResearchLandscape:
     """研究脉络全景"""
     clusters: List[ResearchCluster]  # 研究方向聚类
@@ -112,15 +193,15 @@ class ResearchLandscape:
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
         return {
-            'clusters': [asdict(c) for c in self.clusters],
-            'solved_problems': self.solved_problems,
-            'partially_solved': self.partially_solved,
-            'unsolved_problems': self.unsolved_problems,
-            'technical_evolution': self.technical_evolution
+            'clusters': [c.to_dict() for c in self.clusters],
+            'solved_problems': list(self.solved_problems),
+            'partially_solved': list(self.partially_solved),
+            'unsolved_problems': list(self.unsolved_problems),
+            'technical_evolution': dict(self.technical_evolution)
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class ResearchIdea:
     """研究想法"""
     idea_id: str  # 想法ID
@@ -131,13 +212,27 @@ class ResearchIdea:
     difference_from_existing: str  # 与现有方法的区别
     feasibility_score: float = 0.0  # 可行性评分
     novelty_score: float = 0.0  # 新颖性评分
+    combined_score: float = field(init=False, repr=False, compare=False)  # 综合评分（构造时计算）
+    
+    def __post_init__(self):
+        # 综合评分 = 0.6 * 新颖性 + 0.4 * 可行性；构造后修改评分需同步更新此字段
+        self.combined_score = 0.6 * self.novelty_score + 0.4 * self.feasibility_score
     
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
-        return asdict(self)
+        return {
+            'idea_id': self.idea_id,
+            'title': self.title,
+            'motivation': self.motivation,
+            'core_hypothesis': self.core_hypothesis,
+            'expected_contribution': self.expected_contribution,
+            'difference_from_existing': self.difference_from_existing,
+            'feasibility_score': self.feasibility_score,
+            'novelty_score': self.novelty_score
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class MethodDesign:
     """方法设计"""
     idea_id: str  # 对应的研究想法ID
@@ -149,10 +244,17 @@ class MethodDesign:
     
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
-        return asdict(self)
+        return {
+            'idea_id': self.idea_id,
+            'overview': self.overview,
+            'model_framework': self.model_framework,
+            'modules': [dict(m) for m in self.modules],
+            'baseline_differences': list(self.baseline_differences),
+            'theoretical_justification': self.theoretical_justification
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class ExperimentPlan:
     """实验设计"""
     method_id: str  # 对应的方法ID
@@ -166,19 +268,37 @@ class ExperimentPlan:
     
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
-        return asdict(self)
+        return {
+            'method_id': self.method_id,
+            'experiment_setup': self.experiment_setup,
+            'baselines': list(self.baselines),
+            'ablation_studies': [dict(a) for a in self.ablation_studies],
+            'expected_results': dict(self.expected_results),
+            'metrics': list(self.metrics),
+            'risk_factors': list(self.risk_factors),
+            'is_hypothetical': self.is_hypothetical
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class PaperSection:
     """论文章节"""
     section_name: str  # 章节名称
     content: str  # 内容
     source_type: str  # 来源类型：'literature' | 'hypothesis' | 'original'
     citations: List[str] = field(default_factory=list)  # 引用的论文ID
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            'section_name': self.section_name,
+            'content': self.content,
+            'source_type': self.source_type,
+            'citations': list(self.citations)
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class PaperDraft:
     """论文草稿"""
     title: str
@@ -195,18 +315,18 @@ class PaperDraft:
         """转换为字典"""
         return {
             'title': self.title,
-            'abstract': asdict(self.abstract),
-            'introduction': asdict(self.introduction),
-            'related_work': asdict(self.related_work),
-            'method': asdict(self.method),
-            'experiments': asdict(self.experiments),
-            'discussion': asdict(self.discussion),
-            'conclusion': asdict(self.conclusion),
+            'abstract': self.abstract.to_dict(),
+            'introduction': self.introduction.to_dict(),
+            'related_work': self.related_work.to_dict(),
+            'method': self.method.to_dict(),
+            'experiments': self.experiments.to_dict(),
+            'discussion': self.discussion.to_dict(),
+            'conclusion': self.conclusion.to_dict(),
             'generated_at': self.generated_at
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class WorkflowState:
     """工作流状态 - 追踪整个研究流程"""
     research_intent: Optional[ResearchIntent] = None
@@ -219,20 +339,33 @@ class WorkflowState:
     experiment_plan: Optional[ExperimentPlan] = None
     paper_draft: Optional[PaperDraft] = None
     current_step: str = "intent"  # 当前步骤
+    step_fingerprints: Dict[str, str] = field(default_factory=dict)  # 步骤 → 完成时的输入指纹
     created_at: str = field(default_factory=lambda: datetime.now().isoformat())
     
-    def to_dict(self) -> Dict[str, Any]:
-        """转换为字典"""
-        return {
-            'research_intent': self.research_intent.to_dict() if self.research_intent else None,
-            'papers_metadata': [p.to_dict() for p in self.papers_metadata],
-            'papers_analysis': {k: v.to_dict() for k, v in self.papers_analysis.items()},
-            'landscape': self.landscape.to_dict() if self.landscape else None,
-            'ideas': [i.to_dict() for i in self.ideas],
-            'selected_idea': self.selected_idea.to_dict() if self.selected_idea else None,
-            'method_design': self.method_design.to_dict() if self.method_design else None,
-            'experiment_plan': self.experiment_plan.to_dict() if self.experiment_plan else None,
-            'paper_draft': self.paper_draft.to_dict() if self.paper_draft else None,
-            'current_step': self.current_step,
-            'created_at': self.created_at
-        }
+    def to_dict(self, fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        转换为字典
+        
+        Args:
+            fields: 只转换指定字段（增量保存时使用），默认全部字段
+        """
+        if fields is None:
+            fields = _STATE_FIELD_SERIALIZERS
+        return {name: _STATE_FIELD_SERIALIZERS[name](self) for name in fields}
+
+
+# WorkflowState字段 → 序列化函数，顺序即to_dict的键顺序
+_STATE_FIELD_SERIALIZERS = {
+    'research_intent': lambda s: s.research_intent.to_dict() if s.research_intent else None,
+    'papers_metadata': lambda s: [p.to_dict() for p in s.papers_metadata],
+    'papers_analysis': lambda s: {k: v.to_dict() for k, v in s.papers_analysis.items()},
+    'landscape': lambda s: s.landscape.to_dict() if s.landscape else None,
+    'ideas': lambda s: [i.to_dict() for i in s.ideas],
+    'selected_idea': lambda s: s.selected_idea.to_dict() if s.selected_idea else None,
+    'method_design': lambda s: s.method_design.to_dict() if s.method_design else None,
+    'experiment_plan': lambda s: s.experiment_plan.to_dict() if s.experiment_plan else None,
+    'paper_draft': lambda s: s.paper_draft.to_dict() if s.paper_draft else None,
+    'current_step': lambda s: s.current_step,
+    'step_fingerprints': lambda s: dict(s.step_fingerprints),
+    'created_at': lambda s: s.created_at,
+}
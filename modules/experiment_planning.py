@@ -2,13 +2,23 @@
 实验设计模块
 为研究方法设计实验方案
 """
+import asyncio
 import json
-from openai import OpenAI
+from typing import Dict, Iterator, List
+from openai import AsyncOpenAI
 from models import MethodDesign, ExperimentPlan
-from utils import logger
+from utils import (
+    logger, cached_llm_json, async_cached_llm_json, get_openai_client,
+    get_async_openai_client, as_str, as_list, as_dict, json_repair_messages
+)
 import config
 
 
+_SYSTEM_PROMPT = "你是一位实验设计专家。请严格按照JSON格式输出。"
+_TEMPERATURE = 0.5
+_format_experiment_prompt = config.PROMPTS["experiment_design"].format
+
+
 def design_experiments(method: MethodDesign, api_key: str) -> ExperimentPlan:
     """
     设计实验方案
@@ -22,42 +32,86 @@ def design_experiments(method: MethodDesign, api_key: str) -> ExperimentPlan:
     """
     logger.info(f"Designing experiments for method: {method.idea_id}")
     
-    # 准备方法描述
-    method_description = format_method_for_experiment(method)
-    
     # 调用LLM
-    client = OpenAI(api_key=api_key)
+    client = get_openai_client(api_key)
     
-    prompt = config.PROMPTS["experiment_design"].format(method=method_description)
+    prompt = _build_experiment_prompt(method)
     
-    try:
+    def llm_call(messages: List[Dict[str, str]]) -> str:
         response = client.chat.completions.create(
             model=config.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "你是一位实验设计专家。请严格按照JSON格式输出。"},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.5,
+            messages=messages,
+            temperature=_TEMPERATURE,
             response_format={"type": "json_object"}
         )
-        
-        result_text = response.choices[0].message.content
-        result_json = json.loads(result_text)
-        
-        # 构建ExperimentPlan对象
-        experiment = ExperimentPlan(
-            method_id=method.idea_id,
-            experiment_setup=result_json.get("experiment_setup", ""),
-            baselines=result_json.get("baselines", []),
-            ablation_studies=result_json.get("ablation_studies", []),
-            expected_results=result_json.get("expected_results", {}),
-            metrics=result_json.get("metrics", []),
-            risk_factors=result_json.get("risk_factors", []),
-            is_hypothetical=True  # 明确标记为假设性结果
+        return response.choices[0].message.content
+    
+    messages = [
+        {"role": "system", "content": _SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+    
+    try:
+        result_json = cached_llm_json(
+            lambda: llm_call(messages),
+            _SYSTEM_PROMPT, prompt, _TEMPERATURE, config.OPENAI_MODEL,
+            repair=lambda text: llm_call(json_repair_messages(text))
         )
+        return _build_experiment_plan(method, result_json)
         
-        logger.info(f"Experiment designed with {len(experiment.baselines)} baselines and {len(experiment.ablation_studies)} ablation studies")
-        return experiment
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to parse JSON response: {e}")
+        raise ValueError(f"API返回的不是有效的JSON格式")
+    
+    except Exception as e:
+        logger.error(f"API call failed: {e}")
+        raise
+
+
+async def design_experiments_async(
+    method: MethodDesign,
+    api_key: str = None,
+    client: AsyncOpenAI = None
+) -> ExperimentPlan:
+    """
+    设计实验方案（异步版本）
+    
+    Args:
+        method: 方法设计对象
+        api_key: OpenAI API密钥（未传入client时使用）
+        client: 复用的AsyncOpenAI客户端
+    
+    Returns:
+        实验设计对象
+    """
+    logger.info(f"Designing experiments for method: {method.idea_id}")
+    
+    if client is None:
+        client = get_async_openai_client(api_key)
+    
+    prompt = _build_experiment_prompt(method)
+    
+    async def llm_call(messages: List[Dict[str, str]]) -> str:
+        response = await client.chat.completions.create(
+            model=config.OPENAI_MODEL,
+            messages=messages,
+            temperature=_TEMPERATURE,
+            response_format={"type": "json_object"}
+        )
+        return response.choices[0].message.content
+    
+    messages = [
+        {"role": "system", "content": _SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+    
+    try:
+        result_json = await async_cached_llm_json(
+            lambda: llm_call(messages),
+            _SYSTEM_PROMPT, prompt, _TEMPERATURE, config.OPENAI_MODEL,
+            repair=lambda text: llm_call(json_repair_messages(text))
+        )
+        return _build_experiment_plan(method, result_json)
         
     except json.JSONDecodeError as e:
         logger.error(f"Failed to parse JSON response: {e}")
@@ -68,6 +122,76 @@ def design_experiments(method: MethodDesign, api_key: str) -> ExperimentPlan:
         raise
 
 
+async def design_experiments_batch_async(
+    methods: List[MethodDesign],
+    api_key: str,
+    max_concurrency: int = 5
+) -> List[ExperimentPlan]:
+    """
+    并发为多个方法设计实验方案
+    
+    Args:
+        methods: 方法设计列表
+        api_key: OpenAI API密钥
+        max_concurrency: 最大并发请求数
+    
+    Returns:
+        与methods顺序一致的实验设计列表
+    """
+    client = get_async_openai_client(api_key)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def run(method: MethodDesign) -> ExperimentPlan:
+        async with semaphore:
+            return await design_experiments_async(method, client=client)
+    
+    return await asyncio.gather(*(run(m) for m in methods))
+
+
+def design_experiments_batch(
+    methods: List[MethodDesign],
+    api_key: str,
+    max_concurrency: int = 5
+) -> List[ExperimentPlan]:
+    """
+    并发为多个方法设计实验方案（同步入口，不能在已运行的事件循环中调用）
+    
+    Args:
+        methods: 方法设计列表
+        api_key: OpenAI API密钥
+        max_concurrency: 最大并发请求数
+    
+    Returns:
+        与methods顺序一致的实验设计列表
+    """
+    return asyncio.run(
+        design_experiments_batch_async(methods, api_key, max_concurrency)
+    )
+
+
+def _build_experiment_prompt(method: MethodDesign) -> str:
+    """构建实验设计提示词"""
+    method_description = format_method_for_experiment(method)
+    return _format_experiment_prompt(method=method_description)
+
+
+def _build_experiment_plan(method: MethodDesign, result_json: dict) -> ExperimentPlan:
+    """由LLM返回的JSON构建ExperimentPlan对象"""
+    experiment = ExperimentPlan(
+        method_id=method.idea_id,
+        experiment_setup=as_str(result_json.get("experiment_setup")),
+        baselines=as_list(result_json.get("baselines")),
+        ablation_studies=[study for study in as_list(result_json.get("ablation_studies")) if isinstance(study, dict)],
+        expected_results=as_dict(result_json.get("expected_results")),
+        metrics=as_list(result_json.get("metrics")),
+        risk_factors=as_list(result_json.get("risk_factors")),
+        is_hypothetical=True  # 明确标记为假设性结果
+    )
+    
+    logger.info(f"Experiment designed with {len(experiment.baselines)} baselines and {len(experiment.ablation_studies)} ablation studies")
+    return experiment
+
+
 def format_method_for_experiment(method: MethodDesign) -> str:
     """
     格式化方法设计用于实验设计
@@ -78,20 +202,21 @@ def format_method_for_experiment(method: MethodDesign) -> str:
     Returns:
         格式化的文本
     """
-    sections = [
-        f"方法概述: {method.overview}",
-        f"模型框架: {method.model_framework}",
-    ]
+    return "\n".join(_iter_method_for_experiment(method))
+
+
+def _iter_method_for_experiment(method: MethodDesign) -> Iterator[str]:
+    """逐行生成方法设计描述"""
+    yield f"方法概述: {method.overview}"
+    yield f"模型框架: {method.model_framework}"
     
-    sections.append("核心模块:")
+    yield "核心模块:"
     for module in method.modules:
-        sections.append(f"- {module.get('name')}: {module.get('function')}")
+        yield f"- {module.get('name')}: {module.get('function')}"
     
-    sections.append("与baseline的差异:")
+    yield "与baseline的差异:"
     for diff in method.baseline_differences:
-        sections.append(f"- {diff}")
-    
-    return "\n".join(sections)
+        yield f"- {diff}"
 
 
 def format_experiment_summary(experiment: ExperimentPlan) -> str:
@@ -104,36 +229,42 @@ def format_experiment_summary(experiment: ExperimentPlan) -> str:
     Returns:
         Markdown格式的摘要
     """
-    sections = ["# 实验设计\n"]
+    return "".join(_iter_experiment_summary(experiment))
+
+
+def _iter_experiment_summary(experiment: ExperimentPlan) -> Iterator[str]:
+    """逐段生成实验设计摘要"""
+    yield "# 实验设计\n"
     
     if experiment.is_hypothetical:
-        sections.append("> ⚠️ **注意**: 以下实验结果为假设性分析，需要实际实验验证。\n\n")
+        yield "> ⚠️ **注意**: 以下实验结果为假设性分析，需要实际实验验证。\n\n"
     
-    sections.append(f"## 实验设置\n{experiment.experiment_setup}\n")
+    if experiment.experiment_setup:
+        yield f"## 实验设置\n{experiment.experiment_setup}\n"
     
-    sections.append("\n## Baseline方法\n")
-    for i, baseline in enumerate(experiment.baselines, 1):
-        sections.append(f"{i}. {baseline}\n")
+    if experiment.baselines:
+        yield "\n## Baseline方法\n"
+        for i, baseline in enumerate(experiment.baselines, 1):
+            yield f"{i}. {baseline}\n"
     
-    sections.append("\n## 评估指标\n")
-    for metric in experiment.metrics:
-        sections.append(f"- {metric}\n")
+    if experiment.metrics:
+        yield "\n## 评估指标\n"
+        for metric in experiment.metrics:
+            yield f"- {metric}\n"
     
     if experiment.ablation_studies:
-        sections.append("\n## Ablation Study设计\n")
-        sections.append("| 移除组件 | 测试目的 |\n")
-        sections.append("|---------|----------|\n")
+        yield "\n## Ablation Study设计\n"
+        yield "| 移除组件 | 测试目的 |\n"
+        yield "|---------|----------|\n"
         for study in experiment.ablation_studies:
-            sections.append(f"| {study.get('component', '')} | {study.get('purpose', '')} |\n")
+            yield f"| {study.get('component', '')} | {study.get('purpose', '')} |\n"
     
     if experiment.expected_results:
-        sections.append("\n## 预期结果分析（假设）\n")
+        yield "\n## 预期结果分析（假设）\n"
         for key, value in experiment.expected_results.items():
-            sections.append(f"**{key}**: {value}\n\n")
+            yield f"**{key}**: {value}\n\n"
     
     if experiment.risk_factors:
-        sections.append("\n## 潜在风险因素\n")
+        yield "\n## 潜在风险因素\n"
         for risk in experiment.risk_factors:
-            sections.append(f"- {risk}\n")
-    
-    return "".join(sections)
+            yield f"- {risk}\n"
@@ -2,14 +2,27 @@
 研究想法生成模块
 基于研究脉络生成创新想法
 """
+import asyncio
+import heapq
 import json
-from typing import List
-from openai import OpenAI
+import operator
+from itertools import islice
+from typing import Any, Callable, Dict, List
+from openai import AsyncOpenAI
 from models import ResearchLandscape, ResearchIdea
-from utils import logger
+from utils import (
+    logger, cached_llm_json, async_cached_llm_json, get_openai_client,
+    get_async_openai_client, as_str, as_list, as_score, json_repair_messages
+)
 import config
 
 
+_SYSTEM_PROMPT = "你是一位富有创新精神的研究者。请严格按照JSON格式输出。"
+_TEMPERATURE = 0.7  # 较高的温度以增加创造性
+_BY_COMBINED_SCORE = operator.attrgetter("combined_score")
+_format_idea_prompt = config.PROMPTS["idea_generation"].format
+
+
 def generate_research_ideas(
     landscape: ResearchLandscape,
     api_key: str,
@@ -31,49 +44,84 @@ def generate_research_ideas(
     
     logger.info(f"Generating {num_ideas} research ideas...")
     
-    # 准备输入
-    landscape_summary = prepare_landscape_input(landscape)
-    
     # 调用LLM
-    client = OpenAI(api_key=api_key)
-    
-    prompt = config.PROMPTS["idea_generation"].format(
-        landscape=landscape_summary,
-        num_ideas=num_ideas
-    )
+    client = get_openai_client(api_key)
     
-    try:
+    def llm_call(messages: List[Dict[str, str]]) -> str:
         response = client.chat.completions.create(
             model=config.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "你是一位富有创新精神的研究者。请严格按照JSON格式输出。"},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,  # 较高的温度以增加创造性
+            messages=messages,
+            temperature=_TEMPERATURE,
             response_format={"type": "json_object"}
         )
+        return response.choices[0].message.content
+    
+    try:
+        return _generate_ideas_core(
+            _build_idea_prompt(landscape, num_ideas),
+            num_ideas,
+            llm_call,
+            config.OPENAI_MODEL
+        )
         
-        result_text = response.choices[0].message.content
-        result_json = json.loads(result_text)
-        
-        # 解析结果
-        ideas = []
-        ideas_data = result_json.get("ideas", []) if isinstance(result_json, dict) and "ideas" in result_json else result_json if isinstance(result_json, list) else []
-        
-        for idea_data in ideas_data:
-            idea = ResearchIdea(
-                idea_id=idea_data.get("idea_id", f"idea_{len(ideas)+1}"),
-                motivation=idea_data.get("motivation", ""),
-                core_hypothesis=idea_data.get("core_hypothesis", ""),
-                expected_contribution=idea_data.get("expected_contribution", ""),
-                difference_from_existing=idea_data.get("difference_from_existing", ""),
-                feasibility_score=float(idea_data.get("feasibility_score", 0.5)),
-                novelty_score=float(idea_data.get("novelty_score", 0.5))
-            )
-            ideas.append(idea)
-        
-        logger.info(f"Generated {len(ideas)} research ideas")
-        return ideas
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to parse JSON response: {e}")
+        raise ValueError(f"API返回的不是有效的JSON格式")
+    
+    except Exception as e:
+        logger.error(f"API call failed: {e}")
+        raise
+
+
+async def generate_research_ideas_async(
+    landscape: ResearchLandscape,
+    api_key: str = None,
+    num_ideas: int = None,
+    client: AsyncOpenAI = None
+) -> List[ResearchIdea]:
+    """
+    生成研究想法（异步版本）
+    
+    Args:
+        landscape: 研究脉络对象
+        api_key: OpenAI API密钥（未传入client时使用）
+        num_ideas: 生成想法的数量
+        client: 复用的AsyncOpenAI客户端
+    
+    Returns:
+        研究想法列表
+    """
+    if num_ideas is None:
+        num_ideas = config.MAX_IDEAS_TO_GENERATE
+    
+    logger.info(f"Generating {num_ideas} research ideas...")
+    
+    if client is None:
+        client = get_async_openai_client(api_key)
+    
+    prompt = _build_idea_prompt(landscape, num_ideas)
+    
+    async def llm_call(messages: List[Dict[str, str]]) -> str:
+        response = await client.chat.completions.create(
+            model=config.OPENAI_MODEL,
+            messages=messages,
+            temperature=_TEMPERATURE,
+            response_format={"type": "json_object"}
+        )
+        return response.choices[0].message.content
+    
+    messages = [
+        {"role": "system", "content": _SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+    
+    try:
+        result_json = await async_cached_llm_json(
+            lambda: llm_call(messages),
+            _SYSTEM_PROMPT, prompt, _TEMPERATURE, config.OPENAI_MODEL,
+            repair=lambda text: llm_call(json_repair_messages(text))
+        )
+        return _parse_ideas(result_json, num_ideas)
         
     except json.JSONDecodeError as e:
         logger.error(f"Failed to parse JSON response: {e}")
@@ -84,6 +132,150 @@ def generate_research_ideas(
         raise
 
 
+async def generate_research_ideas_batch_async(
+    landscapes: List[ResearchLandscape],
+    api_key: str,
+    num_ideas: int = None,
+    max_concurrency: int = 5
+) -> List[List[ResearchIdea]]:
+    """
+    并发为多个研究脉络生成想法
+    
+    Args:
+        landscapes: 研究脉络列表
+        api_key: OpenAI API密钥
+        num_ideas: 每个脉络生成想法的数量
+        max_concurrency: 最大并发请求数
+    
+    Returns:
+        与landscapes顺序一致的想法列表
+    """
+    client = get_async_openai_client(api_key)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def run(landscape: ResearchLandscape) -> List[ResearchIdea]:
+        async with semaphore:
+            return await generate_research_ideas_async(
+                landscape, num_ideas=num_ideas, client=client
+            )
+    
+    return await asyncio.gather(*(run(l) for l in landscapes))
+
+
+def generate_research_ideas_batch(
+    landscapes: List[ResearchLandscape],
+    api_key: str,
+    num_ideas: int = None,
+    max_concurrency: int = 5
+) -> List[List[ResearchIdea]]:
+    """
+    并发为多个研究脉络生成想法（同步入口，不能在已运行的事件循环中调用）
+    
+    Args:
+        landscapes: 研究脉络列表
+        api_key: OpenAI API密钥
+        num_ideas: 每个脉络生成想法的数量
+        max_concurrency: 最大并发请求数
+    
+    Returns:
+        与landscapes顺序一致的想法列表
+    """
+    return asyncio.run(
+        generate_research_ideas_batch_async(
+            landscapes, api_key, num_ideas, max_concurrency
+        )
+    )
+
+
+def _build_idea_prompt(landscape: ResearchLandscape, num_ideas: int) -> str:
+    """构建想法生成提示词"""
+    landscape_summary = prepare_landscape_input(landscape)
+    return _format_idea_prompt(
+        landscape=landscape_summary,
+        num_ideas=num_ideas
+    )
+
+
+def _generate_ideas_core(
+    prompt: str,
+    num_ideas: int,
+    llm_call: Callable[[List[Dict[str, str]]], str],
+    model: str,
+    system_prompt: str = _SYSTEM_PROMPT,
+    id_factory: Callable[[int, Dict[str, Any]], str] = None
+) -> List[ResearchIdea]:
+    """
+    想法生成的公共实现（generate_research_ideas和ResearchIdeaGenerator共用）
+    
+    Args:
+        prompt: 用户提示词
+        num_ideas: 最多返回的想法数量
+        llm_call: 接收消息列表、返回响应文本的函数（也用于修复非法JSON响应）
+        model: 模型名称（用于缓存键）
+        system_prompt: 系统提示词
+        id_factory: (序号, 原始数据) -> 想法ID，默认使用LLM返回的idea_id
+    
+    Returns:
+        研究想法列表
+    
+    Raises:
+        json.JSONDecodeError: LLM返回的不是有效JSON
+    """
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+    result_json = cached_llm_json(
+        lambda: llm_call(messages),
+        system_prompt, prompt, _TEMPERATURE, model,
+        repair=lambda text: llm_call(json_repair_messages(text))
+    )
+    return _parse_ideas(result_json, num_ideas, id_factory)
+
+
+def _parse_ideas(
+    result_json: Any,
+    num_ideas: int = None,
+    id_factory: Callable[[int, Dict[str, Any]], str] = None
+) -> List[ResearchIdea]:
+    """由LLM返回的JSON（数组或{"ideas": [...]}）解析研究想法列表"""
+    if isinstance(result_json, list):
+        ideas_data = result_json
+    elif isinstance(result_json, dict):
+        ideas_data = as_list(result_json.get("ideas"))
+    else:
+        ideas_data = []
+    
+    if num_ideas is not None:
+        ideas_data = ideas_data[:num_ideas]
+    
+    ideas = []
+    for i, idea_data in enumerate(ideas_data):
+        if not isinstance(idea_data, dict):
+            continue
+        
+        if id_factory is not None:
+            idea_id = id_factory(i, idea_data)
+        else:
+            idea_id = as_str(idea_data.get("idea_id"), f"idea_{i+1}")
+        
+        # 兼容旧提示词使用的hypothesis/contributions字段名
+        idea = ResearchIdea(
+            idea_id=idea_id,
+            title=as_str(idea_data.get("title"), f"Research Idea {i+1}"),
+            motivation=as_str(idea_data.get("motivation")),
+            core_hypothesis=as_str(idea_data.get("core_hypothesis", idea_data.get("hypothesis"))),
+            expected_contribution=as_str(idea_data.get("expected_contribution", idea_data.get("contributions"))),
+            difference_from_existing=as_str(idea_data.get("difference_from_existing")),
+            feasibility_score=as_score(idea_data.get("feasibility_score")),
+            novelty_score=as_score(idea_data.get("novelty_score"))
+        )
+        ideas.append(idea)
+    
+    logger.info(f"Generated {len(ideas)} research ideas")
+    return ideas
+
+
 def prepare_landscape_input(landscape: ResearchLandscape) -> str:
     """
     准备研究脉络输入
@@ -103,33 +295,34 @@ def prepare_landscape_input(landscape: ResearchLandscape) -> str:
     
     # 未解决问题
     sections.append("\n## 未解决的研究问题")
-    for i, problem in enumerate(landscape.unsolved_problems[:10], 1):  # 只取前10个
+    for i, problem in enumerate(islice(landscape.unsolved_problems, 10), 1):  # 只取前10个
         sections.append(f"{i}. {problem}")
     
     # 半解决问题
     if landscape.partially_solved:
         sections.append("\n## 半解决的问题")
-        for problem in landscape.partially_solved[:5]:
+        for problem in islice(landscape.partially_solved, 5):
             sections.append(f"- {problem}")
     
     return "\n".join(sections)
 
 
-def rank_ideas(ideas: List[ResearchIdea]) -> List[ResearchIdea]:
+def rank_ideas(ideas: List[ResearchIdea], top_k: int = None) -> List[ResearchIdea]:
     """
     对想法进行排序
     
     Args:
         ideas: 研究想法列表
+        top_k: 只需要前k个时传入，避免对整个列表排序
     
     Returns:
         排序后的想法列表
     """
-    # 综合评分 = 0.6 * 新颖性 + 0.4 * 可行性
-    def score(idea: ResearchIdea) -> float:
-        return 0.6 * idea.novelty_score + 0.4 * idea.feasibility_score
-    
-    sorted_ideas = sorted(ideas, key=score, reverse=True)
+    # 按综合评分（0.6 * 新颖性 + 0.4 * 可行性）降序
+    if top_k is not None and top_k < len(ideas):
+        sorted_ideas = heapq.nlargest(top_k, ideas, key=_BY_COMBINED_SCORE)
+    else:
+        sorted_ideas = sorted(ideas, key=_BY_COMBINED_SCORE, reverse=True)
     logger.info(f"Ranked {len(sorted_ideas)} ideas")
     
     return sorted_ideas
@@ -146,17 +339,16 @@ def format_idea_summary(idea: ResearchIdea, index: int = None) -> str:
     Returns:
         Markdown格式的摘要
     """
-    sections = []
-    
     if index:
-        sections.append(f"## 想法 {index}: {idea.idea_id}\n")
+        header = f"## 想法 {index}: {idea.idea_id}\n"
     else:
-        sections.append(f"## {idea.idea_id}\n")
-    
-    sections.append(f"**研究动机**: {idea.motivation}\n")
-    sections.append(f"**核心假设**: {idea.core_hypothesis}\n")
-    sections.append(f"**预期贡献**: {idea.expected_contribution}\n")
-    sections.append(f"**与现有方法的区别**: {idea.difference_from_existing}\n")
-    sections.append(f"**评分**: 新颖性 {idea.novelty_score:.2f} | 可行性 {idea.feasibility_score:.2f}\n")
+        header = f"## {idea.idea_id}\n"
     
-    return "".join(sections)
+    return "".join((
+        header,
+        f"**研究动机**: {idea.motivation}\n",
+        f"**核心假设**: {idea.core_hypothesis}\n",
+        f"**预期贡献**: {idea.expected_contribution}\n",
+        f"**与现有方法的区别**: {idea.difference_from_existing}\n",
+        f"**评分**: 新颖性 {idea.novelty_score:.2f} | 可行性 {idea.feasibility_score:.2f}\n",
+    ))
@@ -2,13 +2,19 @@
 研究想法生成器 - 重构版（适配Celery和llm_manager）
 """
 import json
-from typing import List, Optional
+from itertools import islice
+from typing import Dict, List, Optional
 from models import ResearchLandscape, ResearchIdea
-from utils import logger
+from modules.idea_generation import _generate_ideas_core
+from utils import logger, json_dumps
 import config
 import uuid
 
 
+_SYSTEM_PROMPT = "你是一位富有创造力的科研专家，擅长从现有研究中发现创新机会。请严格按照JSON格式输出。"
+_format_idea_prompt = config.PROMPTS["idea_generation"].format
+
+
 class ResearchIdeaGenerator:
     """研究想法生成器"""
     
@@ -38,63 +44,44 @@ class ResearchIdeaGenerator:
         Returns:
             研究想法列表
         """
-        # 构建提示词
-        # 构建Prompt上下文
         landscape_summary = {
             "unsolved_problems": landscape.unsolved_problems,
-            "clusters": landscape.clusters[:5]  # 限制数量
+            # 限制数量，且只保留想法生成需要的字段（减少token）
+            # clusters可能是ResearchCluster，也可能是dict（分析结果/数据库JSON列）
+            "clusters": [
+                {"cluster_name": c.get("cluster_name"), "key_themes": c.get("key_themes")}
+                for c in (
+                    c if isinstance(c, dict) else c.to_dict()
+                    for c in islice(landscape.clusters, 5)
+                )
+            ]
         }
         
         # 构建提示词
-        prompt = config.PROMPTS["idea_generation"].format(
-            landscape=json.dumps(landscape_summary, ensure_ascii=False, indent=2),
+        prompt = _format_idea_prompt(
+            landscape=json_dumps(landscape_summary),  # 紧凑JSON，节省token
             num_ideas=num_ideas
         )
         
-        try:
-            # 调用LLM生成想法
+        def llm_call(messages: List[Dict[str, str]]) -> str:
             response = self.llm_manager.chat(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "你是一位富有创造力的科研专家，擅长从现有研究中发现创新机会。请严格按照JSON格式输出。"
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
+                messages=messages,
                 llm_name=llm_name,
                 temperature=0.7,  # 稍高温度以增加创造性
                 json_mode=True
             )
-            
-            # 解析响应
-            result_json = json.loads(response.content)
-            
-            # 创建ResearchIdea对象列表
-            ideas = []
-            if isinstance(result_json, list):
-                ideas_data = result_json
-            else:
-                ideas_data = result_json.get("ideas", [])
-            
-            for i, idea_data in enumerate(ideas_data[:num_ideas]):
-                idea = ResearchIdea(
-                    idea_id=str(uuid.uuid4()),
-                    title=idea_data.get("title", f"Research Idea {i+1}"),
-                    motivation=idea_data.get("motivation", ""),
-                    core_hypothesis=idea_data.get("hypothesis", ""),
-                    expected_contribution=idea_data.get("contributions", ""),
-                    difference_from_existing=idea_data.get("difference_from_existing", ""),
-                    novelty_score=float(idea_data.get("novelty_score", 0.5)),  # 0-1
-                    feasibility_score=float(idea_data.get("feasibility_score", 0.5))  # 0-1
-                )
-                ideas.append(idea)
-            
-            logger.info(f"Generated {len(ideas)} research ideas")
-            
-            return ideas
+            return response.content
+        
+        try:
+            # 调用LLM生成想法并解析响应（相同输入命中缓存）
+            return _generate_ideas_core(
+                prompt,
+                num_ideas,
+                llm_call,
+                llm_name or self.llm_manager.get_default_llm_name(),
+                system_prompt=_SYSTEM_PROMPT,
+                id_factory=lambda i, idea_data: str(uuid.uuid4())
+            )
             
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse JSON response: {e}")
@@ -2,14 +2,20 @@
 研究脉络分析模块
 分析文献集合，识别研究方向和空白
 """
+import io
 import json
-from typing import List, Dict
-from openai import OpenAI
+from typing import List, Dict, Iterator
 from models import PaperAnalysis, ResearchLandscape, ResearchCluster
-from utils import logger
+from utils import (
+    logger, cached_llm_json, get_openai_client,
+    as_str, as_list, as_dict, json_repair_messages
+)
 import config
 
 
+_format_landscape_prompt = config.PROMPTS["landscape_analysis"].format
+
+
 def analyze_research_landscape(
     papers_analysis: Dict[str, PaperAnalysis],
     api_key: str
@@ -33,43 +39,53 @@ def analyze_research_landscape(
     analysis_summary = prepare_analysis_summary(papers_analysis)
     
     # 调用LLM进行分析
-    client = OpenAI(api_key=api_key)
+    client = get_openai_client(api_key)
     
-    prompt = config.PROMPTS["landscape_analysis"].format(
+    prompt = _format_landscape_prompt(
         papers_analysis=analysis_summary
     )
+    system_prompt = "你是一位学术研究综述专家。请严格按照JSON格式输出。"
     
-    try:
+    def llm_call(messages: List[Dict[str, str]]) -> str:
         response = client.chat.completions.create(
             model=config.OPENAI_MODEL,  # 使用主模型
-            messages=[
-                {"role": "system", "content": "你是一位学术研究综述专家。请严格按照JSON格式输出。"},
-                {"role": "user", "content": prompt}
-            ],
+            messages=messages,
             temperature=0.5,
             response_format={"type": "json_object"}
         )
-        
-        result_text = response.choices[0].message.content
-        result_json = json.loads(result_text)
+        return response.choices[0].message.content
+    
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+    
+    try:
+        result_json = cached_llm_json(
+            lambda: llm_call(messages),
+            system_prompt, prompt, 0.5, config.OPENAI_MODEL,
+            repair=lambda text: llm_call(json_repair_messages(text))
+        )
         
         # 构建ResearchLandscape对象
         clusters = []
-        for cluster_data in result_json.get("clusters", []):
+        for cluster_data in as_list(result_json.get("clusters")):
+            if not isinstance(cluster_data, dict):
+                continue
             cluster = ResearchCluster(
-                cluster_name=cluster_data.get("cluster_name", ""),
-                papers=cluster_data.get("papers", []),
-                key_themes=cluster_data.get("key_themes", []),
-                technical_evolution=cluster_data.get("technical_evolution", "")
+                cluster_name=as_str(cluster_data.get("cluster_name")),
+                papers=as_list(cluster_data.get("papers")),
+                key_themes=as_list(cluster_data.get("key_themes")),
+                technical_evolution=as_str(cluster_data.get("technical_evolution"))
             )
             clusters.append(cluster)
         
         landscape = ResearchLandscape(
             clusters=clusters,
-            solved_problems=result_json.get("solved_problems", []),
-            partially_solved=result_json.get("partially_solved", []),
-            unsolved_problems=result_json.get("unsolved_problems", []),
-            technical_evolution=result_json.get("technical_evolution", {})
+            solved_problems=as_list(result_json.get("solved_problems")),
+            partially_solved=as_list(result_json.get("partially_solved")),
+            unsolved_problems=as_list(result_json.get("unsolved_problems")),
+            technical_evolution=as_dict(result_json.get("technical_evolution"))
         )
         
         logger.info(f"Identified {len(clusters)} research clusters and {len(landscape.unsolved_problems)} unsolved problems")
@@ -94,20 +110,26 @@ def prepare_analysis_summary(papers_analysis: Dict[str, PaperAnalysis]) -> str:
     Returns:
         格式化的摘要文本
     """
-    summaries = []
-    
-    for paper_id, analysis in papers_analysis.items():
-        summary = f"""
-Paper ID: {paper_id}
-核心问题: {analysis.core_problem}
-关键方法: {analysis.key_method}
-技术路线: {analysis.technical_approach}
-贡献点: {', '.join(analysis.contributions)}
-局限性: {', '.join(analysis.limitations)}
-"""
-        summaries.append(summary)
+    buf = io.StringIO()
+    
+    for n, (paper_id, analysis) in enumerate(papers_analysis.items()):
+        if n:
+            buf.write("\n---\n")
+        
+        contributions = ', '.join(analysis.contributions)
+        limitations = ', '.join(analysis.limitations)
+        # 相邻f-string在编译期合并，每篇论文只构造一次字符串
+        summary = (
+            f"\nPaper ID: {paper_id}\n"
+            f"核心问题: {analysis.core_problem}\n"
+            f"关键方法: {analysis.key_method}\n"
+            f"技术路线: {analysis.technical_approach}\n"
+            f"贡献点: {contributions}\n"
+            f"局限性: {limitations}\n"
+        )
+        buf.write(summary)
     
-    return "\n---\n".join(summaries)
+    return buf.getvalue()
 
 
 def format_landscape_summary(landscape: ResearchLandscape) -> str:
@@ -120,38 +142,45 @@ def format_landscape_summary(landscape: ResearchLandscape) -> str:
     Returns:
         Markdown格式的摘要
     """
-    sections = ["# 研究脉络分析\n"]
+    return "".join(_iter_landscape_summary(landscape))
+
+
+def _iter_landscape_summary(landscape: ResearchLandscape) -> Iterator[str]:
+    """逐段生成研究脉络摘要（调用方只需前缀时可提前停止迭代）"""
+    yield "# 研究脉络分析\n"
     
     # 研究方向聚类
-    sections.append("## 研究方向聚类\n")
-    for i, cluster in enumerate(landscape.clusters, 1):
-        sections.append(f"### {i}. {cluster.cluster_name}\n")
-        sections.append(f"**关键主题**: {', '.join(cluster.key_themes)}\n")
-        sections.append(f"**技术演进**: {cluster.technical_evolution}\n")
-        sections.append(f"**相关论文数**: {len(cluster.papers)}\n")
-    
-    # 问题状态
-    sections.append("\n## 研究问题状态\n")
-    
-    if landscape.solved_problems:
-        sections.append("### ✅ 已解决的问题\n")
-        for problem in landscape.solved_problems:
-            sections.append(f"- {problem}\n")
-    
-    if landscape.partially_solved:
-        sections.append("\n### 🔄 半解决的问题\n")
-        for problem in landscape.partially_solved:
-            sections.append(f"- {problem}\n")
-    
-    if landscape.unsolved_problems:
-        sections.append("\n### ❓ 未解决的问题（按重要性排序）\n")
-        for i, problem in enumerate(landscape.unsolved_problems, 1):
-            sections.append(f"{i}. {problem}\n")
+    if landscape.clusters:
+        yield "## 研究方向聚类\n"
+        for i, cluster in enumerate(landscape.clusters, 1):
+            yield f"### {i}. {cluster.cluster_name}\n"
+            yield f"**关键主题**: {', '.join(cluster.key_themes)}\n"
+            yield f"**技术演进**: {cluster.technical_evolution}\n"
+            yield f"**相关论文数**: {len(cluster.papers)}\n"
+    
+    # 问题状态（三类问题都为空时整节省略）
+    problem_sections = [
+        (header, items, numbered)
+        for header, items, numbered in (
+            ("### ✅ 已解决的问题\n", landscape.solved_problems, False),
+            ("\n### 🔄 半解决的问题\n", landscape.partially_solved, False),
+            ("\n### ❓ 未解决的问题（按重要性排序）\n", landscape.unsolved_problems, True),
+        )
+        if items
+    ]
+    if problem_sections:
+        yield "\n## 研究问题状态\n"
+        for header, items, numbered in problem_sections:
+            yield header
+            if numbered:
+                for i, problem in enumerate(items, 1):
+                    yield f"{i}. {problem}\n"
+            else:
+                for problem in items:
+                    yield f"- {problem}\n"
     
     # 技术演进
     if landscape.technical_evolution:
-        sections.append("\n## 技术演进路线\n")
+        yield "\n## 技术演进路线\n"
         for direction, evolution in landscape.technical_evolution.items():
-            sections.append(f"**{direction}**: {evolution}\n")
-    
-    return "".join(sections)
+            yield f"**{direction}**: {evolution}\n"
@@ -2,12 +2,21 @@
 研究脉络分析器 - 重构版（适配Celery和llm_manager）
 """
 import json
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
 from models import PaperAnalysis, ResearchLandscape
-from utils import logger
+from utils import logger, cached_llm_json, json_dumps, json_repair_messages
 import config
 
 
+_SYSTEM_PROMPT = "你是一位资深的科研领域专家，擅长从大量文献中提炼研究趋势和识别研究空白。请严格按照JSON格式输出。"
+_TEMPERATURE = 0.5
+_CHUNK_SIZE = 10  # 每批（map阶段单次LLM调用）的论文数
+_MAX_MAP_WORKERS = 8
+_format_landscape_prompt = config.PROMPTS["landscape_analysis"].format
+_format_merge_prompt = config.PROMPTS["landscape_merge"].format
+
+
 class ResearchLandscapeAnalyzer:
     """研究脉络分析器"""
     
@@ -28,6 +37,9 @@ class ResearchLandscapeAnalyzer:
         """
         分析研究脉络
         
+        论文较多时采用map-reduce：按批并发分析，再由一次LLM调用合并各批结果，
+        所有论文都参与分析，且调用深度固定为两层。
+        
         Args:
             analyses: 文献分析结果列表
             llm_name: 使用的LLM名称
@@ -38,41 +50,31 @@ class ResearchLandscapeAnalyzer:
         if not analyses:
             raise ValueError("No paper analyses provided")
         
-        # 构建分析摘要
-        analyses_summary = []
-        for i, analysis in enumerate(analyses[:20]):  # 限制数量避免token过多
-            analyses_summary.append({
-                "index": i + 1,
-                "core_problem": analysis.core_problem,
-                "key_method": analysis.key_method,
-                "limitations": analysis.limitations
-            })
-        
-        # 构建提示词
-        prompt = config.PROMPTS["landscape_analysis"].format(
-            papers_analysis=json.dumps(analyses_summary, ensure_ascii=False, indent=2)
-        )
-        
         try:
-            # 调用LLM分析
-            response = self.llm_manager.chat(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "你是一位资深的科研领域专家，擅长从大量文献中提炼研究趋势和识别研究空白。请严格按照JSON格式输出。"
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                llm_name=llm_name,
-                temperature=0.5,
-                json_mode=True
-            )
+            chunks = [
+                analyses[i:i + _CHUNK_SIZE]
+                for i in range(0, len(analyses), _CHUNK_SIZE)
+            ]
             
-            # 解析响应
-            result_json = json.loads(response.content)
+            if len(chunks) == 1:
+                result_json = self._analyze_chunk(chunks[0], llm_name)
+            else:
+                logger.info(f"Analyzing {len(analyses)} papers in {len(chunks)} chunks")
+                
+                # map：各批并发分析（相同批次输入命中缓存，新增论文时只需重算变化的批次）
+                with ThreadPoolExecutor(
+                    max_workers=min(_MAX_MAP_WORKERS, len(chunks)),
+                    thread_name_prefix="landscape-map"
+                ) as executor:
+                    partial_landscapes = list(executor.map(
+                        lambda chunk: self._analyze_chunk(chunk, llm_name), chunks
+                    ))
+                
+                # reduce：合并各批结果
+                result_json = self._call_llm(
+                    _format_merge_prompt(partial_landscapes=json_dumps(partial_landscapes)),
+                    llm_name
+                )
             
             # 创建ResearchLandscape对象
             landscape = ResearchLandscape(
@@ -93,11 +95,54 @@ class ResearchLandscapeAnalyzer:
             return ResearchLandscape(
                 clusters=[],
                 solved_problems=[],
-                partially_solved_problems=[],
+                partially_solved=[],
                 unsolved_problems=["Failed to analyze landscape"],
-                tech_evolution=[]
+                technical_evolution={}
             )
         
         except Exception as e:
             logger.error(f"Landscape analysis failed: {e}")
             raise
+    
+    def _analyze_chunk(
+        self,
+        analyses: List[PaperAnalysis],
+        llm_name: Optional[str]
+    ) -> Dict[str, Any]:
+        """分析一批论文，返回该批的研究脉络JSON"""
+        analyses_summary = [
+            {
+                "paper_id": analysis.paper_id,
+                "core_problem": analysis.core_problem,
+                "key_method": analysis.key_method,
+                "limitations": analysis.limitations
+            }
+            for analysis in analyses
+        ]
+        
+        return self._call_llm(
+            _format_landscape_prompt(papers_analysis=json_dumps(analyses_summary)),
+            llm_name
+        )
+    
+    def _call_llm(self, prompt: str, llm_name: Optional[str]) -> Dict[str, Any]:
+        """调用LLM并解析JSON响应（相同提示词命中缓存，非法JSON时请求修复）"""
+        def llm_call(messages: List[Dict[str, str]]) -> str:
+            return self.llm_manager.chat(
+                messages=messages,
+                llm_name=llm_name,
+                temperature=_TEMPERATURE,
+                json_mode=True
+            ).content
+        
+        return cached_llm_json(
+            lambda: llm_call([
+                {"role": "system", "content": _SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ]),
+            _SYSTEM_PROMPT,
+            prompt,
+            _TEMPERATURE,
+            llm_name or self.llm_manager.get_default_llm_name(),
+            repair=lambda text: llm_call(json_repair_messages(text))
+        )
@@ -3,11 +3,41 @@
 支持多源文献搜索和智能过滤
 """
 import arxiv
-from typing import List, Optional
+import hashlib
+import heapq
+import random
+import re
+from itertools import repeat
+from operator import attrgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from models import ResearchIntent, PaperMetadata, PaperType
-from utils import logger, get_cache_key, save_to_cache, load_from_cache
+from utils import (
+    logger, get_cache_key, save_to_cache, load_from_cache, normalize_title, word_set,
+    embedding_available, semantic_similarities,
+)
 import config
-from datetime import datetime
+from datetime import datetime, timedelta
+
+
+_ARXIV_MAX_PAGE_SIZE = 2000  # arXiv API单次请求的最大结果数
+_BY_RELEVANCE = attrgetter("relevance_score")
+
+# 综述特征词，合并为一个正则，一次扫描即可找出全部命中
+_SURVEY_KEYWORDS = ('survey', 'review', 'overview', 'tutorial', '综述')
+_SURVEY_RE = re.compile("|".join(map(re.escape, _SURVEY_KEYWORDS)), re.IGNORECASE)
+
+# 近似重复检测（MinHash + LSH分桶）参数
+_SHINGLE_SIZE = 3  # 精确比对使用的字符n-gram长度
+_LSH_BANDS = 16
+_LSH_ROWS = 4  # 16×4=64个哈希函数（对标题词集合计算），候选阈值约为Jaccard 0.5
+_NEAR_DUP_THRESHOLD = 0.85  # 候选对的字符n-gram Jaccard达到该值才判为重复
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)  # 固定种子，保证结果可复现
+_MINHASH_PARAMS = tuple(
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(_LSH_BANDS * _LSH_ROWS)
+)
+del _rng
 
 
 def search_papers(intent: ResearchIntent, max_results: int = None) -> List[PaperMetadata]:
@@ -35,27 +65,91 @@ def search_papers(intent: ResearchIntent, max_results: int = None) -> List[Paper
     cached_results = load_from_cache(cache_key, cache_type="papers")
     if cached_results:
         logger.info(f"Loaded {len(cached_results)} papers from cache")
-        return [PaperMetadata(**p) for p in cached_results]
+        return [_paper_from_dict(p) for p in cached_results]
+    
+    # 关键词换了说法时，复用语义相近的历史检索结果
+    cached_results = _lookup_similar_search(intent, max_results)
+    if cached_results:
+        logger.info(f"Loaded {len(cached_results)} papers from semantically similar search")
+        return [_paper_from_dict(p) for p in cached_results]
     
     # 搜索ArXiv
     papers = search_arxiv(intent, max_results)
     
-    # 应用过滤
-    filtered_papers = filter_papers(papers, intent)
-    
-    # 计算相关度评分
-    scored_papers = score_relevance(filtered_papers, intent)
-    
-    # 排序
-    sorted_papers = sorted(scored_papers, key=lambda p: p.relevance_score, reverse=True)
+    # 过滤、评分、取Top-N在一次遍历中完成，不生成中间列表
+    sorted_papers = heapq.nlargest(
+        max_results,
+        _iter_scored_papers(_iter_filtered_papers(papers, intent), intent),
+        key=_BY_RELEVANCE
+    )
     
     # 保存到缓存
     save_to_cache(cache_key, [p.to_dict() for p in sorted_papers], cache_type="papers")
+    _remember_search(intent, max_results, cache_key)
     
     logger.info(f"Found {len(sorted_papers)} papers after filtering")
     return sorted_papers
 
 
+def _search_group_key(intent: ResearchIntent, max_results: int) -> str:
+    """除关键词外的检索条件相同的查询归为一组，组内才做语义匹配"""
+    return get_cache_key({
+        'year_start': intent.year_start,
+        'year_end': intent.year_end,
+        'paper_type': intent.paper_type.value,
+        'journal_level': intent.journal_level.value,
+        'field': intent.field.value,
+        'max_results': max_results
+    })
+
+
+def _lookup_similar_search(intent: ResearchIntent, max_results: int) -> Optional[List[dict]]:
+    """
+    在同组的历史检索中找关键词语义最相近的一条，相似度超过阈值时返回其缓存结果
+    
+    句向量模型不可用时不做语义匹配（只有精确缓存生效）
+    """
+    if not embedding_available():
+        return None
+    
+    group_key = _search_group_key(intent, max_results)
+    entries = load_from_cache(group_key, cache_type="papers_semantic") or []
+    if not entries:
+        return None
+    
+    similarities = semantic_similarities(intent.keywords, [e["keywords"] for e in entries])
+    if not similarities:
+        return None
+    score, index = max(zip(similarities, range(len(entries))))
+    if score <= config.PAPERS_CACHE_SIMILARITY:
+        return None
+    
+    # 命中的历史结果可能已过期
+    cached_results = load_from_cache(entries[index]["key"], cache_type="papers")
+    if not cached_results:
+        return None
+    
+    entries[index]["hits"] += 1
+    save_to_cache(group_key, entries, cache_type="papers_semantic")
+    logger.debug(f"Semantic search cache hit ({score:.2f}): {entries[index]['keywords']}")
+    return cached_results
+
+
+def _remember_search(intent: ResearchIntent, max_results: int, cache_key: str):
+    """记录一次检索供语义匹配，超出上限时淘汰命中次数最少的历史查询"""
+    if not embedding_available():
+        return
+    
+    group_key = _search_group_key(intent, max_results)
+    entries = load_from_cache(group_key, cache_type="papers_semantic") or []
+    entries = [e for e in entries if e["key"] != cache_key]
+    entries.append({"keywords": intent.keywords, "key": cache_key, "hits": 0})
+    if len(entries) > config.PAPERS_CACHE_MAX_QUERIES:
+        # 新加入的查询不参与淘汰
+        entries.remove(min(entries[:-1], key=lambda e: e["hits"]))
+    save_to_cache(group_key, entries, cache_type="papers_semantic")
+
+
 def search_arxiv(intent: ResearchIntent, max_results: int) -> List[PaperMetadata]:
     """
     搜索ArXiv
@@ -68,22 +162,24 @@ def search_arxiv(intent: ResearchIntent, max_results: int) -> List[PaperMetadata
         论文元数据列表
     """
     query = build_arxiv_query(intent)
-    logger.info(f"Searching ArXiv with query: {query}")
     
-    # 临时禁用代理（ArXiv不需要代理，且代理可能导致SSL错误）
-    import os
-    old_http_proxy = os.environ.get('HTTP_PROXY')
-    old_https_proxy = os.environ.get('HTTPS_PROXY')
-    old_http_proxy_lower = os.environ.get('http_proxy')
-    old_https_proxy_lower = os.environ.get('https_proxy')
+    # 查询级缓存（search_papers和search_multi_source都经过这里）
+    cache_key = get_cache_key({'query': query, 'max_results': max_results})
+    cached_results = load_from_cache(
+        cache_key,
+        cache_type="arxiv_raw",
+        max_age=timedelta(hours=config.ARXIV_CACHE_TTL_HOURS)
+    )
+    if cached_results is not None:
+        logger.info(f"Loaded {len(cached_results)} ArXiv results from cache for query: {query}")
+        return [_paper_from_dict(p) for p in cached_results]
+    
+    logger.info(f"Searching ArXiv with query: {query}")
     
     try:
-        # 清除代理设置
-        for key in ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy']:
-            if key in os.environ:
-                del os.environ[key]
-        
-        client = arxiv.Client()
+        # 一次请求取回全部结果：arxiv.Client默认每页100条且页间强制等待3秒，
+        # 而arXiv API单次最多可返回2000条
+        client = _new_arxiv_client(page_size=max(1, min(max_results, _ARXIV_MAX_PAGE_SIZE)))
         search = arxiv.Search(
             query=query,
             max_results=max_results,
@@ -109,21 +205,33 @@ def search_arxiv(intent: ResearchIntent, max_results: int) -> List[PaperMetadata
             papers.append(paper)
         
         logger.info(f"Retrieved {len(papers)} papers from ArXiv")
+        save_to_cache(cache_key, [p.to_dict() for p in papers], cache_type="arxiv_raw")
         return papers
-            
+    
     except Exception as e:
         logger.error(f"Error searching ArXiv: {e}")
         raise
-    finally:
-        # 恢复代理设置
-        if old_http_proxy:
-            os.environ['HTTP_PROXY'] = old_http_proxy
-        if old_https_proxy:
-            os.environ['HTTPS_PROXY'] = old_https_proxy
-        if old_http_proxy_lower:
-            os.environ['http_proxy'] = old_http_proxy_lower
-        if old_https_proxy_lower:
-            os.environ['https_proxy'] = old_https_proxy_lower
+
+
+def _new_arxiv_client(page_size: int) -> arxiv.Client:
+    """
+    创建不走代理的ArXiv客户端
+    
+    ArXiv不需要代理，且代理可能导致SSL错误。直接关闭客户端会话的trust_env，
+    不再临时改写os.environ（多线程并发检索时改写进程环境变量会相互覆盖）
+    """
+    client = arxiv.Client(page_size=page_size)
+    client._session.trust_env = False
+    client._session.proxies = {}
+    return client
+
+
+def _paper_from_dict(data: dict) -> PaperMetadata:
+    """由缓存中的字典还原PaperMetadata（paper_type存的是枚举值）"""
+    paper_type = data.get("paper_type")
+    if paper_type is not None:
+        data = {**data, "paper_type": PaperType(paper_type)}
+    return PaperMetadata(**data)
 
 
 def build_arxiv_query(intent: ResearchIntent) -> str:
@@ -164,30 +272,31 @@ def filter_papers(papers: List[PaperMetadata], intent: ResearchIntent) -> List[P
     Returns:
         过滤后的论文列表
     """
-    filtered = []
+    return list(_iter_filtered_papers(papers, intent))
+
+
+def _iter_filtered_papers(papers: Iterable[PaperMetadata], intent: ResearchIntent) -> Iterator[PaperMetadata]:
+    """逐篇产出通过意图过滤的论文（filter_papers的惰性版本）"""
+    # 循环不变量提到循环外
+    year_start = intent.year_start
+    year_end = intent.year_end
+    wanted_type = intent.paper_type if intent.paper_type != PaperType.ANY else None
     
     for paper in papers:
         # 年份过滤
-        if intent.year_start or intent.year_end:
-            try:
-                year = int(paper.published.split('-')[0])
-                if intent.year_start and year < intent.year_start:
-                    continue
-                if intent.year_end and year > intent.year_end:
-                    continue
-            except:
-                pass
+        if (year_start or year_end) and paper.year is not None:
+            if year_start and paper.year < year_start:
+                continue
+            if year_end and paper.year > year_end:
+                continue
         
         # 文献类型过滤
-        if intent.paper_type != PaperType.ANY:
-            paper_type = detect_paper_type(paper)
-            paper.paper_type = paper_type
-            if paper_type != intent.paper_type and intent.paper_type != PaperType.ANY:
+        if wanted_type is not None:
+            paper.paper_type = detect_paper_type(paper)
+            if paper.paper_type != wanted_type:
                 continue
         
-        filtered.append(paper)
-    
-    return filtered
+        yield paper
 
 
 def detect_paper_type(paper: PaperMetadata) -> PaperType:
@@ -201,17 +310,11 @@ def detect_paper_type(paper: PaperMetadata) -> PaperType:
         论文类型
     """
     # 简单的启发式规则
-    title_lower = paper.title.lower()
-    abstract_lower = paper.abstract.lower()
-    
-    survey_keywords = ['survey', 'review', 'overview', 'tutorial', '综述']
-    
-    for keyword in survey_keywords:
-        if keyword in title_lower:
-            return PaperType.SURVEY
+    if _SURVEY_RE.search(paper.title):
+        return PaperType.SURVEY
     
-    # 检查摘要中是否有大量综述特征
-    survey_count = sum(1 for kw in survey_keywords if kw in abstract_lower)
+    # 检查摘要中是否有大量综述特征（按命中的不同特征词计数）
+    survey_count = len({kw.lower() for kw in _SURVEY_RE.findall(paper.abstract or "")})
     if survey_count >= 2:
         return PaperType.SURVEY
     
@@ -229,63 +332,169 @@ def score_relevance(papers: List[PaperMetadata], intent: ResearchIntent) -> List
     Returns:
         带评分的论文列表
     """
-    keywords = intent.keywords.lower().split()
-    
-    for paper in papers:
-        score = 0.0
-        title_lower = paper.title.lower()
-        abstract_lower = paper.abstract.lower()
-        
-        # 标题匹配（权重更高）
-        for keyword in keywords:
-            if keyword in title_lower:
-                score += 0.3
-        
-        # 摘要匹配
-        for keyword in keywords:
-            if keyword in abstract_lower:
-                score += 0.1
+    return list(_iter_scored_papers(papers, intent))
+
+
+def _iter_scored_papers(papers: Iterable[PaperMetadata], intent: ResearchIntent) -> Iterator[PaperMetadata]:
+    """逐篇计算relevance_score并产出论文（score_relevance的惰性版本）"""
+    keywords = word_set(intent.keywords)
+    wanted_type = intent.paper_type if intent.paper_type != PaperType.ANY else None
+    current_year = datetime.now().year
+    
+    # 句向量模型可用时需要整批编码，先物化输入
+    similarities = None
+    if embedding_available():
+        papers = list(papers)
+        similarities = semantic_scores(papers, intent)
+    semantic = similarities is not None
+    
+    for paper, similarity in zip(papers, similarities or repeat(None)):
+        score = match_score(paper, keywords, similarity, semantic)
         
         # 类型匹配奖励
-        if intent.paper_type != PaperType.ANY and paper.paper_type == intent.paper_type:
+        if wanted_type is not None and paper.paper_type == wanted_type:
             score += 0.2
         
         # 时间新近性奖励
-        try:
-            year = int(paper.published.split('-')[0])
-            current_year = datetime.now().year
-            recency = 1.0 - (current_year - year) / 10.0  # 10年衰减
+        if paper.year is not None:
+            recency = 1.0 - (current_year - paper.year) / 10.0  # 10年衰减
             score += max(0, recency * 0.1)
-        except:
-            pass
         
         paper.relevance_score = min(1.0, score)  # 归一化到[0, 1]
+        yield paper
+
+
+def match_score(
+    paper: PaperMetadata,
+    keywords: Set[str],
+    similarity: Optional[float],
+    semantic: bool
+) -> float:
+    """
+    论文与研究意图的匹配分（不含类型、新近性等加分项）
+    
+    关键词打分：标题每命中一个词0.3，摘要每命中一个词0.1。
+    语义模式下所有论文统一到同一尺度：关键词分截断到[0, 1]后占一半权重，
+    参与了句向量编码的论文再加上一半权重的余弦相似度，
+    未进入语义粗筛前K篇的论文只有关键词那一半，不会因尺度不同排到语义打分的论文前面
+    
+    Args:
+        paper: 论文
+        keywords: 研究意图关键词集合
+        similarity: 句向量相似度（未编码的论文为None）
+        semantic: 本批论文是否启用了语义打分
+    """
+    # 标题匹配（权重更高）+ 摘要匹配
+    lexical = 0.3 * len(keywords & paper.title_words) + 0.1 * len(keywords & paper.abstract_words)
+    if not semantic:
+        return lexical
+    
+    score = 0.5 * min(1.0, lexical)
+    if similarity is not None:
+        score += 0.5 * max(0.0, similarity)
+    return score
+
+
+def semantic_scores(papers: List[PaperMetadata], intent: ResearchIntent) -> Optional[List[Optional[float]]]:
+    """
+    论文（标题+摘要）与研究意图关键词的句向量相似度
     
-    return papers
+    论文数超过config.SEMANTIC_RERANK_TOP_K时先按关键词命中数粗筛，
+    只对前K篇编码，其余论文的相似度为None（只计关键词分，见match_score）
+    
+    Args:
+        papers: 论文列表
+        intent: 研究意图
+    
+    Returns:
+        与papers顺序一致的相似度列表；句向量模型不可用时返回None
+    """
+    top_k = config.SEMANTIC_RERANK_TOP_K
+    if len(papers) <= top_k:
+        candidates = range(len(papers))
+    else:
+        keywords = word_set(intent.keywords)
+        # 与关键词打分一致：标题命中的权重是摘要的3倍
+        lexical = [
+            3 * len(keywords & paper.title_words) + len(keywords & paper.abstract_words)
+            for paper in papers
+        ]
+        candidates = heapq.nlargest(top_k, range(len(papers)), key=lexical.__getitem__)
+    
+    similarities = semantic_similarities(
+        intent.keywords,
+        [f"{papers[i].title}. {papers[i].abstract or ''}" for i in candidates]
+    )
+    if similarities is None:
+        return None
+    
+    scores: List[Optional[float]] = [None] * len(papers)
+    for i, similarity in zip(candidates, similarities):
+        scores[i] = similarity
+    return scores
+
+
+def _title_shingles(title_norm: str) -> Set[str]:
+    """标题的字符n-gram集合"""
+    if len(title_norm) <= _SHINGLE_SIZE:
+        return {title_norm}
+    return {title_norm[i:i + _SHINGLE_SIZE] for i in range(len(title_norm) - _SHINGLE_SIZE + 1)}
+
+
+def _minhash_bands(title_norm: str) -> List[Tuple[int, Tuple[int, ...]]]:
+    """对标题词集合计算MinHash签名并切分为LSH分桶键"""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+        for word in set(title_norm.split()) or {title_norm}
+    ]
+    signature = [
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _MINHASH_PARAMS
+    ]
+    return [
+        (band, tuple(signature[band * _LSH_ROWS:(band + 1) * _LSH_ROWS]))
+        for band in range(_LSH_BANDS)
+    ]
 
 
 def deduplicate_papers(papers: List[PaperMetadata]) -> List[PaperMetadata]:
     """
     去重论文（处理ArXiv版本和期刊版本）
     
+    先按标准化标题精确匹配，再对标题词集合做MinHash + LSH找出近似重复的候选
+    （标点、版本后缀等差异），候选对的字符n-gram Jaccard达到阈值才判为重复。
+    保留先出现的论文。
+    
     Args:
         papers: 论文列表
     
     Returns:
         去重后的论文列表
     """
-    seen_titles = set()
+    # 精确去重：dict.setdefault保留每个标准化标题首次出现的论文
+    exact_unique: Dict[str, PaperMetadata] = {}
+    for paper in papers:
+        exact_unique.setdefault(paper.title_norm, paper)
+    
+    kept_shingles: List[Set[str]] = []
+    lsh_buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
     unique_papers = []
     
-    for paper in papers:
-        # 简单的标题相似度去重
-        title_normalized = paper.title.lower().strip()
+    for title_normalized, paper in exact_unique.items():
+        shingles = _title_shingles(title_normalized)
+        bands = _minhash_bands(title_normalized)
+        candidates = {idx for band in bands for idx in lsh_buckets.get(band, ())}
+        if any(
+            len(shingles & kept_shingles[idx]) / len(shingles | kept_shingles[idx]) >= _NEAR_DUP_THRESHOLD
+            for idx in candidates
+        ):
+            logger.debug(f"Near-duplicate paper filtered: {paper.title}")
+            continue
         
-        if title_normalized not in seen_titles:
-            seen_titles.add(title_normalized)
-            unique_papers.append(paper)
-        else:
-            logger.debug(f"Duplicate paper filtered: {paper.title}")
+        for band in bands:
+            lsh_buckets.setdefault(band, []).append(len(kept_shingles))
+        kept_shingles.append(shingles)
+        unique_papers.append(paper)
     
     logger.info(f"Deduplicated: {len(papers)} -> {len(unique_papers)} papers")
     return unique_papers
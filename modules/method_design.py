@@ -3,9 +3,8 @@
 将研究想法转化为具体方法框架
 """
 import json
-from openai import OpenAI
 from models import ResearchIdea, MethodDesign
-from utils import logger
+from utils import logger, get_openai_client, json_loads
 import config
 
 
@@ -26,7 +25,7 @@ def design_method(idea: ResearchIdea, api_key: str) -> MethodDesign:
     idea_description = format_idea_for_design(idea)
     
     # 调用LLM
-    client = OpenAI(api_key=api_key)
+    client = get_openai_client(api_key)
     
     prompt = config.PROMPTS["method_design"].format(idea=idea_description)
     
@@ -42,7 +41,7 @@ def design_method(idea: ResearchIdea, api_key: str) -> MethodDesign:
         )
         
         result_text = response.choices[0].message.content
-        result_json = json.loads(result_text)
+        result_json = json_loads(result_text)
         
         # 构建MethodDesign对象
         method = MethodDesign(
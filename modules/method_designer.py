@@ -4,11 +4,38 @@
 import json
 from typing import Optional
 from models import ResearchIdea, MethodDesign
-from utils import logger
+from utils import logger, json_loads
 import config
 import uuid
 
 
+_SYSTEM_PROMPT = "你是一位资深的AI研究员，擅长设计创新的研究方法。请严格按照JSON格式输出。"
+_TEMPERATURE = 0.6
+_METHOD_PROMPT = """基于以下研究想法，设计详细的研究方法：
+
+**研究想法标题**: {title}
+**研究动机**: {motivation}
+**研究假设**: {hypothesis}
+**预期贡献**: {contributions}
+
+请设计包含以下内容的研究方法（JSON格式）:
+{{
+    "algorithm_framework": "算法框架的详细描述，包含核心思路",
+    "key_modules": [
+        {{
+            "name": "模块名称",
+            "description": "模块功能描述",
+            "implementation": "实现要点"
+        }}
+    ],
+    "data_requirements": "所需数据和预处理方法",
+    "evaluation_metrics": ["评估指标1", "评估指标2"],
+    "expected_challenges": ["可能遇到的挑战1", "挑战2"],
+    "innovation_points": ["创新点1", "创新点2"]
+}}"""
+_format_method_prompt = _METHOD_PROMPT.format
+
+
 class MethodDesigner:
     """方法设计生成器"""
     
@@ -37,49 +64,27 @@ class MethodDesigner:
             方法设计结果
         """
         # 构建提示词
-        prompt = f"""基于以下研究想法，设计详细的研究方法：
-
-**研究想法标题**: {idea.title}
-**研究动机**: {idea.motivation}
-**研究假设**: {idea.hypothesis}
-**预期贡献**: {idea.contributions}
-
-请设计包含以下内容的研究方法（JSON格式）:
-{{
-    "algorithm_framework": "算法框架的详细描述，包含核心思路",
-    "key_modules": [
-        {{
-            "name": "模块名称",
-            "description": "模块功能描述",
-            "implementation": "实现要点"
-        }}
-    ],
-    "data_requirements": "所需数据和预处理方法",
-    "evaluation_metrics": ["评估指标1", "评估指标2"],
-    "expected_challenges": ["可能遇到的挑战1", "挑战2"],
-    "innovation_points": ["创新点1", "创新点2"]
-}}"""
+        prompt = _format_method_prompt(
+            title=idea.title,
+            motivation=idea.motivation,
+            hypothesis=idea.hypothesis,
+            contributions=idea.contributions
+        )
         
         try:
             # 调用LLM设计方法
             response = self.llm_manager.chat(
                 messages=[
-                    {
-                        "role": "system",
-                        "content": "你是一位资深的AI研究员，擅长设计创新的研究方法。请严格按照JSON格式输出。"
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
+                    {"role": "system", "content": _SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
                 ],
                 llm_name=llm_name,
-                temperature=0.6,
+                temperature=_TEMPERATURE,
                 json_mode=True
             )
             
             # 解析响应
-            result_json = json.loads(response.content)
+            result_json = json_loads(response.content)
             
             # 创建MethodDesign对象
             method = MethodDesign(
@@ -4,16 +4,31 @@
 """
 from typing import List, Optional, Dict
 from models import ResearchIntent, PaperMetadata
-from modules.literature_discovery import search_arxiv, filter_papers
+from modules.literature_discovery import (
+    search_arxiv, filter_papers, normalize_title, semantic_scores, match_score
+)
 from modules.semantic_scholar import search_semantic_scholar
-from utils import logger
+from utils import logger, word_set
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from itertools import repeat
+from datetime import datetime
+import config
+import operator
 import os
+import time
+
+
+# 去重时的来源优先级（未列出的来源为1）
+_SOURCE_PRIORITY = {"arxiv": 3, "semantic_scholar": 2}
+
+_BY_RELEVANCE = operator.attrgetter("relevance_score")
 
 
 def search_multi_source(
     intent: ResearchIntent,
     max_results_per_source: int = 50,
-    sources: List[str] = None
+    sources: List[str] = None,
+    timeout: Optional[float] = None
 ) -> Dict[str, List[PaperMetadata]]:
     """
     从多个数据源检索文献
@@ -22,6 +37,8 @@ def search_multi_source(
         intent: 研究意图
         max_results_per_source: 每个源的最大结果数
         sources: 要使用的数据源列表（默认使用所有）
+        timeout: 单个数据源的最长等待秒数（默认config.SOURCE_SEARCH_TIMEOUT），
+            超时或失败的数据源结果为空，不阻塞其他数据源
     
     Returns:
         {source_name: papers}的字典
@@ -29,40 +46,36 @@ def search_multi_source(
     if sources is None:
         sources = ["arxiv", "semantic_scholar"]
     
+    # 各数据源之间无依赖，并发检索（总耗时≈最慢的数据源）
+    selected = [name for name in _SOURCE_SEARCHERS if name in sources]
     results = {}
-    
-    # ArXiv
-    if "arxiv" in sources:
-        logger.info("Searching ArXiv...")
-        try:
-            arxiv_papers = search_arxiv(intent, max_results_per_source)
-            # 应用过滤
-            filtered_arxiv = filter_papers(arxiv_papers, intent)
-            results["arxiv"] = filtered_arxiv
-            logger.info(f"ArXiv: Found {len(filtered_arxiv)} papers (filtered from {len(arxiv_papers)})")
-        except Exception as e:
-            logger.error(f"ArXiv search failed: {e}")
-            results["arxiv"] = []
-    
-    # Semantic Scholar
-    if "semantic_scholar" in sources:
-        logger.info("Searching Semantic Scholar...")
-        try:
-            s2_api_key = os.getenv("SEMANTIC_SCHOLAR_API_KEY")
-            s2_papers = search_semantic_scholar(
-                query=intent.keywords,
-                max_results=max_results_per_source,
-                year_start=intent.year_start,
-                year_end=intent.year_end,
-                api_key=s2_api_key
-            )
-            # 再次应用通用过滤以确保一致性
-            filtered_s2 = filter_papers(s2_papers, intent)
-            results["semantic_scholar"] = filtered_s2
-            logger.info(f"Semantic Scholar: Found {len(filtered_s2)} papers (filtered from {len(s2_papers)})")
-        except Exception as e:
-            logger.error(f"Semantic Scholar search failed: {e}")
-            results["semantic_scholar"] = []
+    if not selected:
+        return results
+    if timeout is None:
+        timeout = config.SOURCE_SEARCH_TIMEOUT
+    
+    executor = ThreadPoolExecutor(max_workers=len(selected), thread_name_prefix="lit-search")
+    try:
+        futures = {
+            name: executor.submit(_SOURCE_SEARCHERS[name][1], intent, max_results_per_source)
+            for name in selected
+        }
+        
+        # 所有数据源同时开始，共用同一个截止时间
+        deadline = time.monotonic() + timeout
+        for name, future in futures.items():
+            display_name = _SOURCE_SEARCHERS[name][0]
+            try:
+                results[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                logger.error(f"{display_name} search timed out after {timeout:g}s")
+                results[name] = []
+            except Exception as e:
+                logger.error(f"{display_name} search failed: {e}")
+                results[name] = []
+    finally:
+        # 不等待超时的数据源线程结束（其结果被丢弃）
+        executor.shutdown(wait=False)
     
     # TODO: 添加更多数据源
     # - PubMed
@@ -72,6 +85,40 @@ def search_multi_source(
     return results
 
 
+def _search_arxiv_source(intent: ResearchIntent, max_results: int) -> List[PaperMetadata]:
+    """ArXiv检索并过滤"""
+    logger.info("Searching ArXiv...")
+    arxiv_papers = search_arxiv(intent, max_results)
+    # 应用过滤
+    filtered_arxiv = filter_papers(arxiv_papers, intent)
+    logger.info(f"ArXiv: Found {len(filtered_arxiv)} papers (filtered from {len(arxiv_papers)})")
+    return filtered_arxiv
+
+
+def _search_semantic_scholar_source(intent: ResearchIntent, max_results: int) -> List[PaperMetadata]:
+    """Semantic Scholar检索并过滤"""
+    logger.info("Searching Semantic Scholar...")
+    s2_api_key = os.getenv("SEMANTIC_SCHOLAR_API_KEY")
+    s2_papers = search_semantic_scholar(
+        query=intent.keywords,
+        max_results=max_results,
+        year_start=intent.year_start,
+        year_end=intent.year_end,
+        api_key=s2_api_key
+    )
+    # 再次应用通用过滤以确保一致性
+    filtered_s2 = filter_papers(s2_papers, intent)
+    logger.info(f"Semantic Scholar: Found {len(filtered_s2)} papers (filtered from {len(s2_papers)})")
+    return filtered_s2
+
+
+# 数据源名称 → (显示名, 检索函数)，顺序即结果字典的顺序
+_SOURCE_SEARCHERS = {
+    "arxiv": ("ArXiv", _search_arxiv_source),
+    "semantic_scholar": ("Semantic Scholar", _search_semantic_scholar_source),
+}
+
+
 def merge_and_deduplicate(
     multi_source_results: Dict[str, List[PaperMetadata]]
 ) -> List[PaperMetadata]:
@@ -98,8 +145,8 @@ def merge_and_deduplicate(
     # 3. DOI匹配
     
     seen_arxiv_ids = set()
-    seen_titles = {}
-    unique_papers = []
+    # 标准化标题 → (来源, 论文)；dict保持插入顺序，替换时原位更新
+    unique_papers: Dict[str, tuple] = {}
     
     for source, paper in all_papers:
         # 检查ArXiv ID
@@ -110,56 +157,31 @@ def merge_and_deduplicate(
             seen_arxiv_ids.add(paper.arxiv_id)
         
         # 检查标题
-        title_norm = normalize_title(paper.title)
+        title_norm = paper.title_norm
+        existing = unique_papers.get(title_norm)
         
-        if title_norm in seen_titles:
+        if existing is not None:
             # 已存在，选择信息更完整的
-            existing_source, existing_paper = seen_titles[title_norm]
+            existing_source = existing[0]
             
             # 优先级：arxiv > semantic_scholar > others
-            source_priority = {"arxiv": 3, "semantic_scholar": 2}
-            existing_priority = source_priority.get(existing_source, 1)
-            current_priority = source_priority.get(source, 1)
+            existing_priority = _SOURCE_PRIORITY.get(existing_source, 1)
+            current_priority = _SOURCE_PRIORITY.get(source, 1)
             
             if current_priority > existing_priority:
                 # 替换为当前论文
-                unique_papers = [p for p in unique_papers if p != existing_paper]
-                unique_papers.append(paper)
-                seen_titles[title_norm] = (source, paper)
+                unique_papers[title_norm] = (source, paper)
                 logger.debug(f"Replaced paper from {existing_source} with {source}")
             else:
                 logger.debug(f"Duplicate by title: {title_norm[:50]}...")
             
             continue
         
-        seen_titles[title_norm] = (source, paper)
-        unique_papers.append(paper)
+        unique_papers[title_norm] = (source, paper)
     
     logger.info(f"Papers after deduplication: {len(unique_papers)}")
     
-    return unique_papers
-
-
-def normalize_title(title: str) -> str:
-    """
-    标准化标题用于匹配
-    
-    Args:
-        title: 原始标题
-    
-    Returns:
-        标准化后的标题
-    """
-    # 转小写
-    title = title.lower()
-    
-    # 移除标点和多余空格
-    import re
-    title = re.sub(r'[^\w\s]', '', title)
-    title = re.sub(r'\s+', ' ', title)
-    title = title.strip()
-    
-    return title
+    return [paper for _, paper in unique_papers.values()]
 
 
 def calculate_cross_source_relevance(
@@ -176,39 +198,27 @@ def calculate_cross_source_relevance(
     Returns:
         带评分的论文列表
     """
-    keywords = intent.keywords.lower().split()
+    keywords = word_set(intent.keywords)
     
-    for paper in papers:
-        score = 0.0
-        
-        title_lower = paper.title.lower()
-        abstract_lower = (paper.abstract or "").lower()
-        
-        # 标题匹配（权重高）
-        for keyword in keywords:
-            if keyword in title_lower:
-                score += 0.3
-        
-        # 摘要匹配
-        for keyword in keywords:
-            if keyword in abstract_lower:
-                score += 0.1
+    # 循环不变量提到循环外
+    wanted_type = intent.paper_type if intent.paper_type.value != "any" else None
+    current_year = datetime.now().year
+    
+    # 句向量模型可用时关键词与语义相似度混合打分（整批一次编码），否则只按关键词匹配
+    similarities = semantic_scores(papers, intent)
+    semantic = similarities is not None
+    
+    for paper, similarity in zip(papers, similarities or repeat(None)):
+        score = match_score(paper, keywords, similarity, semantic)
         
         # 类型匹配
-        if intent.paper_type.value != "any":
-            if paper.paper_type and paper.paper_type.value == intent.paper_type.value:
-                score += 0.2
+        if wanted_type is not None and paper.paper_type is wanted_type:
+            score += 0.2
         
         # 时间新近性
-        if paper.published:
-            try:
-                year = int(paper.published.split('-')[0])
-                from datetime import datetime
-                current_year = datetime.now().year
-                recency = 1.0 - (current_year - year) / 10.0
-                score += max(0, recency * 0.15)
-            except:
-                pass
+        if paper.year is not None:
+            recency = 1.0 - (current_year - paper.year) / 10.0
+            score += max(0, recency * 0.15)
         
         # Arxiv论文额外加分（通常更新、开放获取）
         if paper.arxiv_id:
@@ -217,6 +227,6 @@ def calculate_cross_source_relevance(
         paper.relevance_score = min(1.0, score)
     
     # 按相关度排序
-    papers.sort(key=lambda p: p.relevance_score, reverse=True)
+    papers.sort(key=_BY_RELEVANCE, reverse=True)
     
     return papers
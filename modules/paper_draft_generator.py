@@ -1,11 +1,100 @@
 """
 论文草稿生成器 - 重构版（适配Celery和llm_manager）
 """
-import json
 from typing import Optional, Dict
 from models import ResearchIdea, MethodDesign, PaperDraft, PaperSection
-from utils import logger
+from utils import logger, json_dumps
 import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+_SECTION_ORDER = (
+    ("abstract", "摘要"),
+    ("introduction", "引言"),
+    ("related_work", "相关工作"),
+    ("method", "方法"),
+    ("experiment", "实验设计"),
+    ("conclusion", "结论")
+)
+_SECTION_NAMES = dict(_SECTION_ORDER)
+
+# 各章节提示词模板（字段由_prompt_fields统一计算）
+_SECTION_PROMPTS = {
+    "abstract": """为以下研究写一个学术摘要（约200词）：
+标题: {title}
+动机: {motivation}
+假设: {hypothesis}
+方法: {algorithm_framework}
+创新点: {innovation_points}
+
+要求：包含背景、问题、方法、预期结果。""",
+
+    "introduction": """为以下研究写Introduction（约500词）：
+标题: {title}
+动机: {motivation}
+假设: {hypothesis}
+贡献: {contributions}
+
+要求：
+1. 开篇引出研究背景和重要性
+2. 指出当前研究的不足
+3. 提出本文的解决方案
+4. 总结本文贡献""",
+
+    "related_work": """基于以下信息写Related Work（约400词）：
+研究主题: {title}
+相关领域: {motivation}
+
+要求：
+1. 综述相关工作的主要方法
+2. 指出各方法的优缺点
+3. 说明本文方法的定位""",
+
+    "method": """基于以下方法设计写Method部分（约600词）：
+算法框架: {algorithm_framework}
+核心模块: {key_modules}
+数据需求: {data_requirements}
+
+要求：
+1. 详细描述整体框架
+2. 分模块介绍各组件
+3. 说明关键技术细节""",
+
+    "experiment": """基于以下信息设计Experiment部分（约400词）：
+评估指标: {evaluation_metrics}
+预期挑战: {expected_challenges}
+
+要求：
+1. 描述实验设置（数据集、基线方法）
+2. 设计消融实验
+3. 说明预期结果""",
+
+    "conclusion": """为以下研究写Conclusion（约200词）：
+标题: {title}
+贡献: {contributions}
+创新点: {innovation_points}
+
+要求：
+1. 总结本文工作
+2. 强调主要贡献
+3. 提出未来研究方向"""
+}
+
+
+def _prompt_fields(idea: ResearchIdea, method: MethodDesign) -> Dict[str, str]:
+    """计算各章节提示词共用的字段（同一份草稿只计算一次）"""
+    return {
+        "title": idea.title,
+        "motivation": idea.motivation,
+        "hypothesis": idea.hypothesis,
+        "contributions": idea.contributions,
+        "algorithm_framework": method.algorithm_framework,
+        "key_modules": json_dumps(method.key_modules),
+        "data_requirements": method.data_requirements,
+        "innovation_points": ', '.join(method.innovation_points),
+        "evaluation_metrics": ', '.join(method.evaluation_metrics),
+        "expected_challenges": ', '.join(method.expected_challenges),
+    }
 
 
 class PaperDraftGenerator:
@@ -26,7 +115,8 @@ class PaperDraftGenerator:
         method: MethodDesign,
         paper_analyses: list = None,
         progress_callback=None,
-        llm_name: Optional[str] = None
+        llm_name: Optional[str] = None,
+        max_workers: int = 6
     ) -> PaperDraft:
         """
         生成完整论文草稿
@@ -35,40 +125,50 @@ class PaperDraftGenerator:
             idea: 研究想法
             method: 方法设计
             paper_analyses: 文献分析列表（用于Related Work）
-            progress_callback: 进度回调函数
+            progress_callback: 进度回调函数 (已完成数, 总数, 消息)，在调用线程中执行
             llm_name: 使用的LLM名称
+            max_workers: 并发生成章节的线程数
         
         Returns:
             论文草稿
         """
-        sections = {}
-        section_order = [
-            ("abstract", "摘要"),
-            ("introduction", "引言"),
-            ("related_work", "相关工作"),
-            ("method", "方法"),
-            ("experiment", "实验设计"),
-            ("conclusion", "结论")
-        ]
+        prompt_fields = _prompt_fields(idea, method)
         
-        for i, (section_key, section_name) in enumerate(section_order):
-            if progress_callback:
-                progress_callback(i, len(section_order), f"Generating {section_name}...")
+        # 各章节只依赖idea/method，互不依赖，可并发生成（限速由LLM实例的令牌桶负责）
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="draft-section") as executor:
+            futures = {
+                executor.submit(
+                    self._generate_section,
+                    section_key=section_key,
+                    idea=idea,
+                    method=method,
+                    paper_analyses=paper_analyses,
+                    existing_sections={},
+                    llm_name=llm_name,
+                    prompt_fields=prompt_fields
+                ): section_key
+                for section_key, _ in _SECTION_ORDER
+            }
             
-            content = self._generate_section(
-                section_key=section_key,
-                idea=idea,
-                method=method,
-                paper_analyses=paper_analyses,
-                existing_sections=sections,
-                llm_name=llm_name
-            )
+            if progress_callback:
+                progress_callback(0, len(_SECTION_ORDER), "Generating sections...")
             
-            sections[section_key] = PaperSection(
+            contents = {}
+            for done, future in enumerate(as_completed(futures), 1):
+                section_key = futures[future]
+                contents[section_key] = future.result()
+                if progress_callback:
+                    progress_callback(done, len(_SECTION_ORDER), f"Generated {_SECTION_NAMES[section_key]}")
+        
+        # 按预定顺序组装章节
+        sections = {
+            section_key: PaperSection(
                 section_name=section_name,
-                content=content,
+                content=contents[section_key],
                 source_type="ai_generated"
             )
+            for section_key, section_name in _SECTION_ORDER
+        }
         
         # 创建PaperDraft
         draft = PaperDraft(
@@ -89,72 +189,14 @@ class PaperDraftGenerator:
         method: MethodDesign,
         paper_analyses: list,
         existing_sections: Dict,
-        llm_name: str
+        llm_name: str,
+        prompt_fields: Optional[Dict[str, str]] = None
     ) -> str:
-        """生成单个章节"""
-        
-        prompts = {
-            "abstract": f"""为以下研究写一个学术摘要（约200词）：
-标题: {idea.title}
-动机: {idea.motivation}
-假设: {idea.hypothesis}
-方法: {method.algorithm_framework}
-创新点: {', '.join(method.innovation_points)}
-
-要求：包含背景、问题、方法、预期结果。""",
-
-            "introduction": f"""为以下研究写Introduction（约500词）：
-标题: {idea.title}
-动机: {idea.motivation}
-假设: {idea.hypothesis}
-贡献: {idea.contributions}
-
-要求：
-1. 开篇引出研究背景和重要性
-2. 指出当前研究的不足
-3. 提出本文的解决方案
-4. 总结本文贡献""",
-
-            "related_work": f"""基于以下信息写Related Work（约400词）：
-研究主题: {idea.title}
-相关领域: {idea.motivation}
-
-要求：
-1. 综述相关工作的主要方法
-2. 指出各方法的优缺点
-3. 说明本文方法的定位""",
-
-            "method": f"""基于以下方法设计写Method部分（约600词）：
-算法框架: {method.algorithm_framework}
-核心模块: {json.dumps(method.key_modules, ensure_ascii=False)}
-数据需求: {method.data_requirements}
-
-要求：
-1. 详细描述整体框架
-2. 分模块介绍各组件
-3. 说明关键技术细节""",
-
-            "experiment": f"""基于以下信息设计Experiment部分（约400词）：
-评估指标: {', '.join(method.evaluation_metrics)}
-预期挑战: {', '.join(method.expected_challenges)}
-
-要求：
-1. 描述实验设置（数据集、基线方法）
-2. 设计消融实验
-3. 说明预期结果""",
-
-            "conclusion": f"""为以下研究写Conclusion（约200词）：
-标题: {idea.title}
-贡献: {idea.contributions}
-创新点: {', '.join(method.innovation_points)}
-
-要求：
-1. 总结本文工作
-2. 强调主要贡献
-3. 提出未来研究方向"""
-        }
-        
-        prompt = prompts.get(section_key, "请生成该章节内容。")
+        """生成单个章节（prompt_fields为预先计算的提示词字段，缺省时现算）"""
+        if prompt_fields is None:
+            prompt_fields = _prompt_fields(idea, method)
+        template = _SECTION_PROMPTS.get(section_key)
+        prompt = template.format_map(prompt_fields) if template else "请生成该章节内容。"
         
         try:
             response = self.llm_manager.chat(
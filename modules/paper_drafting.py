@@ -2,18 +2,55 @@
 论文草稿生成模块
 生成符合学术规范的论文各章节
 """
-import json
-from typing import Dict, List
-from openai import OpenAI
+import asyncio
+import io
+from itertools import islice
+from typing import Callable, Dict, List, Tuple
+from openai import AsyncOpenAI, OpenAI
 from models import (
     ResearchIdea, MethodDesign, ExperimentPlan,
     PaperDraft, PaperSection, PaperMetadata, PaperAnalysis,
     ResearchLandscape
 )
-from utils import logger
+from utils import (
+    json_dumps, logger, get_cache_key, save_to_cache, load_from_cache,
+    get_async_openai_client
+)
 import config
 
 
+_SECTION_ORDER = (
+    ('abstract', '摘要'),
+    ('introduction', '引言'),
+    ('related_work', '相关工作'),
+    ('method', '方法'),
+    ('experiments', '实验'),
+    ('discussion', '讨论'),
+    ('conclusion', '结论')
+)
+_SECTION_SYSTEM_PROMPT = "你是一位经验丰富的学术论文作者。"
+_SECTION_TEMPERATURE = 0.6
+_TITLE_SYSTEM_PROMPT = "你是一位学术论文撰写专家。"
+_TITLE_TEMPERATURE = 0.7
+_MAX_CITATIONS = 10  # 每个章节最多引用的论文数
+
+# Markdown输出的章节标题与PaperDraft字段，按排版顺序
+_DRAFT_LAYOUT = (
+    ("## Abstract\n", "abstract"),
+    ("## 1. Introduction\n", "introduction"),
+    ("## 2. Related Work\n", "related_work"),
+    ("## 3. Method\n", "method"),
+    ("## 4. Experiments\n", "experiments"),
+    ("## 5. Discussion\n", "discussion"),
+    ("## 6. Conclusion\n", "conclusion")
+)
+_SOURCE_LABELS = {
+    'literature': '📚 基于文献',
+    'hypothesis': '🔬 假设性分析',
+    'original': '💡 原创内容'
+}
+
+
 def generate_paper_draft(
     idea: ResearchIdea,
     method: MethodDesign,
@@ -24,7 +61,34 @@ def generate_paper_draft(
     api_key: str
 ) -> PaperDraft:
     """
-    生成完整的论文草稿
+    生成完整的论文草稿（同步入口，不能在已运行的事件循环中调用）
+    
+    各章节和标题并发生成，参数见generate_paper_draft_async
+    
+    Returns:
+        论文草稿对象
+    """
+    return asyncio.run(generate_paper_draft_async(
+        idea, method, experiment, papers_metadata, papers_analysis, landscape,
+        api_key=api_key
+    ))
+
+
+async def generate_paper_draft_async(
+    idea: ResearchIdea,
+    method: MethodDesign,
+    experiment: ExperimentPlan,
+    papers_metadata: List[PaperMetadata],
+    papers_analysis: Dict[str, PaperAnalysis],
+    landscape: ResearchLandscape,
+    api_key: str = None,
+    client: AsyncOpenAI = None
+) -> PaperDraft:
+    """
+    生成完整的论文草稿（异步版本）
+    
+    各章节之间没有数据依赖，所有章节和标题的请求同时发出，
+    总耗时约等于最慢的一次请求
     
     Args:
         idea: 研究想法
@@ -33,14 +97,16 @@ def generate_paper_draft(
         papers_metadata: 文献元数据列表
         papers_analysis: 文献分析结果
         landscape: 研究脉络
-        api_key: OpenAI API密钥
+        api_key: OpenAI API密钥（未传入client时使用）
+        client: 复用的AsyncOpenAI客户端
     
     Returns:
         论文草稿对象
     """
     logger.info("Generating paper draft...")
     
-    client = OpenAI(api_key=api_key)
+    if client is None:
+        client = get_async_openai_client(api_key)
     
     # 准备上下文
     context = {
@@ -49,29 +115,20 @@ def generate_paper_draft(
         'experiment': experiment,
         'papers': papers_metadata,
         'analysis': papers_analysis,
-        'landscape': landscape
+        'landscape': landscape,
+        # 各章节共用的引用列表，每份草稿只计算一次
+        'citation_ids': _citation_ids(papers_metadata)
     }
     
-    # 生成各部分
-    sections = {}
-    
-    section_order = [
-        ('abstract', '摘要'),
-        ('introduction', '引言'),
-        ('related_work', '相关工作'),
-        ('method', '方法'),
-        ('experiments', '实验'),
-        ('discussion', '讨论'),
-        ('conclusion', '结论')
-    ]
-    
-    for section_key, section_name_cn in section_order:
-        logger.info(f"Generating {section_name_cn}...")
-        section = generate_section(section_key, context, client)
-        sections[section_key] = section
-    
-    # 生成论文标题
-    title = generate_title(idea, client)
+    # 并发生成各部分和论文标题
+    *section_list, title = await asyncio.gather(
+        *(generate_section_async(section_key, context, client) for section_key, _ in _SECTION_ORDER),
+        generate_title_async(idea, client)
+    )
+    sections = {
+        section_key: section
+        for (section_key, _), section in zip(_SECTION_ORDER, section_list)
+    }
     
     # 构建PaperDraft对象
     draft = PaperDraft(
@@ -101,47 +158,99 @@ def generate_section(section_key: str, context: Dict, client: OpenAI) -> PaperSe
     Returns:
         论文章节对象
     """
-    # 准备该章节的上下文
-    section_context = prepare_section_context(section_key, context)
-    
-    # 构建提示词
-    prompt = config.PROMPTS["paper_draft"].format(
-        section=section_key,
-        context=section_context
-    )
+    messages = _section_messages(section_key, context)
+    cache_key = _request_cache_key(config.OPENAI_MODEL, messages, _SECTION_TEMPERATURE)
+    cached = load_from_cache(cache_key, "draft_section")
+    if cached is not None:
+        return _build_section(section_key, cached, context)
     
     try:
-        response = client.chat.completions.create(
+        # 流式接收：长章节边生成边拼接，不必等待完整响应体
+        stream = client.chat.completions.create(
             model=config.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "你是一位经验丰富的学术论文作者。"},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.6
+            messages=messages,
+            temperature=_SECTION_TEMPERATURE,
+            stream=True
         )
+        buf = io.StringIO()
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                buf.write(chunk.choices[0].delta.content)
+        content = buf.getvalue()
+        save_to_cache(cache_key, content, "draft_section")
+        return _build_section(section_key, content, context)
         
-        content = response.choices[0].message.content
-        
-        # 确定来源类型
-        source_type = determine_source_type(section_key)
-        
-        # 提取引用
-        citations = extract_citations(content, context)
-        
-        section = PaperSection(
-            section_name=section_key,
-            content=content,
-            source_type=source_type,
-            citations=citations
+    except Exception as e:
+        logger.error(f"Failed to generate section {section_key}: {e}")
+        raise
+
+
+async def generate_section_async(section_key: str, context: Dict, client: AsyncOpenAI) -> PaperSection:
+    """生成单个章节（异步版本，参数同generate_section）"""
+    logger.info(f"Generating {section_key}...")
+    messages = _section_messages(section_key, context)
+    cache_key = _request_cache_key(config.OPENAI_MODEL, messages, _SECTION_TEMPERATURE)
+    cached = load_from_cache(cache_key, "draft_section")
+    if cached is not None:
+        return _build_section(section_key, cached, context)
+    
+    try:
+        # 并发生成的各章节流在同一连接上交错传输
+        stream = await client.chat.completions.create(
+            model=config.OPENAI_MODEL,
+            messages=messages,
+            temperature=_SECTION_TEMPERATURE,
+            stream=True
         )
-        
-        return section
+        buf = io.StringIO()
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                buf.write(chunk.choices[0].delta.content)
+        content = buf.getvalue()
+        save_to_cache(cache_key, content, "draft_section")
+        return _build_section(section_key, content, context)
         
     except Exception as e:
         logger.error(f"Failed to generate section {section_key}: {e}")
         raise
 
 
+def _section_messages(section_key: str, context: Dict) -> List[Dict[str, str]]:
+    """构建章节生成请求的消息列表"""
+    # 准备该章节的上下文
+    section_context = prepare_section_context(section_key, context)
+    
+    # 构建提示词
+    prompt = config.PROMPTS["paper_draft"].format(
+        section=section_key,
+        context=section_context
+    )
+    
+    return [
+        {"role": "system", "content": _SECTION_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _request_cache_key(model: str, messages: List[Dict[str, str]], temperature: float) -> str:
+    """
+    LLM请求的磁盘缓存键
+    
+    提示词已包含生成所依赖的全部输入，输入未变的章节/标题在草稿重新生成或重试时直接命中缓存
+    """
+    return get_cache_key({"model": model, "messages": messages, "temperature": temperature})
+
+
+def _build_section(section_key: str, content: str, context: Dict) -> PaperSection:
+    """由LLM输出构建章节对象"""
+    return PaperSection(
+        section_name=section_key,
+        content=content,
+        source_type=determine_source_type(section_key),
+        citations=extract_citations(content, context)
+    )
+
+
 def prepare_section_context(section_key: str, context: Dict) -> str:
     """
     准备章节上下文
@@ -153,21 +262,27 @@ def prepare_section_context(section_key: str, context: Dict) -> str:
     Returns:
         格式化的上下文文本
     """
-    idea = context['idea']
-    method = context['method']
-    experiment = context['experiment']
-    landscape = context['landscape']
-    
-    if section_key == 'abstract':
-        return f"""
+    builder = _CONTEXT_BUILDERS.get(section_key)
+    if builder is None:
+        return ""
+    return builder(
+        context['idea'], context['method'], context['experiment'], context['landscape']
+    )
+
+
+def _abstract_context(idea: ResearchIdea, method: MethodDesign, experiment: ExperimentPlan,
+                      landscape: ResearchLandscape) -> str:
+    return f"""
 研究动机: {idea.motivation}
 核心方法: {method.overview}
 主要贡献: {idea.expected_contribution}
 """
-    
-    elif section_key == 'introduction':
-        unsolved_problems = '\n'.join(f"- {p}" for p in landscape.unsolved_problems[:5])
-        return f"""
+
+
+def _introduction_context(idea: ResearchIdea, method: MethodDesign, experiment: ExperimentPlan,
+                          landscape: ResearchLandscape) -> str:
+    unsolved_problems = '\n'.join(f"- {p}" for p in landscape.unsolved_problems[:5])
+    return f"""
 研究背景:
 {unsolved_problems}
 
@@ -180,27 +295,31 @@ def prepare_section_context(section_key: str, context: Dict) -> str:
 主要贡献:
 {idea.expected_contribution}
 """
-    
-    elif section_key == 'related_work':
-        # 准备文献综述内容
-        clusters = '\n\n'.join([
-            f"## {cluster.cluster_name}\n主题: {', '.join(cluster.key_themes)}"
-            for cluster in landscape.clusters
-        ])
-        return f"""
+
+
+def _related_work_context(idea: ResearchIdea, method: MethodDesign, experiment: ExperimentPlan,
+                          landscape: ResearchLandscape) -> str:
+    # 准备文献综述内容
+    clusters = '\n\n'.join(
+        f"## {cluster.cluster_name}\n主题: {', '.join(cluster.key_themes)}"
+        for cluster in landscape.clusters
+    )
+    return f"""
 研究方向分类:
 {clusters}
 
 我们方法的不同之处:
 {idea.difference_from_existing}
 """
-    
-    elif section_key == 'method':
-        modules = '\n'.join([
-            f"- {m.get('name')}: {m.get('function')}"
-            for m in method.modules
-        ])
-        return f"""
+
+
+def _method_context(idea: ResearchIdea, method: MethodDesign, experiment: ExperimentPlan,
+                    landscape: ResearchLandscape) -> str:
+    modules = '\n'.join(
+        f"- {m.get('name')}: {m.get('function')}"
+        for m in method.modules
+    )
+    return f"""
 方法概述:
 {method.overview}
 
@@ -213,11 +332,13 @@ def prepare_section_context(section_key: str, context: Dict) -> str:
 理论依据:
 {method.theoretical_justification}
 """
-    
-    elif section_key == 'experiments':
-        baselines = '\n'.join(f"- {b}" for b in experiment.baselines)
-        metrics = '\n'.join(f"- {m}" for m in experiment.metrics)
-        return f"""
+
+
+def _experiments_context(idea: ResearchIdea, method: MethodDesign, experiment: ExperimentPlan,
+                         landscape: ResearchLandscape) -> str:
+    baselines = '\n'.join(f"- {b}" for b in experiment.baselines)
+    metrics = '\n'.join(f"- {m}" for m in experiment.metrics)
+    return f"""
 实验设置:
 {experiment.experiment_setup}
 
@@ -229,28 +350,42 @@ Baseline方法:
 
 注意: 以下为假设性结果分析
 预期结果:
-{json.dumps(experiment.expected_results, ensure_ascii=False, indent=2)}
+{json_dumps(experiment.expected_results, indent=True)}
 """
-    
-    elif section_key == 'discussion':
-        limitations = '\n'.join(f"- {r}" for r in experiment.risk_factors)
-        return f"""
+
+
+def _discussion_context(idea: ResearchIdea, method: MethodDesign, experiment: ExperimentPlan,
+                        landscape: ResearchLandscape) -> str:
+    limitations = '\n'.join(f"- {r}" for r in experiment.risk_factors)
+    return f"""
 研究贡献:
 {idea.expected_contribution}
 
 潜在局限性:
 {limitations}
 """
-    
-    elif section_key == 'conclusion':
-        return f"""
+
+
+def _conclusion_context(idea: ResearchIdea, method: MethodDesign, experiment: ExperimentPlan,
+                        landscape: ResearchLandscape) -> str:
+    return f"""
 研究总结:
 - 核心问题: {idea.motivation}
 - 提出方法: {method.overview}
 - 主要贡献: {idea.expected_contribution}
 """
-    
-    return ""
+
+
+# 章节键名 → 上下文构建函数（各函数只读取本章节需要的字段）
+_CONTEXT_BUILDERS = {
+    'abstract': _abstract_context,
+    'introduction': _introduction_context,
+    'related_work': _related_work_context,
+    'method': _method_context,
+    'experiments': _experiments_context,
+    'discussion': _discussion_context,
+    'conclusion': _conclusion_context
+}
 
 
 def determine_source_type(section_key: str) -> str:
@@ -285,8 +420,15 @@ def extract_citations(content: str, context: Dict) -> List[str]:
         引用的论文ID列表
     """
     # 简化实现：返回所有相关论文
-    papers = context.get('papers', [])
-    return [p.arxiv_id or p.title for p in papers[:10]]  # 限制数量
+    citation_ids = context.get('citation_ids')
+    if citation_ids is None:
+        citation_ids = _citation_ids(context.get('papers', []))
+    return list(citation_ids)
+
+
+def _citation_ids(papers: List[PaperMetadata]) -> Tuple[str, ...]:
+    """前_MAX_CITATIONS篇相关论文的引用ID"""
+    return tuple(p.arxiv_id or p.title for p in islice(papers, _MAX_CITATIONS))
 
 
 def generate_title(idea: ResearchIdea, client: OpenAI) -> str:
@@ -300,6 +442,52 @@ def generate_title(idea: ResearchIdea, client: OpenAI) -> str:
     Returns:
         论文标题
     """
+    messages = _title_messages(idea)
+    cache_key = _request_cache_key(config.OPENAI_MODEL_MINI, messages, _TITLE_TEMPERATURE)
+    cached = load_from_cache(cache_key, "draft_title")
+    if cached is not None:
+        return cached
+    
+    try:
+        response = client.chat.completions.create(
+            model=config.OPENAI_MODEL_MINI,
+            messages=messages,
+            temperature=_TITLE_TEMPERATURE
+        )
+        title = _clean_title(response.choices[0].message.content)
+        save_to_cache(cache_key, title, "draft_title")
+        return title
+        
+    except Exception as e:
+        logger.error(f"Failed to generate title: {e}")
+        return f"Research on {idea.idea_id}"
+
+
+async def generate_title_async(idea: ResearchIdea, client: AsyncOpenAI) -> str:
+    """生成论文标题（异步版本，参数同generate_title）"""
+    messages = _title_messages(idea)
+    cache_key = _request_cache_key(config.OPENAI_MODEL_MINI, messages, _TITLE_TEMPERATURE)
+    cached = load_from_cache(cache_key, "draft_title")
+    if cached is not None:
+        return cached
+    
+    try:
+        response = await client.chat.completions.create(
+            model=config.OPENAI_MODEL_MINI,
+            messages=messages,
+            temperature=_TITLE_TEMPERATURE
+        )
+        title = _clean_title(response.choices[0].message.content)
+        save_to_cache(cache_key, title, "draft_title")
+        return title
+        
+    except Exception as e:
+        logger.error(f"Failed to generate title: {e}")
+        return f"Research on {idea.idea_id}"
+
+
+def _title_messages(idea: ResearchIdea) -> List[Dict[str, str]]:
+    """构建标题生成请求的消息列表"""
     prompt = f"""
     基于以下研究想法，生成一个简洁、专业的学术论文标题（英文）。
     
@@ -314,26 +502,15 @@ def generate_title(idea: ResearchIdea, client: OpenAI) -> str:
     
     只输出标题，不要其他内容。
     """
-    
-    try:
-        response = client.chat.completions.create(
-            model=config.OPENAI_MODEL_MINI,
-            messages=[
-                {"role": "system", "content": "你是一位学术论文撰写专家。"},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7
-        )
-        
-        title = response.choices[0].message.content.strip()
-        # 移除引号
-        title = title.strip('"').strip("'")
-        
-        return title
-        
-    except Exception as e:
-        logger.error(f"Failed to generate title: {e}")
-        return f"Research on {idea.idea_id}"
+    return [
+        {"role": "system", "content": _TITLE_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _clean_title(text: str) -> str:
+    """去除标题两端的空白和引号"""
+    return text.strip().strip('"').strip("'")
 
 
 def format_paper_draft(draft: PaperDraft) -> str:
@@ -346,72 +523,31 @@ def format_paper_draft(draft: PaperDraft) -> str:
     Returns:
         Markdown格式的论文
     """
-    sections = []
-    
-    sections.append(f"# {draft.title}\n")
-    sections.append(f"*Generated: {draft.generated_at}*\n\n")
-    sections.append("---\n\n")
-    
-    # Abstract
-    sections.append("## Abstract\n")
-    sections.append(_format_section_with_source(draft.abstract))
-    sections.append("\n\n")
-    
-    # Introduction
-    sections.append("## 1. Introduction\n")
-    sections.append(_format_section_with_source(draft.introduction))
-    sections.append("\n\n")
-    
-    # Related Work
-    sections.append("## 2. Related Work\n")
-    sections.append(_format_section_with_source(draft.related_work))
-    sections.append("\n\n")
+    buf = io.StringIO()
+    w = buf.write
     
-    # Method
-    sections.append("## 3. Method\n")
-    sections.append(_format_section_with_source(draft.method))
-    sections.append("\n\n")
+    w(f"# {draft.title}\n")
+    w(f"*Generated: {draft.generated_at}*\n\n")
+    w("---\n\n")
     
-    # Experiments
-    sections.append("## 4. Experiments\n")
-    sections.append(_format_section_with_source(draft.experiments))
-    sections.append("\n\n")
+    for i, (heading, attr) in enumerate(_DRAFT_LAYOUT):
+        w(heading)
+        _write_section_with_source(w, getattr(draft, attr))
+        # 最后一章只换一行
+        w("\n" if i == len(_DRAFT_LAYOUT) - 1 else "\n\n")
     
-    # Discussion
-    sections.append("## 5. Discussion\n")
-    sections.append(_format_section_with_source(draft.discussion))
-    sections.append("\n\n")
-    
-    # Conclusion
-    sections.append("## 6. Conclusion\n")
-    sections.append(_format_section_with_source(draft.conclusion))
-    sections.append("\n")
-    
-    return "".join(sections)
+    return buf.getvalue()
 
 
-def _format_section_with_source(section: PaperSection) -> str:
+def _write_section_with_source(write: Callable[[str], int], section: PaperSection):
     """
-    格式化章节并标注来源
+    将章节内容连同来源标注直接写入输出缓冲
     
     Args:
+        write: 缓冲区的write方法
         section: 论文章节
-    
-    Returns:
-        格式化的文本
     """
-    source_labels = {
-        'literature': '📚 基于文献',
-        'hypothesis': '🔬 假设性分析',
-        'original': '💡 原创内容'
-    }
-    
-    label = source_labels.get(section.source_type, '')
-    
-    result = []
+    label = _SOURCE_LABELS.get(section.source_type, '')
     if label:
-        result.append(f"> *{label}*\n\n")
-    
-    result.append(section.content)
-    
-    return "".join(result)
+        write(f"> *{label}*\n\n")
+    write(section.content)
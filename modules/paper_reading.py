@@ -2,21 +2,43 @@
 文献阅读引擎
 使用LLM对论文进行结构化分析
 """
+import asyncio
 import json
-from typing import List, Dict
-from openai import OpenAI
+import sys
+import time
+from typing import List, Dict, Optional, Tuple, Union
+from openai import AsyncOpenAI, OpenAI
+from llm.rate_limit import TokenBucket
 from models import PaperMetadata, PaperAnalysis
-from utils import logger, get_cache_key, save_to_cache, load_from_cache
+from utils import (
+    logger, get_cache_key, save_to_cache, load_from_cache, get_openai_client,
+    get_async_openai_client, json_dumps, json_loads
+)
 import config
 
 
+_SYSTEM_PROMPT = config.PROMPTS["paper_analysis_system"]
+_TEMPERATURE = 0.3
+_EST_OUTPUT_TOKENS = 600  # 估算TPM占用时按此计入输出token
+_format_analysis_prompt = config.PROMPTS["paper_analysis"].format
+_BATCH_FINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+
+# 分析结果缓存的版本指纹：模型或提示词变化后旧结果自动失效
+_ANALYSIS_FINGERPRINT = get_cache_key({
+    'model': config.OPENAI_MODEL_MINI,
+    'temperature': _TEMPERATURE,
+    'system': _SYSTEM_PROMPT,
+    'template': config.PROMPTS["paper_analysis"],
+})
+
+
 def analyze_papers(
     papers: List[PaperMetadata],
     api_key: str,
     max_papers: int = None
 ) -> Dict[str, PaperAnalysis]:
     """
-    批量分析论文
+    批量分析论文（同步入口，不能在已运行的事件循环中调用）
     
     Args:
         papers: 论文元数据列表
@@ -26,6 +48,154 @@ def analyze_papers(
     Returns:
         论文ID到分析结果的映射
     """
+    if config.USE_BATCH_API:
+        return analyze_papers_batch(papers, api_key, max_papers)
+    return asyncio.run(analyze_papers_async(papers, api_key, max_papers))
+
+
+async def analyze_papers_async(
+    papers: List[PaperMetadata],
+    api_key: str,
+    max_papers: int = None
+) -> Dict[str, PaperAnalysis]:
+    """
+    批量分析论文（异步版本）
+    
+    先读缓存，未命中的论文并发分析：并发数受config.BATCH_SIZE限制，
+    请求速率受RPM/TPM令牌桶限制；429和超时由客户端按指数退避重试
+    
+    Args:
+        papers: 论文元数据列表
+        api_key: OpenAI API密钥
+        max_papers: 最多分析的论文数量
+    
+    Returns:
+        论文ID到分析结果的映射（按输入顺序）
+    """
+    analysis_results, pending = _load_cached_analyses(papers, max_papers)
+    
+    if pending:
+        client = get_async_openai_client(api_key)
+        semaphore = asyncio.Semaphore(config.BATCH_SIZE)
+        request_limiter = TokenBucket(config.OPENAI_MAX_REQUESTS_PER_MINUTE / 60.0)
+        token_limiter = TokenBucket(config.OPENAI_MAX_TOKENS_PER_MINUTE / 60.0)
+        
+        # 分析论文
+        results = await asyncio.gather(
+            *(
+                analyze_single_paper_async(paper, client, semaphore, request_limiter, token_limiter)
+                for _, _, paper in pending
+            ),
+            return_exceptions=True
+        )
+        
+        for item, result in zip(pending, results):
+            _store_analysis(analysis_results, item, result)
+    
+    logger.info(f"Successfully analyzed {len(analysis_results)} papers")
+    return analysis_results
+
+
+def analyze_papers_batch(
+    papers: List[PaperMetadata],
+    api_key: str,
+    max_papers: int = None,
+    poll_interval: float = None
+) -> Dict[str, PaperAnalysis]:
+    """
+    通过OpenAI Batch API批量分析论文
+    
+    价格为实时接口的一半且不占用实时限额，但最长可能需要24小时才能完成，
+    适合对时延不敏感的大批量离线分析。调用会阻塞轮询直到批任务结束。
+    
+    Args:
+        papers: 论文元数据列表
+        api_key: OpenAI API密钥
+        max_papers: 最多分析的论文数量
+        poll_interval: 轮询批任务状态的间隔（秒），默认config.BATCH_POLL_INTERVAL_SECONDS
+    
+    Returns:
+        论文ID到分析结果的映射（按输入顺序）
+    """
+    if poll_interval is None:
+        poll_interval = config.BATCH_POLL_INTERVAL_SECONDS
+    
+    analysis_results, pending = _load_cached_analyses(papers, max_papers)
+    if not pending:
+        logger.info(f"Successfully analyzed {len(analysis_results)} papers")
+        return analysis_results
+    
+    client = get_openai_client(api_key)
+    
+    # 每篇论文一行请求，custom_id为论文ID
+    request_lines = "\n".join(
+        json_dumps({
+            "custom_id": paper_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": config.OPENAI_MODEL_MINI,
+                "messages": _analysis_messages(_build_analysis_prompt(paper)),
+                "temperature": _TEMPERATURE,
+                "response_format": {"type": "json_object"}
+            }
+        })
+        for paper_id, _, paper in pending
+    )
+    input_file = client.files.create(
+        file=("paper_analysis.jsonl", request_lines.encode("utf-8")),
+        purpose="batch"
+    )
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    logger.info(f"Submitted batch {batch.id} with {len(pending)} papers")
+    
+    while batch.status not in _BATCH_FINAL_STATUSES:
+        time.sleep(poll_interval)
+        batch = client.batches.retrieve(batch.id)
+    
+    logger.info(f"Batch {batch.id} finished with status: {batch.status}")
+    
+    # 批任务过期或取消时输出文件中仍可能有部分已完成的结果
+    responses: Dict[str, str] = {}
+    if batch.output_file_id:
+        for line in client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = json_loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") == 200:
+                responses[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+    
+    for item in pending:
+        paper_id, _, paper = item
+        if paper_id not in responses:
+            _store_analysis(analysis_results, item, RuntimeError(f"no result in batch {batch.id}"))
+            continue
+        try:
+            result = _build_paper_analysis(paper, responses[paper_id])
+        except json.JSONDecodeError as e:
+            result = ValueError(f"API返回的不是有效的JSON格式: {e}")
+        _store_analysis(analysis_results, item, result)
+    
+    logger.info(f"Successfully analyzed {len(analysis_results)} papers")
+    return analysis_results
+
+
+def _load_cached_analyses(
+    papers: List[PaperMetadata],
+    max_papers: Optional[int]
+) -> Tuple[Dict[str, Optional[PaperAnalysis]], List[Tuple[str, str, PaperMetadata]]]:
+    """
+    读取缓存中已有的分析结果
+    
+    Returns:
+        (论文ID到分析结果的映射（未命中的为None占位，保持输入顺序）,
+         未命中缓存的 (论文ID, 缓存键, 论文) 列表)
+    """
     if max_papers is None:
         max_papers = config.MAX_PAPERS_TO_ANALYZE
     
@@ -33,99 +203,164 @@ def analyze_papers(
     papers_to_analyze = papers[:max_papers]
     logger.info(f"Analyzing {len(papers_to_analyze)} papers...")
     
-    analysis_results = {}
+    analysis_results: Dict[str, Optional[PaperAnalysis]] = {}
+    pending = []
     
-    # 批量处理
-    for i in range(0, len(papers_to_analyze), config.BATCH_SIZE):
-        batch = papers_to_analyze[i:i + config.BATCH_SIZE]
-        logger.info(f"Processing batch {i//config.BATCH_SIZE + 1}/{(len(papers_to_analyze)-1)//config.BATCH_SIZE + 1}")
+    for paper in papers_to_analyze:
+        paper_id = sys.intern(paper.arxiv_id or paper.title)
+        if paper_id in analysis_results:
+            continue
         
-        for paper in batch:
-            paper_id = paper.arxiv_id or paper.title
-            
-            # 检查缓存
-            cache_key = get_cache_key({'paper_id': paper_id, 'title': paper.title})
-            cached_analysis = load_from_cache(cache_key, cache_type="analysis")
-            
-            if cached_analysis:
-                analysis_results[paper_id] = PaperAnalysis(**cached_analysis)
-                logger.info(f"Loaded analysis from cache: {paper.title[:50]}...")
-                continue
-            
-            # 分析论文
-            try:
-                analysis = analyze_single_paper(paper, api_key)
-                analysis_results[paper_id] = analysis
-                
-                # 保存到缓存
-                save_to_cache(cache_key, analysis.to_dict(), cache_type="analysis")
-                logger.info(f"Analyzed: {paper.title[:50]}...")
-                
-            except Exception as e:
-                logger.error(f"Failed to analyze paper {paper.title}: {e}")
-                continue
+        cache_key = get_cache_key({
+            'paper_id': paper_id,
+            'title': paper.title,
+            'fingerprint': _ANALYSIS_FINGERPRINT
+        })
+        cached_analysis = load_from_cache(cache_key, cache_type="analysis")
+        
+        if cached_analysis:
+            analysis_results[paper_id] = PaperAnalysis(**cached_analysis)
+            logger.info(f"Loaded analysis from cache: {paper.title[:50]}...")
+        else:
+            analysis_results[paper_id] = None  # 占位，保持输入顺序
+            pending.append((paper_id, cache_key, paper))
     
-    logger.info(f"Successfully analyzed {len(analysis_results)} papers")
-    return analysis_results
+    return analysis_results, pending
 
 
-def analyze_single_paper(paper: PaperMetadata, api_key: str) -> PaperAnalysis:
+def _store_analysis(
+    analysis_results: Dict[str, Optional[PaperAnalysis]],
+    item: Tuple[str, str, PaperMetadata],
+    result: Union[PaperAnalysis, Exception]
+):
+    """写入单篇论文的分析结果并缓存；失败的论文从结果中移除"""
+    paper_id, cache_key, paper = item
+    if isinstance(result, Exception):
+        logger.error(f"Failed to analyze paper {paper.title}: {result}")
+        del analysis_results[paper_id]
+        return
+    
+    analysis_results[paper_id] = result
+    
+    # 保存到缓存
+    save_to_cache(cache_key, result.to_dict(), cache_type="analysis")
+    logger.info(f"Analyzed: {paper.title[:50]}...")
+
+
+def analyze_single_paper(
+    paper: PaperMetadata,
+    api_key: str = None,
+    client: OpenAI = None
+) -> PaperAnalysis:
     """
     分析单篇论文
     
     Args:
         paper: 论文元数据
-        api_key: OpenAI API密钥
+        api_key: OpenAI API密钥（未传入client时使用）
+        client: 复用的OpenAI客户端
     
     Returns:
         论文分析结果
     """
-    client = OpenAI(api_key=api_key)
-    
-    # 构建提示词
-    prompt = config.PROMPTS["paper_analysis"].format(
-        title=paper.title,
-        authors=", ".join(paper.authors[:5]),
-        abstract=paper.abstract
-    )
+    if client is None:
+        client = get_openai_client(api_key)
     
     try:
         response = client.chat.completions.create(
             model=config.OPENAI_MODEL_MINI,  # 使用轻量模型节省成本
-            messages=[
-                {"role": "system", "content": "你是一位专业的学术研究分析专家。请严格按照JSON格式输出。"},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
+            messages=_analysis_messages(_build_analysis_prompt(paper)),
+            temperature=_TEMPERATURE,
             response_format={"type": "json_object"}
         )
-        
-        result_text = response.choices[0].message.content
-        result_json = json.loads(result_text)
-        
-        # 创建PaperAnalysis对象
-        paper_id = paper.arxiv_id or paper.title
-        analysis = PaperAnalysis(
-            paper_id=paper_id,
-            core_problem=result_json.get("core_problem", ""),
-            key_method=result_json.get("key_method", ""),
-            technical_approach=result_json.get("technical_approach", ""),
-            experiment_conclusions=result_json.get("experiment_conclusions", []),
-            limitations=result_json.get("limitations", []),
-            contributions=result_json.get("contributions", [])
-        )
-        
-        return analysis
+        return _build_paper_analysis(paper, response.choices[0].message.content)
         
     except json.JSONDecodeError as e:
         logger.error(f"Failed to parse JSON response: {e}")
-        raise ValueError(f"API返回的不是有效的JSON格式")
+        raise ValueError("API返回的不是有效的JSON格式") from e
     
     except Exception as e:
         logger.error(f"API call failed: {e}")
         raise
 
 
+async def analyze_single_paper_async(
+    paper: PaperMetadata,
+    client: AsyncOpenAI,
+    semaphore: asyncio.Semaphore,
+    request_limiter: TokenBucket,
+    token_limiter: TokenBucket
+) -> PaperAnalysis:
+    """
+    分析单篇论文（异步版本）
+    
+    Args:
+        paper: 论文元数据
+        client: 复用的AsyncOpenAI客户端
+        semaphore: 并发数限制
+        request_limiter: 请求数令牌桶（RPM）
+        token_limiter: token数令牌桶（TPM）
+    
+    Returns:
+        论文分析结果
+    """
+    prompt = _build_analysis_prompt(paper)
+    
+    async with semaphore:
+        await request_limiter.acquire_async()
+        await token_limiter.acquire_async(_estimate_tokens(prompt))
+        
+        try:
+            response = await client.chat.completions.create(
+                model=config.OPENAI_MODEL_MINI,  # 使用轻量模型节省成本
+                messages=_analysis_messages(prompt),
+                temperature=_TEMPERATURE,
+                response_format={"type": "json_object"}
+            )
+            return _build_paper_analysis(paper, response.choices[0].message.content)
+            
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse JSON response: {e}")
+            raise ValueError("API返回的不是有效的JSON格式") from e
+
+
+def _build_analysis_prompt(paper: PaperMetadata) -> str:
+    """构建论文分析提示词"""
+    return _format_analysis_prompt(
+        title=paper.title,
+        authors=", ".join(paper.authors[:5]),
+        abstract=paper.abstract
+    )
+
+
+def _analysis_messages(prompt: str) -> List[Dict[str, str]]:
+    """构建论文分析请求的消息列表"""
+    return [
+        {"role": "system", "content": _SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _estimate_tokens(prompt: str) -> int:
+    """粗略估算一次请求的token占用（输入按约3字符/token，加上预估输出）"""
+    return (len(_SYSTEM_PROMPT) + len(prompt)) // 3 + _EST_OUTPUT_TOKENS
+
+
+def _build_paper_analysis(paper: PaperMetadata, result_text: str) -> PaperAnalysis:
+    """由LLM输出的JSON文本构建PaperAnalysis对象"""
+    result_json = json_loads(result_text)
+    
+    return PaperAnalysis(
+        paper_id=paper.arxiv_id or paper.title,
+        core_problem=result_json.get("core_problem", ""),
+        key_method=result_json.get("key_method", ""),
+        technical_approach=result_json.get("technical_approach", ""),
+        experiment_conclusions=result_json.get("experiment_conclusions", []),
+        limitations=result_json.get("limitations", []),
+        contributions=result_json.get("contributions", [])
+    )
+
+
 def summarize_paper_analysis(analysis: PaperAnalysis) -> str:
     """
     生成论文分析摘要
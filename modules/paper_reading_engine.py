@@ -1,10 +1,9 @@
 """
 文献阅读引擎 - 重构版（适配Celery和llm_manager）
 """
-import json
-from typing import Optional
+from typing import Any, Dict, Optional
 from models import PaperAnalysis
-from utils import logger
+from utils import logger, json_loads, as_str, as_list
 import config
 
 
@@ -56,7 +55,7 @@ class PaperReadingEngine:
                 messages=[
                     {
                         "role": "system",
-                        "content": "你是一位专业的学术研究分析专家。请严格按照JSON格式输出。"
+                        "content": config.PROMPTS["paper_analysis_system"]
                     },
                     {
                         "role": "user",
@@ -68,44 +67,26 @@ class PaperReadingEngine:
                 json_mode=True
             )
             
-            # 解析响应
-            result_json = json.loads(response.content)
-            
-            # 创建PaperAnalysis对象
-            # 处理实验结果，确保为列表
-            exp_result = result_json.get("experiment_conclusions", [])
-            if not exp_result and result_json.get("experiment_result"):
-                exp_result = [result_json.get("experiment_result")]
-            elif isinstance(exp_result, str):
-                exp_result = [exp_result]
-                
-            analysis = PaperAnalysis(
-                paper_id="",  # 由调用者设置
-                core_problem=result_json.get("core_problem", ""),
-                key_method=result_json.get("key_method", ""),
-                technical_approach=result_json.get("technical_route", "") or result_json.get("technical_approach", ""),
-                experiment_conclusions=exp_result,
-                limitations=result_json.get("limitations", []),
-                contributions=result_json.get("contributions", [])
-            )
+            # 解析响应（字段与system prompt中的JSON结构一一对应）
+            analysis = _to_paper_analysis(json_loads(response.content))
             
             logger.info(f"Successfully analyzed paper: {title[:50]}...")
             
             return analysis
             
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON response: {e}")
-            # 返回一个基本的分析结果
-            return PaperAnalysis(
-                paper_id="",
-                core_problem="Failed to analyze (JSON parse error)",
-                key_method="",
-                technical_route="",
-                experiment_result="",
-                limitations="Analysis failed",
-                contributions=""
-            )
-        
         except Exception as e:
             logger.error(f"API call failed: {e}")
             raise
+
+
+def _to_paper_analysis(result_json: Dict[str, Any]) -> PaperAnalysis:
+    """将LLM输出的JSON按固定结构转换为PaperAnalysis（paper_id由调用者设置）"""
+    return PaperAnalysis(
+        paper_id="",
+        core_problem=as_str(result_json.get("core_problem")),
+        key_method=as_str(result_json.get("key_method")),
+        technical_approach=as_str(result_json.get("technical_approach")),
+        experiment_conclusions=as_list(result_json.get("experiment_conclusions")),
+        limitations=as_list(result_json.get("limitations")),
+        contributions=as_list(result_json.get("contributions"))
+    )
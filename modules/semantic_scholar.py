@@ -1,11 +1,48 @@
 """
 Semantic Scholar文献检索接口
 """
+import functools
+import re
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import List, Optional, Dict, Any
 from models import PaperMetadata, PaperType
-from utils import logger
-import time
+from modules.venue_utils import get_venue_partition
+from utils import logger, get_cache_key, save_to_cache, load_from_cache
+from datetime import datetime, timedelta
+import config
+
+
+# 429和5xx按指数退避重试，429优先遵循服务端返回的Retry-After
+_RETRY = Retry(
+    total=5,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset({"GET"}),
+    respect_retry_after_header=True
+)
+_POOL_SIZE = 20
+
+
+@functools.lru_cache(maxsize=4)
+def get_s2_session(api_key: Optional[str] = None) -> requests.Session:
+    """
+    获取按api_key缓存的Semantic Scholar会话
+    
+    进程内所有SemanticScholarAPI实例共用同一连接池，跨模块、跨次检索复用keep-alive连接
+    """
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(
+        max_retries=_RETRY,
+        pool_connections=_POOL_SIZE,
+        pool_maxsize=_POOL_SIZE
+    ))
+    
+    if api_key:
+        session.headers.update({"x-api-key": api_key})
+    return session
 
 
 class SemanticScholarAPI:
@@ -13,6 +50,8 @@ class SemanticScholarAPI:
     
     BASE_URL = "https://api.semanticscholar.org/graph/v1"
     
+    _MAX_PAGE_WORKERS = 5  # 并发翻页的线程数
+    
     def __init__(self, api_key: Optional[str] = None):
         """
         初始化Semantic Scholar API客户端
@@ -21,10 +60,7 @@ class SemanticScholarAPI:
             api_key: API密钥（可选，但建议使用以避免速率限制）
         """
         self.api_key = api_key
-        self.session = requests.Session()
-        
-        if api_key:
-            self.session.headers.update({"x-api-key": api_key})
+        self.session = get_s2_session(api_key)
     
     def search_papers(
         self,
@@ -53,6 +89,23 @@ class SemanticScholarAPI:
                 "externalIds"
             ]
         
+        # 检索结果缓存（出错时不写缓存）
+        cache_key = get_cache_key({
+            'endpoint': 'paper/search',
+            'query': query,
+            'limit': limit,
+            'fields': fields,
+            'year_range': year_range
+        })
+        cached_papers = load_from_cache(
+            cache_key,
+            cache_type="s2_search",
+            max_age=timedelta(hours=config.S2_CACHE_TTL_HOURS)
+        )
+        if cached_papers is not None:
+            logger.info(f"Semantic Scholar: Loaded {len(cached_papers)} papers from cache")
+            return cached_papers
+        
         url = f"{self.BASE_URL}/paper/search"
         
         params = {
@@ -66,42 +119,48 @@ class SemanticScholarAPI:
             params["year"] = f"{year_range[0]}-{year_range[1]}"
         
         try:
-            response = self.session.get(url, params=params, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = self._get_page(url, params)
             papers = data.get("data", [])
             
             logger.info(f"Semantic Scholar: Found {len(papers)} papers")
             
-            # 处理分页（如果需要更多结果）
+            # 处理分页（如果需要更多结果）：首页返回total后，其余各页互不依赖，并发获取；
+            # 触发速率限制时由会话的重试策略按Retry-After退避
             total = data.get("total", 0)
-            offset = len(papers)
+            offsets = range(len(papers), min(limit, total), params["limit"]) if papers else ()
             
-            while offset < limit and offset < total:
-                time.sleep(0.5)  # 避免速率限制
-                
-                params["offset"] = offset
-                response = self.session.get(url, params=params, timeout=30)
-                response.raise_for_status()
-                
-                data = response.json()
-                batch = data.get("data", [])
-                
-                if not batch:
-                    break
-                
-                papers.extend(batch)
-                offset += len(batch)
+            if offsets:
+                with ThreadPoolExecutor(
+                    max_workers=min(self._MAX_PAGE_WORKERS, len(offsets)),
+                    thread_name_prefix="s2-page"
+                ) as executor:
+                    pages = executor.map(
+                        lambda offset: self._get_page(url, {**params, "offset": offset}),
+                        offsets
+                    )
+                    
+                    for page in pages:
+                        batch = page.get("data", [])
+                        if not batch:
+                            break
+                        papers.extend(batch)
                 
                 logger.debug(f"Fetched {len(papers)}/{min(limit, total)} papers")
             
-            return papers[:limit]
+            papers = papers[:limit]
+            save_to_cache(cache_key, papers, cache_type="s2_search")
+            return papers
         
         except requests.exceptions.RequestException as e:
             logger.error(f"Semantic Scholar API error: {e}")
             return []
     
+    def _get_page(self, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """请求一页检索结果"""
+        response = self.session.get(url, params=params, timeout=30)
+        response.raise_for_status()
+        return response.json()
+    
     def get_paper_details(self, paper_id: str, fields: List[str] = None) -> Optional[Dict[str, Any]]:
         """
         获取单篇论文详情
@@ -116,19 +175,34 @@ class SemanticScholarAPI:
         if fields is None:
             fields = ["paperId", "title", "abstract", "authors", "year", "venue"]
         
+        # 论文详情基本不变，按默认有效期缓存
+        cache_key = get_cache_key({'endpoint': 'paper', 'paper_id': paper_id, 'fields': fields})
+        cached_details = load_from_cache(cache_key, cache_type="s2_paper")
+        if cached_details is not None:
+            return cached_details
+        
         url = f"{self.BASE_URL}/paper/{paper_id}"
         params = {"fields": ",".join(fields)}
         
         try:
             response = self.session.get(url, params=params, timeout=10)
             response.raise_for_status()
-            return response.json()
+            details = response.json()
+            save_to_cache(cache_key, details, cache_type="s2_paper")
+            return details
         
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to get paper {paper_id}: {e}")
             return None
 
 
+# convert_s2_to_metadata读取的字段
+_METADATA_FIELDS = [
+    "paperId", "title", "abstract", "authors", "year", "publicationDate",
+    "venue", "isOpenAccess", "openAccessPdf", "externalIds"
+]
+
+
 def convert_s2_to_metadata(s2_paper: Dict[str, Any]) -> PaperMetadata:
     """
     将Semantic Scholar论文转换为PaperMetadata
@@ -169,7 +243,6 @@ def convert_s2_to_metadata(s2_paper: Dict[str, Any]) -> PaperMetadata:
     journal = s2_paper.get("venue")
     partition = None
     if journal:
-        from modules.venue_utils import get_venue_partition
         partition = get_venue_partition(journal)
     
     metadata = PaperMetadata(
@@ -188,6 +261,13 @@ def convert_s2_to_metadata(s2_paper: Dict[str, Any]) -> PaperMetadata:
     return metadata
 
 
+# 综述特征词（"systematic review"已被"review"覆盖），合并为一个正则一次扫描
+_SURVEY_RE = re.compile(
+    r"survey|review|overview|tutorial|综述|state[- ]of[- ]the[- ]art",
+    re.IGNORECASE
+)
+
+
 def detect_paper_type_from_text(title: str, abstract: str) -> PaperType:
     """
     从标题和摘要检测论文类型
@@ -199,16 +279,8 @@ def detect_paper_type_from_text(title: str, abstract: str) -> PaperType:
     Returns:
         论文类型
     """
-    text = (title + " " + abstract).lower()
-    
-    survey_keywords = [
-        "survey", "review", "overview", "tutorial", "综述",
-        "state of the art", "state-of-the-art", "systematic review"
-    ]
-    
-    for keyword in survey_keywords:
-        if keyword in text:
-            return PaperType.SURVEY
+    if _SURVEY_RE.search(title or "") or _SURVEY_RE.search(abstract or ""):
+        return PaperType.SURVEY
     
     return PaperType.RESEARCH
 
@@ -239,11 +311,12 @@ def search_semantic_scholar(
     if year_start and year_end:
         year_range = (year_start, year_end)
     elif year_start:
-        import datetime
-        year_range = (year_start, datetime.datetime.now().year)
+        year_range = (year_start, datetime.now().year)
     
-    # 搜索论文
-    s2_papers = api.search_papers(query, limit=max_results, year_range=year_range)
+    # 搜索论文（只请求convert_s2_to_metadata用到的字段，减小响应体和解析开销）
+    s2_papers = api.search_papers(
+        query, limit=max_results, fields=_METADATA_FIELDS, year_range=year_range
+    )
     
     # 转换为元数据
     papers = []
@@ -2,6 +2,9 @@
 期刊/会议分区映射工具
 包含常见AI领域会议和期刊的分区信息
 """
+import functools
+import re
+import types
 
 VENUE_MAPPING = {
     # 计算机视觉
@@ -40,6 +43,28 @@ VENUE_MAPPING = {
     "corr": "Preprint"
 }
 
+# 查询用的只读快照（get_venue_partition的结果有缓存，映射不应在运行时变化）
+_VENUE_MAPPING = types.MappingProxyType(dict(VENUE_MAPPING))
+
+# 参与包含匹配的键（只有长度足够长的key才进行包含匹配，避免误判），按VENUE_MAPPING顺序
+_CONTAINS_MATCH_ITEMS = tuple(
+    (key, value) for key, value in _VENUE_MAPPING.items() if len(key) > 4
+)
+
+_TOKEN_SPLIT_RE = re.compile(r"[\s,()\-:;/]+")
+
+# 按词匹配时允许与会议/期刊名同时出现的通用词；出现其他词（如workshop、findings、reports）
+# 说明是子会议、衍生刊物或不同刊物，不能按主会/主刊分区
+_GENERIC_VENUE_TOKENS = frozenset({
+    "", "proceedings", "proc", "of", "the", "on", "in", "and",
+    "conference", "conf", "annual", "international", "meeting",
+    "ieee", "cvf", "acm", "association", "for",
+    "main", "volume", "vol", "long", "short", "papers", "track",
+})
+_YEAR_OR_ORDINAL_RE = re.compile(r"'?\d+(?:st|nd|rd|th)?")
+
+
+@functools.lru_cache(maxsize=1024)
 def get_venue_partition(venue_name: str) -> str:
     """
     获取期刊/会议的分区
@@ -49,21 +74,34 @@ def get_venue_partition(venue_name: str) -> str:
         
     Returns:
         分区信息 (e.g., "CCF-A", "Q1", "Preprint")，如果是未知则返回None
+    
+    同一期刊/会议名在检索结果中大量重复出现，结果按名称缓存
     """
     if not venue_name:
         return None
         
-    normalized_name = venue_name.lower().strip()
+    normalized_name = venue_name.casefold().strip()
     
     # 精确匹配
-    if normalized_name in VENUE_MAPPING:
-        return VENUE_MAPPING[normalized_name]
+    partition = _VENUE_MAPPING.get(normalized_name)
+    if partition is not None:
+        return partition
+    
+    # 按词匹配（如 "Proceedings of CVPR 2023" 中的 "cvpr"），短缩写也适用；
+    # 仅当其余词都是年份/届次或通用词时才采用，"Findings of ACL"、"CVPR Workshops"、
+    # "ICLR Blogposts"、"Cell Reports" 等不会被归到主会/主刊
+    tokens = _TOKEN_SPLIT_RE.split(normalized_name)
+    for i, token in enumerate(tokens):
+        partition = _VENUE_MAPPING.get(token)
+        if partition is not None and all(
+            other in _GENERIC_VENUE_TOKENS or _YEAR_OR_ORDINAL_RE.fullmatch(other)
+            for j, other in enumerate(tokens) if j != i
+        ):
+            return partition
     
     # 包含匹配 (稍微宽松一点)
-    for key, value in VENUE_MAPPING.items():
+    for key, value in _CONTAINS_MATCH_ITEMS:
         if key in normalized_name:
-            # 只有当key长度足够长时才进行包含匹配，避免误判
-            if len(key) > 4: 
-                return value
-                
+            return value
+    
     return None
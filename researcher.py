@@ -1,88 +1,351 @@
-import arxiv
-from openai import OpenAI
+import asyncio
+import aiohttp
+import feedparser
 import os
+from datetime import timedelta
+import config
+from utils import (
+    get_cache_key, save_to_cache, load_from_cache, semantic_similarities_batch, get_openai_client,
+    get_async_openai_client
+)
+
+ARXIV_API_URL = "https://export.arxiv.org/api/query"
+ARXIV_PAGE_SIZE = 100
+ARXIV_PAGE_DELAY = 3.0  # arXiv API terms: a single connection, at least 3s between requests
+REVIEW_MODEL = "gpt-4o" # Or gpt-3.5-turbo if cost is a concern, but 4o is better for reasoning
+REVIEW_MAX_CONCURRENCY = 20  # concurrent review requests, to stay within OpenAI rate limits
+REVIEW_CACHE_SIMILARITY = 0.85  # topic similarity above which a cached review for the same papers is reused
+REVIEW_MAX_TOPIC_WORDS = 64  # longer "topics" are rejected before calling the LLM
+REVIEW_CACHE_MAX_TOPICS = 16  # cached reviews kept per paper set (least-used evicted first)
+
+REVIEW_SYSTEM_PROMPT = "You are a helpful research assistant."
+REVIEW_PROMPT = """
+    You are an expert academic researcher. 
+    I need a comprehensive literature review on the topic: "{topic}".
+    
+    Below are the abstracts of relevant papers found on ArXiv.
+    Please write a structured literature review synthesizing these papers.
+    Categorize the approaches if possible, highlight common themes, and identify gaps if evident.
+    Quote heavily from the provided abstracts to support your points.
+    
+    Papers:
+    {context}
+    
+    Output Format in Markdown.
+    """
+REVIEW_PAPER_TEMPLATE = (
+    "Paper {index}:\nTitle: {title}\nAuthors: {authors}\n"
+    "Published: {published}\nAbstract: {summary}\n\n"
+)
 
 class Paper:
+    FIELDS = ("title", "authors", "summary", "url", "published")
+    __slots__ = FIELDS + ("_display",)
+
     def __init__(self, title, authors, summary, url, published):
         self.title = title
         self.authors = authors
         self.summary = summary
         self.url = url
         self.published = published
+        # Built once so repeated str() calls (e.g. logging every paper) don't re-join the authors
+        self._display = f"{title} - {', '.join(authors)}"
 
     def __str__(self):
-        return f"{self.title} - {', '.join(self.authors)}"
+        return self._display
 
-def search_arxiv(query, max_results=10):
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+def search_arxiv(query, max_results=10, bypass_cache=False):
     """
     Search ArXiv for papers based on a query.
     """
     if not query:
         return []
 
-    client = arxiv.Client()
-    search = arxiv.Search(
-        query=query,
-        max_results=max_results,
-        sort_by=arxiv.SortCriterion.Relevance
-    )
-    
+    return asyncio.run(search_arxiv_async(query, max_results, bypass_cache=bypass_cache))
+
+async def search_arxiv_async(query, max_results=10, bypass_cache=False):
+    """
+    Search ArXiv for papers based on a query. Pages are requested one at a time
+    (as arXiv's API terms require); each page is parsed in a worker thread while
+    the next one is being fetched.
+    Results are cached on disk for ARXIV_CACHE_TTL_HOURS (ArXiv updates daily);
+    pass bypass_cache=True to always query ArXiv.
+    """
+    if not query:
+        return []
+
+    cache_key = get_cache_key({"q": query, "n": max_results})
+    if not bypass_cache:
+        cached = load_from_cache(
+            cache_key,
+            "arxiv_review",
+            max_age=timedelta(hours=config.ARXIV_CACHE_TTL_HOURS)
+        )
+        if cached is not None:
+            return [Paper(**p) for p in cached]
+
+    parse_tasks = []
+    failed = False
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=1)) as session:
+        for start in range(0, max_results, ARXIV_PAGE_SIZE):
+            if start:
+                await asyncio.sleep(ARXIV_PAGE_DELAY)
+            try:
+                text = await _fetch_arxiv_page(session, query, start,
+                                               min(ARXIV_PAGE_SIZE, max_results - start))
+            except Exception as e:
+                print(f"Error searching ArXiv: {e}")
+                failed = True
+                continue
+            parse_tasks.append(asyncio.create_task(asyncio.to_thread(_parse_arxiv_page, text)))
+
     results = []
-    try:
-        for r in client.results(search):
-            paper = Paper(
-                title=r.title,
-                authors=[a.name for a in r.authors],
-                summary=r.summary,
-                url=r.pdf_url,
-                published=r.published.strftime("%Y-%m-%d")
-            )
-            results.append(paper)
-    except Exception as e:
-        print(f"Error searching ArXiv: {e}")
-        
+    for page in await asyncio.gather(*parse_tasks):
+        results.extend(page)
+    results = results[:max_results]
+
+    # Don't cache partial results from failed pages
+    if not failed:
+        save_to_cache(cache_key, [p.to_dict() for p in results], "arxiv_review")
+
     return results
 
-def generate_review(papers, api_key, topic):
+async def _fetch_arxiv_page(session, query, start, page_size):
+    """
+    Fetch one page of ArXiv API results as Atom feed text.
+    """
+    params = {
+        "search_query": query,
+        "start": start,
+        "max_results": page_size,
+        "sortBy": "relevance",
+    }
+    async with session.get(ARXIV_API_URL, params=params) as response:
+        response.raise_for_status()
+        return await response.text()
+
+def _parse_arxiv_page(text):
+    """
+    Parse an ArXiv Atom feed into Paper objects.
+    """
+    feed = feedparser.parse(text)
+    return [_entry_to_paper(entry) for entry in feed.entries]
+
+def _entry_to_paper(entry):
+    """
+    Convert an ArXiv Atom feed entry to a Paper.
+    """
+    pdf_urls = [link.href for link in entry.get("links", []) if link.get("title") == "pdf"]
+    return Paper(
+        title=" ".join(entry.title.split()),
+        authors=[a.name for a in entry.get("authors", [])],
+        summary=entry.summary,
+        url=pdf_urls[0] if pdf_urls else entry.get("id"),
+        published=entry.published[:10]
+    )
+
+def generate_review(papers, api_key, topic, bypass_cache=False, stream=False):
     """
     Generate a literature review using OpenAI API based on the summaries of the papers.
+    With stream=True, returns an iterator of markdown fragments as they are generated
+    (e.g. for st.write_stream) instead of the full review.
+    """
+    message = _should_call_llm(topic, papers)
+    if message is None and not api_key:
+        message = "Please provide an OpenAI API Key to generate the review."
+    if message is not None:
+        return iter([message]) if stream else message
+
+    if stream:
+        return _stream_review(topic, papers, api_key, bypass_cache)
+
+    return asyncio.run(
+        generate_reviews_async([(topic, papers)], api_key, bypass_cache=bypass_cache)
+    )[0]
+
+def generate_reviews_batch(topics_and_papers, api_key, bypass_cache=False):
+    """
+    Generate literature reviews for several (topic, papers) pairs in one batch.
+    Returns the reviews in input order.
+    """
+    return asyncio.run(
+        generate_reviews_async(topics_and_papers, api_key, bypass_cache=bypass_cache)
+    )
+
+async def generate_reviews_async(topics_and_papers, api_key, max_concurrency=REVIEW_MAX_CONCURRENCY,
+                                 bypass_cache=False):
+    """
+    Generate literature reviews for several (topic, papers) pairs concurrently.
+    Returns the reviews in input order.
+    A review previously generated for the same papers and a near-identical topic
+    is reused from the semantic cache; pass bypass_cache=True to always call the LLM.
     """
-    if not papers:
-        return "No papers found to review."
-    
     if not api_key:
-        return "Please provide an OpenAI API Key to generate the review."
+        return ["Please provide an OpenAI API Key to generate the review."] * len(topics_and_papers)
 
-    client = OpenAI(api_key=api_key)
-    
-    # Prepare the context from papers
-    context = ""
-    for i, p in enumerate(papers):
-        context += f"Paper {i+1}:\nTitle: {p.title}\nAuthors: {', '.join(p.authors)}\nPublished: {p.published}\nAbstract: {p.summary}\n\n"
+    # Cached per event loop, so all requests (and later batches on this loop) share its connection pool
+    client = get_async_openai_client(api_key)
+    semaphore = asyncio.Semaphore(max_concurrency)
 
-    prompt = f"""
-    You are an expert academic researcher. 
-    I need a comprehensive literature review on the topic: "{topic}".
-    
-    Below are the abstracts of relevant papers found on ArXiv.
-    Please write a structured literature review synthesizing these papers.
-    Categorize the approaches if possible, highlight common themes, and identify gaps if evident.
-    Quote heavily from the provided abstracts to support your points.
-    
-    Papers:
-    {context}
-    
-    Output Format in Markdown.
+    skip_messages = [_should_call_llm(topic, papers) for topic, papers in topics_and_papers]
+    cached_reviews = [None] * len(topics_and_papers)
+    if not bypass_cache:
+        # One batched cache lookup for all topics (a single embedding pass),
+        # run off the event loop since encoding is CPU work; skipped items have nothing to look up
+        cached_reviews = await asyncio.to_thread(_lookup_cached_reviews, [
+            (topic, papers if skip is None else [])
+            for (topic, papers), skip in zip(topics_and_papers, skip_messages)
+        ])
+
+    async def _one(topic, papers, skip, cached):
+        if skip is not None:
+            return skip
+        if cached is not None:
+            return cached
+        async with semaphore:
+            try:
+                response = await client.chat.completions.create(
+                    model=REVIEW_MODEL,
+                    messages=_review_messages(topic, papers)
+                )
+            except Exception as e:
+                return f"Error generating review: {e}"
+        review = response.choices[0].message.content
+        _store_cached_review(topic, papers, review)
+        return review
+
+    return await asyncio.gather(*[
+        _one(topic, papers, skip, cached)
+        for (topic, papers), skip, cached in zip(topics_and_papers, skip_messages, cached_reviews)
+    ])
+
+def _should_call_llm(topic, papers):
+    """
+    Gate in front of the LLM call: return a canned response if the request
+    cannot produce a useful review, else None.
     """
+    if not papers:
+        return "No papers found to review."
+    topic = (topic or "").strip()
+    if not topic:
+        return "Please provide a research topic to generate the review."
+    if len(topic.split()) > REVIEW_MAX_TOPIC_WORDS:
+        return f"The research topic is too long; please shorten it to at most {REVIEW_MAX_TOPIC_WORDS} words."
+    if not any((p.summary or "").strip() for p in papers):
+        return "None of the papers have an abstract to review."
+    return None
 
+def _stream_review(topic, papers, api_key, bypass_cache):
+    """
+    Yield the review as it is generated; the complete text is cached once the stream ends.
+    """
+    if not bypass_cache:
+        cached = _lookup_cached_review(topic, papers)
+        if cached is not None:
+            yield cached
+            return
+
+    parts = []
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o", # Or gpt-3.5-turbo if cost is a concern, but 4o is better for reasoning
-            messages=[
-                {"role": "system", "content": "You are a helpful research assistant."},
-                {"role": "user", "content": prompt}
-            ]
+        response = get_openai_client(api_key).chat.completions.create(
+            model=REVIEW_MODEL,
+            messages=_review_messages(topic, papers),
+            stream=True
         )
-        return response.choices[0].message.content
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield parts[-1]
     except Exception as e:
-        return f"Error generating review: {e}"
+        yield f"Error generating review: {e}"
+        return
+
+    _store_cached_review(topic, papers, "".join(parts))
+
+def _review_cache_key(papers):
+    """
+    Cache key for a paper set: reviews are only reused for exactly the same papers.
+    """
+    return get_cache_key(sorted(p.url for p in papers))
+
+def _lookup_cached_review(topic, papers):
+    """
+    Return a cached review for the same papers whose topic matches this one
+    (exactly, or with embedding similarity above REVIEW_CACHE_SIMILARITY), else None.
+    """
+    return _lookup_cached_reviews([(topic, papers)])[0]
+
+def _lookup_cached_reviews(topics_and_papers):
+    """
+    Batched _lookup_cached_review: topics without an exact match are embedded
+    together in a single encode call. Returns reviews (or None) in input order.
+    """
+    keys = [_review_cache_key(papers) if papers else None for _, papers in topics_and_papers]
+    groups = [(load_from_cache(key, "review_semantic") or []) if key else [] for key in keys]
+
+    hits = []
+    pending = []
+    for i, ((topic, _), entries) in enumerate(zip(topics_and_papers, groups)):
+        normalized = topic.strip().casefold()
+        hits.append(next(
+            (e for e in entries if e["topic"].strip().casefold() == normalized), None
+        ))
+        if hits[i] is None and entries:
+            pending.append(i)
+
+    if pending:
+        # Without an embedding model only exact topic matches are reused
+        scores = semantic_similarities_batch(
+            [topics_and_papers[i][0] for i in pending],
+            [[e["topic"] for e in groups[i]] for i in pending]
+        )
+        for i, group_scores in zip(pending, scores or []):
+            score, index = max(zip(group_scores, range(len(group_scores))))
+            if score > REVIEW_CACHE_SIMILARITY:
+                hits[i] = groups[i][index]
+
+    reviews = []
+    for key, entries, hit in zip(keys, groups, hits):
+        if hit is None:
+            reviews.append(None)
+            continue
+        hit["hits"] += 1
+        save_to_cache(key, entries, "review_semantic")
+        reviews.append(hit["review"])
+    return reviews
+
+def _store_cached_review(topic, papers, review):
+    """
+    Add a generated review to the semantic cache, evicting the least-used entry when full.
+    """
+    key = _review_cache_key(papers)
+    entries = load_from_cache(key, "review_semantic") or []
+    entries.append({"topic": topic, "review": review, "hits": 0})
+    if len(entries) > REVIEW_CACHE_MAX_TOPICS:
+        # The new entry is never the one evicted
+        entries.remove(min(entries[:-1], key=lambda e: e["hits"]))
+    save_to_cache(key, entries, "review_semantic")
+
+def _review_messages(topic, papers):
+    """
+    Build the chat messages for a literature review request.
+    """
+    # Prepare the context from papers (one join instead of repeated string concatenation)
+    context = "".join(
+        REVIEW_PAPER_TEMPLATE.format(
+            index=i + 1,
+            title=p.title,
+            authors=', '.join(p.authors),
+            published=p.published,
+            summary=p.summary
+        )
+        for i, p in enumerate(papers)
+    )
+
+    return [
+        {"role": "system", "content": REVIEW_SYSTEM_PROMPT},
+        {"role": "user", "content": REVIEW_PROMPT.format(topic=topic, context=context)}
+    ]
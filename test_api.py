@@ -6,6 +6,9 @@ import json
 
 BASE_URL = "http://localhost:8000"
 
+# 注册、登录共用一个会话，复用keep-alive连接
+_session = requests.Session()
+
 def test_register():
     """测试注册"""
     url = f"{BASE_URL}/api/auth/register"
@@ -20,7 +23,7 @@ def test_register():
     print(f"Data: {json.dumps(data, indent=2)}")
     
     try:
-        response = requests.post(url, json=data)
+        response = _session.post(url, json=data)
         print(f"\nStatus Code: {response.status_code}")
         print(f"Response Headers: {dict(response.headers)}")
         print(f"Response Text: {response.text}")
@@ -56,7 +59,7 @@ def test_login(username, password):
     print(f"\nTesting login at {url}")
     
     try:
-        response = requests.post(
+        response = _session.post(
             url, 
             data=data,
             headers={"Content-Type": "application/x-www-form-urlencoded"}
@@ -5,7 +5,6 @@ import sys
 sys.path.insert(0, '.')
 
 from models import ResearchIntent, JournalLevel, PaperType, ResearchField
-from modules.multi_source_search import search_multi_source
 
 # 创建一个简单的研究意图
 intent = ResearchIntent(
@@ -22,6 +21,9 @@ print(f"年份范围: {intent.year_start} - {intent.year_end}")
 print("\n开始搜索...")
 
 try:
+    # 检索模块依赖较多，放到这里导入，导入失败时也能走下面的错误输出
+    from modules.multi_source_search import search_multi_source
+    
     results = search_multi_source(intent, max_results_per_source=5, sources=["arxiv"])
     
     print(f"\n搜索结果:")
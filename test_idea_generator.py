@@ -0,0 +1,64 @@
+"""
+测试想法生成器能处理dict形式的聚类（分析结果和数据库JSON列均为dict）
+"""
+import sys
+import json
+import uuid
+sys.path.insert(0, '.')
+
+from models import ResearchLandscape
+from llm.base import LLMProvider, LLMResponse
+from modules.idea_generator import ResearchIdeaGenerator
+
+
+class FakeLLMManager:
+    """记录提示词并返回固定想法的LLM管理器"""
+    
+    def __init__(self):
+        self.prompts = []
+    
+    def chat(self, messages, llm_name=None, **kwargs):
+        self.prompts.append(messages[-1]["content"])
+        content = json.dumps({"ideas": [{
+            "idea_id": "idea_1",
+            "title": "测试想法",
+            "motivation": "动机",
+            "core_hypothesis": "假设",
+            "expected_contribution": "贡献",
+            "difference_from_existing": "区别",
+            "feasibility_score": 7,
+            "novelty_score": 8
+        }]}, ensure_ascii=False)
+        return LLMResponse(content=content, model=llm_name or "fake", provider=LLMProvider.DEEPSEEK)
+    
+    def get_default_llm_name(self):
+        return "fake"
+
+
+def test_generate_ideas_with_dict_clusters():
+    landscape = ResearchLandscape(
+        clusters=[{
+            "cluster_name": "LLM Agents",
+            "papers": ["2301.00001"],
+            "key_themes": ["tool use"],
+            "technical_evolution": "..."
+        }],
+        solved_problems=[],
+        partially_solved=[],
+        unsolved_problems=["长程规划"],
+        technical_evolution={}
+    )
+    manager = FakeLLMManager()
+    # 使用唯一的模型名，避免命中LLM响应缓存
+    ideas = ResearchIdeaGenerator(manager).generate_ideas(
+        landscape, num_ideas=1, llm_name=f"fake-{uuid.uuid4().hex}"
+    )
+    
+    assert len(ideas) == 1
+    assert "LLM Agents" in manager.prompts[0]
+    assert "tool use" in manager.prompts[0]
+
+
+if __name__ == "__main__":
+    test_generate_ideas_with_dict_clusters()
+    print("✓ dict聚类测试通过")
@@ -1,6 +1,9 @@
 """测试登录API"""
 import requests
 
+# 复用keep-alive连接（多次请求时不必重复建立TCP连接）
+_session = requests.Session()
+
 # 测试登录
 login_data = {
     "username": "jason",
@@ -8,7 +11,7 @@ login_data = {
 }
 
 try:
-    response = requests.post(
+    response = _session.post(
         "http://127.0.0.1:8000/api/auth/login",
         data=login_data,  # OAuth2PasswordRequestForm使用form data
         timeout=10
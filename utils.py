@@ -1,18 +1,51 @@
 """
 工具函数库
 """
+import asyncio
+import atexit
+import copy
+import functools
 import json
 import logging
+import mmap
+import os
 import hashlib
+import importlib.util
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Any, Optional, Dict
+from typing import Any, Awaitable, Callable, Iterable, Optional, Dict, List, Set
 import config
 
+try:
+    import orjson
+except ImportError:  # 可选依赖，未安装时回退到标准库json
+    orjson = None
+
+# httpx的HTTP/2支持依赖h2（可选）
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# OpenAI客户端连接池上限（整个进程的LLM请求共用）
+_HTTP_MAX_CONNECTIONS = 100
+_HTTP_MAX_KEEPALIVE_CONNECTIONS = 50
+_HTTP_KEEPALIVE_EXPIRY = 60.0
+
+# 事件循环 → {api_key: AsyncOpenAI}，事件循环结束后自动释放
+_async_openai_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = (
+    weakref.WeakKeyDictionary()
+)
+
 
 def setup_logger(name: str = "ai_researcher") -> logging.Logger:
     """设置日志系统"""
     logger = logging.getLogger(name)
+    # 已配置过（重复调用或模块被重复导入）时直接返回，避免挂载重复的处理器导致每条日志重复输出
+    if logger.handlers:
+        return logger
     logger.setLevel(getattr(logging, config.LOG_LEVEL))
     
     # 控制台处理器
@@ -21,8 +54,8 @@ def setup_logger(name: str = "ai_researcher") -> logging.Logger:
     console_format = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
     console_handler.setFormatter(console_format)
     
-    # 文件处理器
-    file_handler = logging.FileHandler(config.LOG_FILE, encoding='utf-8')
+    # 文件处理器（delay=True：首条日志写入时才打开文件）
+    file_handler = logging.FileHandler(config.LOG_FILE, encoding='utf-8', delay=True)
     file_handler.setLevel(logging.DEBUG)
     file_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     file_handler.setFormatter(file_format)
@@ -37,48 +70,88 @@ logger = setup_logger()
 
 
 def get_cache_key(data: Any) -> str:
-    """生成缓存键"""
+    """生成缓存键（128位blake2b，与原md5键等长）"""
     data_str = json.dumps(data, sort_keys=True)
-    return hashlib.md5(data_str.encode()).hexdigest()
+    return hashlib.blake2b(data_str.encode(), digest_size=16).hexdigest()
+
+
+# 缓存文件由单个后台线程写入；写入完成前的内容暂存在_pending_cache_writes中，
+# 保证load_from_cache能立即读到刚保存的数据
+_cache_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-writer")
+_pending_cache_writes: Dict[Path, str] = {}
+_pending_cache_lock = threading.Lock()
+atexit.register(_cache_writer.shutdown, wait=True)
+
+# save_json/save_jsonl的后台写入（background=True时）：按提交顺序由单个线程写出，进程退出前写完
+_output_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="output-writer")
+atexit.register(_output_writer.shutdown, wait=True)
 
 
 def save_to_cache(key: str, data: Any, cache_type: str = "general") -> None:
-    """保存到缓存"""
+    """保存到缓存（在调用线程序列化，写文件交给后台线程，调用方无需等待磁盘I/O）"""
     if not config.CACHE_ENABLED:
         return
     
-    cache_dir = config.CACHE_DIR / cache_type
-    cache_dir.mkdir(exist_ok=True)
-    
-    cache_file = cache_dir / f"{key}.json"
+    cache_file = _cache_path(key, cache_type)
     cache_data = {
         "data": data,
         "timestamp": datetime.now().isoformat()
     }
+    text = json_dumps(cache_data, indent=True)
     
-    with open(cache_file, 'w', encoding='utf-8') as f:
-        json.dump(cache_data, f, ensure_ascii=False, indent=2)
-    
-    logger.debug(f"Saved to cache: {cache_file}")
+    with _pending_cache_lock:
+        _pending_cache_writes[cache_file] = text
+    _cache_writer.submit(_write_cache_file, cache_file, text)
+
+
+def _cache_path(key: str, cache_type: str) -> Path:
+    """缓存文件路径：按键的前两位十六进制字符分片（与.git/objects相同），控制单个目录的文件数"""
+    return config.CACHE_DIR / cache_type / key[:2] / f"{key[2:]}.json"
 
 
-def load_from_cache(key: str, cache_type: str = "general") -> Optional[Any]:
-    """从缓存加载"""
+def _write_cache_file(cache_file: Path, text: str) -> None:
+    """写入缓存文件（在后台线程中执行）"""
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            f.write(text)
+        logger.debug(f"Saved to cache: {cache_file}")
+    except Exception as e:
+        logger.warning(f"Failed to save cache {cache_file}: {e}")
+    finally:
+        with _pending_cache_lock:
+            # 期间若有更新的写入排队，保留更新的内容
+            if _pending_cache_writes.get(cache_file) is text:
+                del _pending_cache_writes[cache_file]
+
+
+def load_from_cache(
+    key: str,
+    cache_type: str = "general",
+    max_age: Optional[timedelta] = None
+) -> Optional[Any]:
+    """从缓存加载（max_age为该类缓存的有效期，默认CACHE_EXPIRY_DAYS天）"""
     if not config.CACHE_ENABLED:
         return None
     
-    cache_file = config.CACHE_DIR / cache_type / f"{key}.json"
+    cache_file = _cache_path(key, cache_type)
     
-    if not cache_file.exists():
-        return None
+    with _pending_cache_lock:
+        text = _pending_cache_writes.get(cache_file)
+    if text is None and not cache_file.exists():
+        # 兼容分片之前的平铺布局，下次保存时写入分片目录
+        cache_file = config.CACHE_DIR / cache_type / f"{key}.json"
+        if not cache_file.exists():
+            return None
     
     try:
-        with open(cache_file, 'r', encoding='utf-8') as f:
-            cache_data = json.load(f)
+        cache_data = json_loads(text) if text is not None else _load_json_file(cache_file)
         
         # 检查是否过期
         timestamp = datetime.fromisoformat(cache_data["timestamp"])
-        if datetime.now() - timestamp > timedelta(days=config.CACHE_EXPIRY_DAYS):
+        if max_age is None:
+            max_age = timedelta(days=config.CACHE_EXPIRY_DAYS)
+        if datetime.now() - timestamp > max_age:
             logger.debug(f"Cache expired: {cache_file}")
             return None
         
@@ -90,6 +163,496 @@ def load_from_cache(key: str, cache_type: str = "general") -> Optional[Any]:
         return None
 
 
+@functools.lru_cache(maxsize=4)
+def get_openai_client(api_key: str) -> 'OpenAI':
+    """
+    获取按api_key缓存的OpenAI客户端
+    
+    复用同一客户端的连接池，后续请求可直接走keep-alive连接，省去TCP+TLS握手；
+    超时、429、5xx等瞬时错误由客户端按指数退避自动重试。
+    安装了h2时启用HTTP/2，多线程并发请求可复用同一条连接
+    """
+    from openai import OpenAI, DefaultHttpxClient
+    
+    return OpenAI(
+        api_key=api_key,
+        max_retries=config.LLM_MAX_RETRIES,
+        http_client=DefaultHttpxClient(http2=_HTTP2_AVAILABLE, limits=_http_limits())
+    )
+
+
+def get_async_openai_client(api_key: str) -> 'AsyncOpenAI':
+    """
+    获取当前事件循环内按api_key缓存的AsyncOpenAI客户端（须在协程中调用）
+    
+    异步连接池绑定创建它的事件循环，因此按事件循环分别缓存：
+    同一次asyncio.run内各模块的并发请求共用一个连接池（安装了h2时多路复用同一条连接），
+    事件循环结束后客户端随之释放
+    """
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    
+    clients = _async_openai_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(api_key)
+    if client is None:
+        client = AsyncOpenAI(
+            api_key=api_key,
+            max_retries=config.LLM_MAX_RETRIES,
+            http_client=DefaultAsyncHttpxClient(http2=_HTTP2_AVAILABLE, limits=_http_limits())
+        )
+        clients[api_key] = client
+    return client
+
+
+def _http_limits() -> 'httpx.Limits':
+    """OpenAI客户端的连接池配置"""
+    import httpx
+    
+    return httpx.Limits(
+        max_connections=_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=_HTTP_KEEPALIVE_EXPIRY
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _get_embedding_model():
+    """获取句向量模型（可选依赖sentence-transformers，不可用时返回None）"""
+    if not config.RELEVANCE_EMBEDDING_MODEL:
+        return None
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        return None
+    try:
+        return SentenceTransformer(config.RELEVANCE_EMBEDDING_MODEL)
+    except Exception as e:
+        logger.warning(f"Failed to load embedding model {config.RELEVANCE_EMBEDDING_MODEL}: {e}")
+        return None
+
+
+# 文本 → int8量化句向量 (向量, 缩放系数) 的LRU缓存（同一批摘要/关键词在各步骤间反复打分时免去重复编码）
+_embedding_cache: "OrderedDict[str, Any]" = OrderedDict()
+_embedding_cache_lock = threading.Lock()
+
+
+def _encode_texts(model, texts: List[str]):
+    """
+    编码文本为归一化句向量矩阵（行与texts一一对应）
+    
+    先查LRU缓存，未命中的文本去重后一次批量编码再写回缓存。
+    向量按每行最大绝对值做int8量化后缓存（内存为float32的1/4，余弦相似度误差约1e-3），
+    新编码的向量同样经过量化，保证命中与否结果一致
+    """
+    import numpy as np  # sentence-transformers的依赖，模型可用时必然已安装
+    
+    cache_size = config.EMBEDDING_CACHE_SIZE
+    vectors = {}
+    if cache_size > 0:
+        with _embedding_cache_lock:
+            for text in texts:
+                vector = _embedding_cache.get(text)
+                if vector is not None:
+                    _embedding_cache.move_to_end(text)
+                    vectors[text] = vector
+    
+    misses = [text for text in dict.fromkeys(texts) if text not in vectors]
+    if misses:
+        encoded = model.encode(
+            misses,
+            batch_size=config.EMBEDDING_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+        scales = np.abs(encoded).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        quantized = np.clip(np.rint(encoded / scales[:, None]), -127, 127).astype(np.int8)
+        entries = list(zip(quantized, scales.astype(np.float32)))
+        vectors.update(zip(misses, entries))
+        
+        if cache_size > 0:
+            with _embedding_cache_lock:
+                for text, entry in zip(misses, entries):
+                    _embedding_cache[text] = entry
+                    _embedding_cache.move_to_end(text)
+                while len(_embedding_cache) > cache_size:
+                    _embedding_cache.popitem(last=False)
+    
+    rows = [vectors[text] for text in texts]
+    return (
+        np.stack([q for q, _ in rows]).astype(np.float32)
+        * np.array([scale for _, scale in rows], dtype=np.float32)[:, None]
+    )
+
+
+def embedding_available() -> bool:
+    """句向量模型是否可用"""
+    return _get_embedding_model() is not None
+
+
+def semantic_similarities(query: str, texts: List[str]) -> Optional[List[float]]:
+    """
+    计算query与每段文本的句向量余弦相似度（一次批量编码）
+    
+    Args:
+        query: 查询文本
+        texts: 待比较的文本列表
+    
+    Returns:
+        与texts顺序一致的相似度列表；模型不可用时返回None
+    """
+    model = _get_embedding_model()
+    if model is None:
+        return None
+    if not texts:
+        return []
+    
+    vectors = _encode_texts(model, [query, *texts])
+    return (vectors[1:] @ vectors[0]).tolist()
+
+
+def semantic_similarities_batch(
+    queries: List[str],
+    candidates: List[List[str]]
+) -> Optional[List[List[float]]]:
+    """
+    批量版semantic_similarities：第i个query只与candidates[i]比较，所有不重复的文本一次编码
+    
+    Args:
+        queries: 查询文本列表
+        candidates: 与queries一一对应的待比较文本列表
+    
+    Returns:
+        与candidates结构一致的相似度列表；模型不可用时返回None
+    """
+    model = _get_embedding_model()
+    if model is None:
+        return None
+    
+    texts = list(dict.fromkeys([*queries, *(t for group in candidates for t in group)]))
+    if not texts:
+        return [[] for _ in queries]
+    index = {text: i for i, text in enumerate(texts)}
+    
+    vectors = _encode_texts(model, texts)
+    return [
+        (vectors[[index[t] for t in group]] @ vectors[index[query]]).tolist() if group else []
+        for query, group in zip(queries, candidates)
+    ]
+
+
+_WORD_RE = re.compile(r"\w+")
+_PUNCT_RE = re.compile(r'[^\w\s]')
+_WS_RE = re.compile(r'\s+')
+
+
+def word_set(text: Optional[str]) -> Set[str]:
+    """将文本切分为小写词集合（用于关键词匹配打分）"""
+    return set(_WORD_RE.findall(text.lower())) if text else set()
+
+
+def normalize_title(title: str) -> str:
+    """
+    标准化标题用于匹配
+    
+    Args:
+        title: 原始标题
+    
+    Returns:
+        标准化后的标题
+    """
+    # 转小写，移除标点和多余空格
+    return _WS_RE.sub(' ', _PUNCT_RE.sub('', title.lower())).strip()
+
+
+def json_loads(text: str) -> Any:
+    """
+    解析JSON文本（安装了orjson时使用orjson）
+    
+    Raises:
+        json.JSONDecodeError: 文本不是有效JSON（orjson.JSONDecodeError是其子类）
+    """
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def _load_json_file(path: Path) -> Any:
+    """读取并解析JSON文件（安装了orjson时直接解析文件的mmap映射，不额外复制一份缓冲区）"""
+    with open(path, 'rb') as f:
+        if orjson is None or os.fstat(f.fileno()).st_size == 0:
+            return json_loads(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            return orjson.loads(view)
+
+
+def json_dumps(data: Any, indent: bool = False) -> str:
+    """序列化为JSON文本（保留非ASCII字符；安装了orjson时使用orjson）"""
+    if orjson is not None:
+        # OPT_NON_STR_KEYS：与json.dumps一致，允许int等非字符串键
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(data, option=option).decode()
+    return json.dumps(data, ensure_ascii=False, indent=2 if indent else None)
+
+
+def json_dumpb(data: Any, indent: bool = False, newline: bool = False) -> bytes:
+    """
+    序列化为UTF-8编码的JSON字节（写文件时使用，orjson直接产出bytes，免去decode再encode）
+    
+    Args:
+        data: 待序列化的数据
+        indent: 是否缩进
+        newline: 是否在末尾追加换行（JSON Lines）
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if newline:
+            option |= orjson.OPT_APPEND_NEWLINE
+        return orjson.dumps(data, option=option)
+    text = json.dumps(data, ensure_ascii=False, indent=2 if indent else None)
+    return (text + "\n" if newline else text).encode('utf-8')
+
+
+def as_str(value: Any, default: str = "") -> str:
+    """LLM JSON字段 → 字符串（缺失时返回默认值）"""
+    if value is None:
+        return default
+    return value if isinstance(value, str) else str(value)
+
+
+def as_list(value: Any) -> list:
+    """LLM JSON字段 → 列表（单个值包装为列表，缺失时返回空列表）"""
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def as_dict(value: Any) -> dict:
+    """LLM JSON字段 → 字典（类型不符时返回空字典）"""
+    return value if isinstance(value, dict) else {}
+
+
+def as_score(value: Any, default: float = 0.5) -> float:
+    """LLM JSON评分字段 → [0, 1]内的浮点数（无法解析时返回默认值）"""
+    try:
+        score = float(value)
+    except (TypeError, ValueError):
+        return default
+    if score != score:  # NaN
+        return default
+    return min(1.0, max(0.0, score))
+
+
+_llm_json_cache: "OrderedDict[str, Any]" = OrderedDict()
+_llm_json_cache_lock = threading.Lock()
+_CACHE_MISS = object()
+
+
+def _llm_cache_key(system: str, prompt: str, temperature: float, model: str) -> str:
+    """LLM响应缓存键"""
+    return hashlib.blake2b(
+        json.dumps([system, prompt, temperature, model], ensure_ascii=False).encode(),
+        digest_size=16
+    ).hexdigest()
+
+
+def _llm_cache_get(key: str) -> Any:
+    """读取LLM响应缓存，未命中返回_CACHE_MISS"""
+    with _llm_json_cache_lock:
+        if key not in _llm_json_cache:
+            return _CACHE_MISS
+        _llm_json_cache.move_to_end(key)
+        logger.debug(f"LLM response cache hit: {key}")
+        return copy.deepcopy(_llm_json_cache[key])
+
+
+def _llm_cache_put(key: str, result: Any) -> Any:
+    """写入LLM响应缓存，返回供调用方使用的副本"""
+    with _llm_json_cache_lock:
+        _llm_json_cache[key] = result
+        _llm_json_cache.move_to_end(key)
+        while len(_llm_json_cache) > config.LLM_RESPONSE_CACHE_SIZE:
+            _llm_json_cache.popitem(last=False)
+    return copy.deepcopy(result)
+
+
+_JSON_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.DOTALL)
+
+
+def parse_llm_json(text: str) -> Any:
+    """
+    解析LLM返回的JSON，失败时先尝试低成本修复
+    
+    依次尝试：原文、```json代码块内容、最外层{...}/[...]片段
+    
+    Raises:
+        json.JSONDecodeError: 所有修复手段都失败（抛出原文的解析错误）
+    """
+    try:
+        return json_loads(text)
+    except json.JSONDecodeError as e:
+        error = e
+    
+    candidates = [m.group(1) for m in _JSON_FENCE_RE.finditer(text)]
+    for open_char, close_char in (("{", "}"), ("[", "]")):
+        start, end = text.find(open_char), text.rfind(close_char)
+        if 0 <= start < end:
+            candidates.append(text[start:end + 1])
+    
+    for candidate in candidates:
+        try:
+            return json_loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    
+    raise error
+
+
+def json_repair_messages(bad_text: str) -> list:
+    """构建让LLM修复自身非法JSON输出的消息（比重新执行原始提示词便宜得多）"""
+    return [
+        {"role": "system", "content": "你是JSON修复工具。只输出修复后的合法JSON，不要输出任何解释。"},
+        {"role": "user", "content": f"以下内容不是合法的JSON，请修复语法错误并保持内容不变：\n{bad_text}"}
+    ]
+
+
+def _fetch_llm_json(fetch: Callable[[], str], repair: Optional[Callable[[str], str]]) -> Any:
+    """调用LLM并解析JSON，解析失败时用repair请求修复"""
+    text = fetch()
+    try:
+        return parse_llm_json(text)
+    except json.JSONDecodeError as e:
+        if repair is None:
+            raise
+        error = e
+    
+    for attempt in range(config.LLM_JSON_REPAIR_ATTEMPTS):
+        logger.warning(f"LLM returned invalid JSON, requesting repair (attempt {attempt + 1})")
+        text = repair(text)
+        try:
+            return parse_llm_json(text)
+        except json.JSONDecodeError as e:
+            error = e
+    
+    raise error
+
+
+async def _afetch_llm_json(
+    fetch: Callable[[], Awaitable[str]],
+    repair: Optional[Callable[[str], Awaitable[str]]]
+) -> Any:
+    """_fetch_llm_json的异步版本"""
+    text = await fetch()
+    try:
+        return parse_llm_json(text)
+    except json.JSONDecodeError as e:
+        if repair is None:
+            raise
+        error = e
+    
+    for attempt in range(config.LLM_JSON_REPAIR_ATTEMPTS):
+        logger.warning(f"LLM returned invalid JSON, requesting repair (attempt {attempt + 1})")
+        text = await repair(text)
+        try:
+            return parse_llm_json(text)
+        except json.JSONDecodeError as e:
+            error = e
+    
+    raise error
+
+
+def cached_llm_json(
+    fetch: Callable[[], str],
+    system: str,
+    prompt: str,
+    temperature: float,
+    model: str,
+    repair: Optional[Callable[[str], str]] = None
+) -> Any:
+    """
+    带LRU内存缓存的LLM JSON调用
+    
+    以 (system, prompt, temperature, model) 为键缓存解析后的JSON，
+    相同输入重复调用时直接返回缓存结果，不再请求LLM。
+    
+    Args:
+        fetch: 实际调用LLM并返回响应文本的函数（仅在未命中时调用）
+        system: 系统提示词
+        prompt: 用户提示词
+        temperature: 温度参数
+        model: 模型名称
+        repair: 接收非法JSON文本、返回修复后文本的函数（可选，见json_repair_messages）
+    
+    Returns:
+        解析后的JSON（深拷贝，调用方可放心修改）
+    
+    Raises:
+        json.JSONDecodeError: 响应不是有效JSON且修复失败（失败结果不会被缓存）
+    """
+    if config.LLM_RESPONSE_CACHE_SIZE <= 0:
+        return _fetch_llm_json(fetch, repair)
+    
+    key = _llm_cache_key(system, prompt, temperature, model)
+    cached = _llm_cache_get(key)
+    if cached is not _CACHE_MISS:
+        return cached
+    
+    return _llm_cache_put(key, _fetch_llm_json(fetch, repair))
+
+
+# 事件循环 → {缓存键: 进行中的请求任务}，用于合并并发的相同请求
+_inflight_llm_json: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Future]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+async def _coalesced_afetch_llm_json(
+    key: str,
+    fetch: Callable[[], Awaitable[str]],
+    repair: Optional[Callable[[str], Awaitable[str]]]
+) -> Any:
+    """
+    合并同一事件循环内进行中的相同请求：后到的调用方等待同一个任务，不重复请求LLM
+    
+    返回的结果由所有等待方共享，调用方需自行拷贝
+    """
+    inflight = _inflight_llm_json.setdefault(asyncio.get_running_loop(), {})
+    task = inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_afetch_llm_json(fetch, repair))
+        inflight[key] = task
+        task.add_done_callback(lambda _: inflight.pop(key, None))
+    else:
+        logger.debug(f"Joined in-flight LLM request: {key}")
+    # shield：某个调用方被取消时不影响其他等待同一请求的调用方
+    return await asyncio.shield(task)
+
+
+async def async_cached_llm_json(
+    fetch: Callable[[], Awaitable[str]],
+    system: str,
+    prompt: str,
+    temperature: float,
+    model: str,
+    repair: Optional[Callable[[str], Awaitable[str]]] = None
+) -> Any:
+    """
+    cached_llm_json的异步版本（fetch、repair为返回awaitable的函数）
+    
+    同一事件循环内并发发起的相同请求只调用一次LLM（即使未启用缓存）
+    """
+    key = _llm_cache_key(system, prompt, temperature, model)
+    if config.LLM_RESPONSE_CACHE_SIZE <= 0:
+        return copy.deepcopy(await _coalesced_afetch_llm_json(key, fetch, repair))
+    
+    cached = _llm_cache_get(key)
+    if cached is not _CACHE_MISS:
+        return cached
+    
+    return _llm_cache_put(key, await _coalesced_afetch_llm_json(key, fetch, repair))
+
+
 def save_workflow_state(state: 'WorkflowState', filename: Optional[str] = None) -> Path:
     """保存工作流状态"""
     if filename is None:
@@ -98,8 +661,8 @@ def save_workflow_state(state: 'WorkflowState', filename: Optional[str] = None)
     
     output_file = config.OUTPUT_DIR / filename
     
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(state.to_dict(), f, ensure_ascii=False, indent=2)
+    with open(output_file, 'wb') as f:
+        f.write(json_dumpb(state.to_dict(), indent=True))
     
     logger.info(f"Workflow state saved to: {output_file}")
     return output_file
@@ -114,8 +677,7 @@ def load_workflow_state(filename: str) -> Optional[Dict[str, Any]]:
         return None
     
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            state_dict = json.load(f)
+        state_dict = _load_json_file(input_file)
         
         logger.info(f"Workflow state loaded from: {input_file}")
         return state_dict
@@ -125,8 +687,71 @@ def load_workflow_state(filename: str) -> Optional[Dict[str, Any]]:
         return None
 
 
-def save_json(data: Any, filename: str, subdir: Optional[str] = None) -> Path:
-    """保存JSON文件"""
+def save_workflow_state_fields(fields: Dict[str, Any], dirname: str = "state") -> Path:
+    """
+    增量保存工作流状态：每个字段单独一个JSON文件，只重写传入的字段
+    
+    Args:
+        fields: {字段名: 已转换为字典的值}
+        dirname: 输出目录（位于OUTPUT_DIR下）
+    """
+    output_dir = config.OUTPUT_DIR / dirname
+    output_dir.mkdir(exist_ok=True)
+    
+    for name, value in fields.items():
+        output_file = output_dir / f"{name}.json"
+        # 先写临时文件再替换，中途失败不会留下半截的字段文件
+        tmp_file = output_file.with_suffix(".json.tmp")
+        with open(tmp_file, 'wb') as f:
+            f.write(json_dumpb(value))
+        os.replace(tmp_file, output_file)
+    
+    logger.info(f"Workflow state fields saved to {output_dir}: {', '.join(fields)}")
+    return output_dir
+
+
+def load_workflow_state_fields(dirname: str = "state") -> Optional[Dict[str, Any]]:
+    """加载save_workflow_state_fields保存的工作流状态，重新组装为字典"""
+    input_dir = config.OUTPUT_DIR / dirname
+    
+    if not input_dir.is_dir():
+        logger.error(f"Workflow state directory not found: {input_dir}")
+        return None
+    
+    try:
+        state_dict = {path.stem: _load_json_file(path) for path in sorted(input_dir.glob("*.json"))}
+        
+        logger.info(f"Workflow state loaded from: {input_dir}")
+        return state_dict
+    
+    except Exception as e:
+        logger.error(f"Failed to load workflow state: {e}")
+        return None
+
+
+def _write_output_file(output_file: Path, payload: bytes, message: str) -> None:
+    """写入输出文件（在后台线程中执行，失败只记录日志）"""
+    try:
+        with open(output_file, 'wb') as f:
+            f.write(payload)
+        logger.info(message)
+    except Exception as e:
+        logger.error(f"Failed to write {output_file}: {e}")
+
+
+def save_json(
+    data: Any,
+    filename: str,
+    subdir: Optional[str] = None,
+    background: bool = False
+) -> Path:
+    """
+    保存JSON文件
+    
+    Args:
+        background: 为True时在调用线程序列化、由后台线程写盘，调用方不等待磁盘I/O
+            （适合中间结果；返回时文件可能尚未写完）
+    """
     if subdir:
         output_dir = config.OUTPUT_DIR / subdir
         output_dir.mkdir(exist_ok=True)
@@ -134,14 +759,60 @@ def save_json(data: Any, filename: str, subdir: Optional[str] = None) -> Path:
         output_dir = config.OUTPUT_DIR
     
     output_file = output_dir / filename
+    payload = json_dumpb(data, indent=True)
+    
+    if background:
+        _output_writer.submit(_write_output_file, output_file, payload, f"JSON saved to: {output_file}")
+        return output_file
     
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with open(output_file, 'wb') as f:
+        f.write(payload)
     
     logger.info(f"JSON saved to: {output_file}")
     return output_file
 
 
+def save_jsonl(
+    records: Iterable[Any],
+    filename: str,
+    subdir: Optional[str] = None,
+    background: bool = False
+) -> Path:
+    """
+    保存JSON Lines文件（每条记录一行，逐条序列化写入，不在内存中拼出整个文档）
+    
+    适合论文元数据、分析结果等按条记录的大列表；小的汇总文档仍用save_json
+    
+    Args:
+        background: 同save_json（此时记录在调用线程中序列化为一整块再交给后台线程）
+    """
+    if subdir:
+        output_dir = config.OUTPUT_DIR / subdir
+        output_dir.mkdir(exist_ok=True)
+    else:
+        output_dir = config.OUTPUT_DIR
+    
+    output_file = output_dir / filename
+    
+    if background:
+        # 必须在调用线程序列化：records可能引用调用方随后会修改的对象
+        lines = [json_dumpb(record, newline=True) for record in records]
+        _output_writer.submit(
+            _write_output_file, output_file, b"".join(lines),
+            f"JSONL saved to: {output_file} ({len(lines)} records)"
+        )
+        return output_file
+    
+    count = 0
+    with open(output_file, 'wb') as f:
+        for record in records:
+            f.write(json_dumpb(record, newline=True))
+            count += 1
+    
+    logger.info(f"JSONL saved to: {output_file} ({count} records)")
+    return output_file
+
+
 def load_json(filename: str, subdir: Optional[str] = None) -> Optional[Any]:
     """加载JSON文件"""
     if subdir:
@@ -156,8 +827,7 @@ def load_json(filename: str, subdir: Optional[str] = None) -> Optional[Any]:
         return None
     
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = _load_json_file(input_file)
         
         logger.info(f"JSON loaded from: {input_file}")
         return data
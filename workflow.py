@@ -2,17 +2,20 @@
 工作流编排器
 管理整个研究流程的执行
 """
-from typing import Optional
-from models import WorkflowState, ResearchIntent
+import asyncio
+from typing import Dict, List, Optional, Set
+from models import WorkflowState, ResearchIntent, PaperAnalysis, PaperMetadata
 from modules.research_intent import create_research_intent, validate_research_intent
 from modules.literature_discovery import search_papers, deduplicate_papers
-from modules.paper_reading import analyze_papers
+from modules.paper_reading import analyze_papers_async, analyze_papers_batch
 from modules.landscape_analysis import analyze_research_landscape
 from modules.idea_generation import generate_research_ideas, rank_ideas
 from modules.method_design import design_method
 from modules.experiment_planning import design_experiments
-from modules.paper_drafting import generate_paper_draft
-from utils import logger, save_workflow_state, save_json
+from modules.paper_drafting import generate_paper_draft_async
+from utils import (
+    logger, save_workflow_state, save_workflow_state_fields, save_json, save_jsonl, get_cache_key
+)
 import config
 
 
@@ -28,6 +31,10 @@ class ResearchWorkflow:
         """
         self.api_key = api_key
         self.state = WorkflowState()
+        # 去重输入指纹 → 保留的论文下标（重复检索同一批论文时跳过去重）
+        self._dedup_cache: Dict[str, List[int]] = {}
+        # 自上次checkpoint_state以来变化过的状态字段（首次全部写出）
+        self._dirty_fields: Set[str] = set(WorkflowState.__dataclass_fields__)
         logger.info("Research workflow initialized")
     
     def set_research_intent(
@@ -66,6 +73,7 @@ class ResearchWorkflow:
             raise ValueError("Invalid research intent")
         
         self.state.research_intent = intent
+        self._dirty_fields.add("research_intent")
         self.state.current_step = "intent"
         
         logger.info(f"Research intent set: {keywords}")
@@ -81,13 +89,13 @@ class ResearchWorkflow:
         Returns:
             检索到的论文数量
         """
-        if not self.state.research_intent:
+        if self.state.research_intent is None:
             raise ValueError("Research intent not set")
         
         logger.info("Starting literature discovery...")
         
         papers = search_papers(self.state.research_intent, max_results)
-        papers = deduplicate_papers(papers)
+        papers = self._deduplicate(papers)
         
         # 过滤低相关度论文
         filtered_papers = [
@@ -96,22 +104,57 @@ class ResearchWorkflow:
         ]
         
         self.state.papers_metadata = filtered_papers
+        self._dirty_fields.add("papers_metadata")
         self.state.current_step = "discovery"
         
         logger.info(f"Discovered {len(filtered_papers)} relevant papers")
         
         # 保存中间结果
         if config.SAVE_INTERMEDIATE_RESULTS:
-            save_json(
-                [p.to_dict() for p in filtered_papers],
-                "papers_metadata.json"
+            save_jsonl(
+                (p.to_dict() for p in filtered_papers),
+                "papers_metadata.jsonl",
+                background=True
             )
         
         return len(filtered_papers)
     
+    def _deduplicate(self, papers: List[PaperMetadata]) -> List[PaperMetadata]:
+        """
+        论文去重，按输入的标准化标题序列记忆结果
+        
+        去重只取决于标题及其先后顺序（保留先出现的论文），输入相同时直接复用上次保留的下标
+        """
+        fingerprint = get_cache_key([p.title_norm for p in papers])
+        kept_indices = self._dedup_cache.get(fingerprint)
+        if kept_indices is not None:
+            logger.info(f"Deduplication result reused: {len(papers)} -> {len(kept_indices)} papers")
+            return [papers[i] for i in kept_indices]
+        
+        unique_papers = deduplicate_papers(papers)
+        # 去重结果保持输入顺序，按对象身份换算出保留的下标
+        kept_ids = {id(p) for p in unique_papers}
+        self._dedup_cache[fingerprint] = [i for i, p in enumerate(papers) if id(p) in kept_ids]
+        return unique_papers
+    
     def analyze_literature(self, max_papers: int = None) -> int:
         """
-        分析文献
+        分析文献（同步入口，不能在已运行的事件循环中调用）
+        
+        Args:
+            max_papers: 最多分析的论文数
+        
+        Returns:
+            分析的论文数量
+        """
+        if config.USE_BATCH_API:
+            return self.analyze_literature_batch(max_papers)
+        
+        return asyncio.run(self.analyze_literature_async(max_papers))
+    
+    async def analyze_literature_async(self, max_papers: int = None) -> int:
+        """
+        分析文献（异步版本，各论文的分析请求并发发出）
         
         Args:
             max_papers: 最多分析的论文数
@@ -124,31 +167,76 @@ class ResearchWorkflow:
         
         logger.info("Starting literature analysis...")
         
-        papers_analysis = analyze_papers(
+        papers_analysis = await analyze_papers_async(
             self.state.papers_metadata,
             self.api_key,
             max_papers
         )
+        return self._set_papers_analysis(papers_analysis)
+    
+    def analyze_literature_batch(self, max_papers: int = None) -> int:
+        """
+        通过OpenAI Batch API分析文献（一次提交全部请求并轮询结果，费用减半但延迟较高）
+        
+        Args:
+            max_papers: 最多分析的论文数
+        
+        Returns:
+            分析的论文数量
+        """
+        if not self.state.papers_metadata:
+            raise ValueError("No papers to analyze")
+        
+        logger.info("Starting literature analysis (Batch API)...")
         
+        papers_analysis = analyze_papers_batch(
+            self.state.papers_metadata,
+            self.api_key,
+            max_papers
+        )
+        return self._set_papers_analysis(papers_analysis)
+    
+    def _set_papers_analysis(self, papers_analysis: Dict[str, PaperAnalysis]) -> int:
+        """记录文献分析结果并保存中间结果，返回分析的论文数量"""
         self.state.papers_analysis = papers_analysis
+        self._dirty_fields.add("papers_analysis")
         self.state.current_step = "analysis"
         
         logger.info(f"Analyzed {len(papers_analysis)} papers")
         
         # 保存中间结果
         if config.SAVE_INTERMEDIATE_RESULTS:
-            save_json(
-                {k: v.to_dict() for k, v in papers_analysis.items()},
-                "papers_analysis.json"
+            save_jsonl(
+                (v.to_dict() for v in papers_analysis.values()),
+                "papers_analysis.jsonl",
+                background=True
             )
         
         return len(papers_analysis)
     
+    def _step_fingerprint(self, inputs) -> str:
+        """步骤输入的指纹（inputs需可JSON序列化）"""
+        return get_cache_key(inputs)
+    
+    def _reuse_step(self, step: str, fingerprint: str, output) -> bool:
+        """步骤已用相同输入完成过时复用已有结果，跳过LLM调用"""
+        if output and self.state.step_fingerprints.get(step) == fingerprint:
+            self.state.current_step = step
+            logger.info(f"Step '{step}' inputs unchanged, reusing previous result")
+            return True
+        return False
+    
     def analyze_landscape(self):
         """分析研究脉络"""
         if not self.state.papers_analysis:
             raise ValueError("No paper analysis available")
         
+        fingerprint = self._step_fingerprint(
+            {k: v.to_dict() for k, v in self.state.papers_analysis.items()}
+        )
+        if self._reuse_step("landscape", fingerprint, self.state.landscape):
+            return self.state.landscape
+        
         logger.info("Analyzing research landscape...")
         
         landscape = analyze_research_landscape(
@@ -157,13 +245,15 @@ class ResearchWorkflow:
         )
         
         self.state.landscape = landscape
+        self._dirty_fields.add("landscape")
         self.state.current_step = "landscape"
+        self.state.step_fingerprints["landscape"] = fingerprint
         
         logger.info("Research landscape analyzed")
         
         # 保存中间结果
         if config.SAVE_INTERMEDIATE_RESULTS:
-            save_json(landscape.to_dict(), "research_landscape.json")
+            save_json(landscape.to_dict(), "research_landscape.json", background=True)
         
         return landscape
     
@@ -177,9 +267,15 @@ class ResearchWorkflow:
         Returns:
             生成的想法数量
         """
-        if not self.state.landscape:
+        if self.state.landscape is None:
             raise ValueError("Research landscape not analyzed")
         
+        fingerprint = self._step_fingerprint(
+            {'landscape': self.state.landscape.to_dict(), 'num_ideas': num_ideas}
+        )
+        if self._reuse_step("ideas", fingerprint, self.state.ideas):
+            return len(self.state.ideas)
+        
         logger.info("Generating research ideas...")
         
         ideas = generate_research_ideas(
@@ -192,13 +288,15 @@ class ResearchWorkflow:
         ranked_ideas = rank_ideas(ideas)
         
         self.state.ideas = ranked_ideas
+        self._dirty_fields.add("ideas")
         self.state.current_step = "ideas"
+        self.state.step_fingerprints["ideas"] = fingerprint
         
         logger.info(f"Generated {len(ranked_ideas)} research ideas")
         
         # 保存中间结果
         if config.SAVE_INTERMEDIATE_RESULTS:
-            save_json([i.to_dict() for i in ranked_ideas], "research_ideas.json")
+            save_json([i.to_dict() for i in ranked_ideas], "research_ideas.json", background=True)
         
         return len(ranked_ideas)
     
@@ -216,61 +314,89 @@ class ResearchWorkflow:
             raise ValueError(f"Invalid idea index: {idea_index}")
         
         self.state.selected_idea = self.state.ideas[idea_index]
+        self._dirty_fields.add("selected_idea")
         logger.info(f"Selected idea: {self.state.selected_idea.idea_id}")
     
     def design_method(self):
         """设计研究方法"""
-        if not self.state.selected_idea:
+        if self.state.selected_idea is None:
             raise ValueError("No idea selected")
         
+        fingerprint = self._step_fingerprint(self.state.selected_idea.to_dict())
+        if self._reuse_step("method", fingerprint, self.state.method_design):
+            return self.state.method_design
+        
         logger.info("Designing research method...")
         
         method = design_method(self.state.selected_idea, self.api_key)
         
         self.state.method_design = method
+        self._dirty_fields.add("method_design")
         self.state.current_step = "method"
+        self.state.step_fingerprints["method"] = fingerprint
         
         logger.info("Method designed")
         
         # 保存中间结果
         if config.SAVE_INTERMEDIATE_RESULTS:
-            save_json(method.to_dict(), "method_design.json")
+            save_json(method.to_dict(), "method_design.json", background=True)
         
         return method
     
     def plan_experiments(self):
         """规划实验"""
-        if not self.state.method_design:
+        if self.state.method_design is None:
             raise ValueError("No method designed")
         
+        fingerprint = self._step_fingerprint(self.state.method_design.to_dict())
+        if self._reuse_step("experiment", fingerprint, self.state.experiment_plan):
+            return self.state.experiment_plan
+        
         logger.info("Planning experiments...")
         
         experiment = design_experiments(self.state.method_design, self.api_key)
         
         self.state.experiment_plan = experiment
+        self._dirty_fields.add("experiment_plan")
         self.state.current_step = "experiment"
+        self.state.step_fingerprints["experiment"] = fingerprint
         
         logger.info("Experiments planned")
         
         # 保存中间结果
         if config.SAVE_INTERMEDIATE_RESULTS:
-            save_json(experiment.to_dict(), "experiment_plan.json")
+            save_json(experiment.to_dict(), "experiment_plan.json", background=True)
         
         return experiment
     
     def draft_paper(self):
-        """生成论文草稿"""
-        if not all([
-            self.state.selected_idea,
-            self.state.method_design,
-            self.state.experiment_plan,
-            self.state.landscape
-        ]):
+        """生成论文草稿（同步入口，不能在已运行的事件循环中调用）"""
+        return asyncio.run(self.draft_paper_async())
+    
+    async def draft_paper_async(self):
+        """生成论文草稿（异步版本，各章节和标题并发生成）"""
+        if (
+            self.state.selected_idea is None
+            or self.state.method_design is None
+            or self.state.experiment_plan is None
+            or self.state.landscape is None
+        ):
             raise ValueError("Not all required components are ready")
         
+        fingerprint = self._step_fingerprint({
+            'idea': self.state.selected_idea.to_dict(),
+            'method': self.state.method_design.to_dict(),
+            'experiment': self.state.experiment_plan.to_dict(),
+            'landscape': self.state.landscape.to_dict(),
+            'papers_metadata': [p.to_dict() for p in self.state.papers_metadata],
+            'papers_analysis': {k: v.to_dict() for k, v in self.state.papers_analysis.items()}
+        })
+        if self._reuse_step("draft", fingerprint, self.state.paper_draft):
+            return self.state.paper_draft
+        
         logger.info("Generating paper draft...")
         
-        draft = generate_paper_draft(
+        draft = await generate_paper_draft_async(
             idea=self.state.selected_idea,
             method=self.state.method_design,
             experiment=self.state.experiment_plan,
@@ -281,7 +407,9 @@ class ResearchWorkflow:
         )
         
         self.state.paper_draft = draft
+        self._dirty_fields.add("paper_draft")
         self.state.current_step = "draft"
+        self.state.step_fingerprints["draft"] = fingerprint
         
         logger.info("Paper draft generated")
         
@@ -299,6 +427,19 @@ class ResearchWorkflow:
         """
         return save_workflow_state(self.state, filename)
     
+    def checkpoint_state(self, dirname: str = "state"):
+        """
+        增量保存工作流状态（每个字段一个文件，只重写上次保存后变化过的字段）
+        
+        Args:
+            dirname: 输出目录（位于OUTPUT_DIR下）
+        """
+        # 当前步骤和步骤指纹很小且几乎每步都变，总是写出
+        fields = self._dirty_fields | {"current_step", "step_fingerprints"}
+        path = save_workflow_state_fields(self.state.to_dict(fields), dirname)
+        self._dirty_fields.clear()
+        return path
+    
     def get_current_step(self) -> str:
         """获取当前步骤"""
         return self.state.current_step